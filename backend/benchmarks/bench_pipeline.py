@@ -0,0 +1,346 @@
+"""
+Offline benchmark of every pipeline stage in isolation and of the whole
+pipeline end to end, on synthetic speech-like audio. Prints (or writes) a
+JSON report with throughput, p50/p99 latency and peak RSS per stage.
+
+Nothing touches the network:
+- `fetch` streams synthetic 24 kHz LibriTTS-shaped rows through
+  `fetch_hf_stream` (decode + resample) from a local fixture,
+- `vad` runs `process_vad` with the bundled ONNX Silero model
+  (VAD_BACKEND=onnx unless set),
+- `transcribe` uses a real Vosk model with `--vosk-model PATH`, otherwise a
+  stub that does the same PCM framing and echoes the chunk's share of the
+  reference text with `--stub-error-rate` word errors (optionally sleeping
+  `--stub-rtf` x audio duration to stand in for decoding),
+- `align_wer` runs `align_reference` + `evaluate_wer`, `encode` the audio
+  codec, and `insert` `insert_db` (or, with `--insert-backend archive`,
+  the tar shard sink) against a local fake Supabase server.
+
+Stages run one after another on the previous stage's output. Peak RSS is
+the process high-water mark when the stage ends; run a single `--stage`
+(stages before it are still run to build its input) for a tighter figure.
+`graph` invokes the compiled LangGraph per chunk, `graph_batch` the batch
+graph per `--graph-batch-size` chunks, and `pipeline` streams everything
+through the StreamingPipeline as main.py does (INSERT_ADAPTIVE and
+INSERT_RATE_LIMIT gate its uploads; `--insert-capacity` makes the fake
+server slow down past that many concurrent requests, to exercise them).
+
+Run from backend/:  python -m benchmarks.bench_pipeline [--utterances 50] [--output report.json]
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import resource
+import time
+from functools import partial
+
+import numpy as np
+
+from benchmarks.fake_supabase import FakeSupabaseServer
+from benchmarks.synthetic import LocalDataset, synthetic_rows
+
+STAGES = ("fetch", "vad", "transcribe", "align_wer", "encode", "insert", "graph", "graph_batch", "pipeline")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _report(latencies, seconds, audio_seconds):
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    report = {
+        "items": len(latencies),
+        "seconds": seconds,
+        "items_per_second": len(latencies) / seconds if seconds else None,
+        "audio_seconds": audio_seconds,
+        "audio_seconds_per_second": audio_seconds / seconds if seconds else None,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+            "mean": float(np.mean(latencies_ms)),
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    return report
+
+
+def _time_each(fn, inputs):
+    """Calls `fn` on every input; returns (outputs, report)."""
+    from src.utils.metrics import _audio_seconds
+
+    outputs, latencies, audio_seconds = [], [], 0.0
+    start = time.perf_counter()
+    for item in inputs:
+        audio_seconds += _audio_seconds(item)
+        call_start = time.perf_counter()
+        outputs.append(fn(item))
+        latencies.append(time.perf_counter() - call_start)
+    return outputs, _report(latencies, time.perf_counter() - start, audio_seconds)
+
+
+def _time_stream(stream):
+    """Drains a generator, timing each item it produces; returns (items, report)."""
+    from src.utils.metrics import _audio_seconds
+
+    items, latencies, audio_seconds = [], [], 0.0
+    start = last = time.perf_counter()
+    for item in stream:
+        now = time.perf_counter()
+        latencies.append(now - last)
+        audio_seconds += _audio_seconds(item)
+        items.append(item)
+        last = time.perf_counter()
+    return items, _report(latencies, time.perf_counter() - start, audio_seconds)
+
+
+def _stub_transcriber(error_rate: float, rtf: float):
+    from src.nodes.transcribe_vosk import _pcm16_frames
+
+    def transcribe(data):
+        # Same input preparation as the real node.
+        for _ in _pcm16_frames(data["chunk_array"]):
+            pass
+        if rtf:
+            time.sleep(rtf * data["duration"])
+
+        # The chunk's share of the reference, by its position in the utterance's speech.
+        words = data.get("original_text", "").split()
+        speech_start = data.get("utterance_speech_start", data["start_time"])
+        span = max(data.get("utterance_speech_end", data["end_time"]) - speech_start, 1e-6)
+        first = round(max(0.0, (data["start_time"] - speech_start) / span) * len(words))
+        last = round(min(1.0, (data["end_time"] - speech_start) / span) * len(words))
+
+        rng = random.Random(f"{data.get('utterance_id')}/{data.get('start_sample')}")
+        hypothesis = [word if rng.random() >= error_rate else "zzz" for word in words[first:last]]
+        step = data["duration"] / max(len(hypothesis), 1)
+        data["transcribed_text"] = " ".join(hypothesis)
+        data["aligned_words"] = [
+            {"word": word, "start": round(i * step, 3), "end": round((i + 1) * step, 3), "confidence": 1.0}
+            for i, word in enumerate(hypothesis)
+        ]
+        return data
+
+    return transcribe
+
+
+def _score(chunk):
+    from src.nodes.align_reference import align_reference
+    from src.nodes.evaluate_wer import evaluate_wer
+
+    return evaluate_wer(align_reference(chunk))
+
+
+def _run_pipeline(rows, transcribe_fn, insert_fn):
+    from src.main import _split_utterances
+    from src.graph import route_quality_gate
+    from src.nodes import fetch_hf
+    from src.nodes.align_reference import align_reference
+    from src.nodes.evaluate_wer import evaluate_wer
+    from src.pipeline import Stage, StreamingPipeline
+    from src.utils.audio_codec import encode_chunk
+    from src.utils.memory import open_memory_budget
+    from src.utils.metrics import PipelineMetrics
+    from src.utils.rate_control import open_upload_control
+
+    max_workers = int(os.environ.get("MAX_WORKERS", "4"))
+    insert_workers = int(os.environ.get("INSERT_WORKERS", max_workers))
+    # INSERT_ADAPTIVE / INSERT_RATE_LIMIT gate the uploads as in src/main.py
+    control = open_upload_control(insert_workers)
+    if control is not None:
+        insert_fn = partial(insert_fn, control=control)
+    metrics = PipelineMetrics()
+    pipeline = StreamingPipeline(
+        [
+            Stage("vad", _split_utterances, workers=int(os.environ.get("VAD_WORKERS", "1")), expand=True),
+            Stage("transcribe_vosk", transcribe_fn, workers=int(os.environ.get("TRANSCRIBE_WORKERS", max_workers))),
+            Stage("align_reference", align_reference),
+            Stage("evaluate_wer", evaluate_wer, route=route_quality_gate),
+            Stage("encode_audio", encode_chunk, workers=int(os.environ.get("ENCODE_WORKERS", max_workers))),
+            Stage("insert_db", insert_fn, workers=insert_workers),
+        ],
+        queue_size=int(os.environ.get("QUEUE_SIZE", "10")),
+        metrics=metrics,
+    )
+
+    fetch_hf.load_dataset = lambda *args, **kwargs: LocalDataset(rows)
+    source = fetch_hf.fetch_hf_stream()
+    memory_budget = open_memory_budget()
+    if memory_budget is not None:
+        source = memory_budget.throttle(source, idle=lambda: pipeline.in_flight == 0)
+    start = time.perf_counter()
+    finals = list(pipeline.run(source))
+    seconds = time.perf_counter() - start
+
+    snapshot = metrics.snapshot()
+    audio_seconds = snapshot["stages"].get("fetch", {}).get("audio_seconds", 0.0)
+    return {
+        "chunks": len(finals),
+        "seconds": seconds,
+        "chunks_per_second": len(finals) / seconds,
+        "audio_seconds": audio_seconds,
+        "audio_seconds_per_second": audio_seconds / seconds,
+        "outcomes": snapshot["chunks"],
+        "time_to_first_chunk_seconds": snapshot["startup_seconds"].get("first_chunk"),
+        # Bucket upper bounds, from the pipeline's own histograms
+        "stage_latency_ms": {
+            name: {
+                "p50": stats["latency_seconds"]["p50"] * 1000,
+                "p99": stats["latency_seconds"]["p99"] * 1000,
+                "realtime_factor": stats["realtime_factor"],
+            }
+            for name, stats in snapshot["stages"].items()
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+        "memory_throttles": memory_budget.throttles if memory_budget is not None else 0,
+        "insert_concurrency": (
+            {
+                "final": control.concurrency.limit,
+                "low": control.concurrency.low,
+                "high": control.concurrency.high,
+                "decreases": control.concurrency.decreases,
+            }
+            if control is not None and control.concurrency is not None
+            else None
+        ),
+    }
+
+
+def _congested_latency(base, capacity, in_flight):
+    return base * (1 + max(0, in_flight - capacity))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--utterances", type=int, default=50)
+    parser.add_argument("--min-seconds", type=float, default=2.0)
+    parser.add_argument("--max-seconds", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage", choices=STAGES, action="append", help="only report these stages (repeatable)")
+    parser.add_argument("--vosk-model", help="path to an unpacked Vosk model; a stub transcriber otherwise")
+    parser.add_argument("--stub-error-rate", type=float, default=0.05, help="word error rate of the stub")
+    parser.add_argument("--stub-rtf", type=float, default=0.0, help="stub decode time per second of audio")
+    parser.add_argument("--insert-latency-ms", type=float, default=0.0, help="fake Supabase response delay")
+    parser.add_argument("--insert-capacity", type=int, default=0,
+                        help="requests the fake Supabase serves at once; each one beyond adds --insert-latency-ms")
+    parser.add_argument("--insert-backend", choices=("object", "archive"), default="object",
+                        help="one storage object per chunk, or tar shards (INSERT_BACKEND=archive)")
+    parser.add_argument("--archive-shard-mb", type=float, default=64.0, help="shard size with --insert-backend archive")
+    parser.add_argument("--graph-batch-size", type=int, default=32, help="chunks per batch graph invoke")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    selected = set(args.stage or STAGES)
+    # Isolated stages run in order on each other's output; the end-to-end runs only need VAD chunks.
+    isolated = [STAGES.index(stage) for stage in selected if stage not in ("graph", "graph_batch", "pipeline")]
+    last_needed = max(isolated or [1])
+
+    os.environ.setdefault("VAD_BACKEND", "onnx")
+    generated_at = time.perf_counter()
+    rows = synthetic_rows(args.utterances, args.min_seconds, args.max_seconds, seed=args.seed)
+
+    report = {
+        "config": {
+            **{key: value for key, value in vars(args).items() if key != "output"},
+            "vad_backend": os.environ["VAD_BACKEND"],
+            "audio_dtype": os.environ.get("AUDIO_DTYPE", "float32"),
+            "prefetch_depth": int(os.environ.get("PREFETCH_DEPTH", "8")),
+            "memory_budget_mb": os.environ.get("MEMORY_BUDGET_MB"),
+            "transcriber": "vosk" if args.vosk_model else "stub",
+            "fixture_seconds": time.perf_counter() - generated_at,
+        },
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "stages": {},
+    }
+
+    from src import graph as graph_module
+    from src.main import _split_utterances
+    from src.nodes import fetch_hf
+    from src.nodes.insert_db import ArchiveInsertSink, insert_db
+    from src.utils.archive import StorageShardStore
+    from src.utils.audio_codec import encode_chunk
+
+    if args.vosk_model:
+        from src.nodes import transcribe_vosk as transcribe_module
+
+        os.environ["VOSK_MODEL_PATH"] = args.vosk_model
+        transcribe_module._load_model()
+        transcribe_fn = transcribe_module.transcribe_vosk
+    else:
+        transcribe_fn = _stub_transcriber(args.stub_error_rate, args.stub_rtf)
+
+    latency = args.insert_latency_ms / 1000
+    if args.insert_capacity:
+        # Requests beyond the capacity queue up: each one adds a service time
+        latency = partial(_congested_latency, args.insert_latency_ms / 1000, args.insert_capacity)
+    with FakeSupabaseServer(latency=latency) as server:
+        os.environ["SUPABASE_URL"] = server.url
+        # supabase-py only accepts JWT-shaped keys; the fake server ignores it.
+        os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.benchmark"
+
+        stages = report["stages"]
+        fetch_hf.load_dataset = lambda *a, **k: LocalDataset(rows)
+        records, stages["fetch"] = _time_stream(fetch_hf.fetch_hf_stream())
+
+        chunk_lists, stages["vad"] = _time_each(_split_utterances, records)
+        chunks = [chunk for chunk_list in chunk_lists for chunk in chunk_list]
+        stages["vad"]["items_out"] = len(chunks)
+        # Untouched copies for the end-to-end graph runs
+        fresh_chunks = [copy.copy(chunk) for chunk in chunks]
+        fresh_batch_chunks = [copy.copy(chunk) for chunk in chunks]
+
+        if last_needed >= STAGES.index("transcribe"):
+            chunks, stages["transcribe"] = _time_each(transcribe_fn, chunks)
+        if last_needed >= STAGES.index("align_wer"):
+            chunks, stages["align_wer"] = _time_each(_score, chunks)
+            passed = [chunk for chunk in chunks if chunk["pass"]]
+            stages["align_wer"]["items_out"] = len(passed)
+        if last_needed >= STAGES.index("encode"):
+            passed, stages["encode"] = _time_each(encode_chunk, passed)
+        if last_needed >= STAGES.index("insert"):
+            if args.insert_backend == "archive":
+                sink = ArchiveInsertSink(StorageShardStore(), max_shard_bytes=int(args.archive_shard_mb * 1024 * 1024))
+                _, stages["insert"] = _time_each(sink.write, passed)
+                # Publishing the last, partial shard is part of the cost
+                start = time.perf_counter()
+                sink.close()
+                stages["insert"]["close_seconds"] = time.perf_counter() - start
+            else:
+                _, stages["insert"] = _time_each(insert_db, passed)
+            stages["insert"]["rows_stored"] = len(server.rows)
+            stages["insert"]["objects_stored"] = len(server.uploads)
+            stages["insert"]["insert_requests"] = server.insert_requests
+
+        if "graph" in selected:
+            graph_module.transcribe_vosk = transcribe_fn
+            graph = graph_module.get_compiled_graph()
+            _, stages["graph"] = _time_each(graph.invoke, fresh_chunks)
+
+        if "graph_batch" in selected:
+            graph_module.transcribe_vosk_batch = lambda items: [transcribe_fn(item) for item in items]
+            graph = graph_module.get_compiled_batch_graph()
+            size = args.graph_batch_size
+            batches = [{"chunks": fresh_batch_chunks[i:i + size]} for i in range(0, len(fresh_batch_chunks), size)]
+            _, stages["graph_batch"] = _time_each(graph.invoke, batches)
+            # Per-chunk figures, comparable with `graph`
+            report_batch = stages["graph_batch"]
+            report_batch["audio_seconds"] = sum(chunk["duration"] for chunk in fresh_batch_chunks)
+            report_batch["audio_seconds_per_second"] = report_batch["audio_seconds"] / report_batch["seconds"]
+            report_batch["chunks_per_second"] = len(fresh_batch_chunks) / report_batch["seconds"]
+
+        if "pipeline" in selected:
+            stages["pipeline"] = _run_pipeline(rows, transcribe_fn, insert_db)
+
+    report["stages"] = {name: result for name, result in report["stages"].items() if name in selected}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
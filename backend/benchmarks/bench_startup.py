@@ -0,0 +1,76 @@
+"""
+Measures cold startup in fresh interpreters: importing `src.main`, which
+heavy modules that import pulls in, and the model warm-up (VAD and, with
+`--vosk-model`, Vosk) loaded concurrently versus one after the other.
+Each measurement runs `--repeats` times in a new process; the median is
+reported as JSON.
+
+Run from backend/:  python -m benchmarks.bench_startup [--vosk-model PATH] [--vad-backend jit|onnx]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_HEAVY_MODULES = ("torch", "datasets", "langgraph", "librosa", "onnxruntime", "vosk", "supabase")
+
+_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import src.main
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "heavy_modules": [m for m in %r if m in sys.modules]}))
+"""
+
+_WARMUP = """
+import json, time
+from src.nodes import process_vad, transcribe_vosk
+from src.warmup import warm_up
+start = time.perf_counter()
+if %r:
+    timings = warm_up(vosk=%r)
+else:
+    timings = {"vad": warm_up(vosk=False)["vad"]}
+    if %r:
+        timings.update(warm_up(vad=False))
+print(json.dumps({"seconds": time.perf_counter() - start, "models": timings}))
+"""
+
+
+def _run(code, env, repeats):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    median = statistics.median(run["seconds"] for run in runs)
+    return {**runs[0], "seconds": median, "runs": [run["seconds"] for run in runs]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vosk-model", help="path to an unpacked Vosk model; only the VAD is loaded otherwise")
+    parser.add_argument("--vad-backend", choices=("jit", "onnx"), default="jit")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    env = dict(os.environ, VAD_BACKEND=args.vad_backend)
+    if args.vosk_model:
+        env["VOSK_MODEL_PATH"] = args.vosk_model
+    vosk = bool(args.vosk_model)
+
+    report = {
+        "config": vars(args),
+        "import_src_main": _run(_IMPORT % (_HEAVY_MODULES,), env, args.repeats),
+        "warmup_concurrent": _run(_WARMUP % (True, vosk, vosk), env, args.repeats),
+    }
+    if vosk:
+        report["warmup_sequential"] = _run(_WARMUP % (False, vosk, vosk), env, args.repeats)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmarks per-chunk Vosk overhead and latency: the old path (a new
+KaldiRecognizer per chunk, whole buffer in one AcceptWaveform call) against
+the pooled recognizer fed in VOSK_FRAME_MS frames. Prints a JSON report.
+
+Latency is measured from the moment a chunk's last sample is produced to
+its transcript, with a producer releasing the chunk's frames at `--speed`
+times real time (as a streaming VAD would), so streamed decoding can overlap
+with production while the old path can only start once the chunk is whole.
+
+Needs a Vosk model: `--model PATH`, otherwise the default small en-us model
+is loaded (and downloaded on first use).
+
+Run from backend/:  python -m benchmarks.bench_transcribe [--model PATH] [--chunk-seconds 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import soundfile as sf
+from vosk import KaldiRecognizer
+
+from src.nodes import transcribe_vosk as transcribe_module
+from src.nodes.transcribe_vosk import _pcm16_frames, _to_pcm16, transcribe_frames
+
+
+def _old_recognize(audio) -> str:
+    rec = KaldiRecognizer(transcribe_module._vosk_model, 16000)
+    rec.SetWords(True)
+    rec.AcceptWaveform(_to_pcm16(audio))
+    return json.loads(rec.FinalResult()).get("text", "")
+
+
+def _paced_frames(audio, speed: float, produced: dict):
+    """Yields frames no faster than `speed` x real time; records when the last one was produced."""
+    start = time.perf_counter()
+    fed = 0
+    for frame in _pcm16_frames(audio):
+        fed += len(frame) // 2
+        delay = start + fed / 16000 / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield frame
+    produced["at"] = time.perf_counter()
+
+
+def _produce_then_decode(audio, speed: float) -> float:
+    start = time.perf_counter()
+    # The whole chunk has to exist before the old path can start.
+    time.sleep(max(0.0, start + len(audio) / 16000 / speed - time.perf_counter()))
+    produced_at = time.perf_counter()
+    _old_recognize(audio)
+    return time.perf_counter() - produced_at
+
+
+def _produce_while_decoding(audio, speed: float) -> float:
+    produced = {}
+    transcribe_frames(_paced_frames(audio, speed, produced))
+    return time.perf_counter() - produced["at"]
+
+
+def _summary(values):
+    return {"mean_ms": statistics.mean(values) * 1000, "max_ms": max(values) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="path to an unpacked Vosk model")
+    parser.add_argument("--audio", default="tests/en_vad.wav", help="16kHz mono speech file")
+    parser.add_argument("--chunk-seconds", type=float, default=10.0)
+    parser.add_argument("--speed", type=float, default=4.0, help="producer speed, multiples of real time")
+    parser.add_argument("--setup-repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.model:
+        os.environ["VOSK_MODEL_PATH"] = args.model
+    transcribe_module._load_model()
+
+    audio, sample_rate = sf.read(args.audio, dtype="float32")
+    if sample_rate != 16000:
+        raise SystemExit(f"{args.audio} is {sample_rate}Hz, expected 16000Hz")
+    chunk_len = int(args.chunk_seconds * 16000)
+    chunks = [audio[i:i + chunk_len] for i in range(0, len(audio) - chunk_len + 1, chunk_len)] or [audio]
+
+    # Setup cost alone: building a recognizer vs. taking one from the pool.
+    start = time.perf_counter()
+    for _ in range(args.setup_repeats):
+        KaldiRecognizer(transcribe_module._vosk_model, 16000).SetWords(True)
+    build_s = (time.perf_counter() - start) / args.setup_repeats
+
+    transcribe_frames([chunks[0]])  # warm the pool
+    start = time.perf_counter()
+    for _ in range(args.setup_repeats):
+        with transcribe_module._borrow_recognizer():
+            pass
+    borrow_s = (time.perf_counter() - start) / args.setup_repeats
+
+    # Whole-chunk decode time, chunk already in memory.
+    old_total, new_total = [], []
+    for chunk in chunks:
+        start = time.perf_counter()
+        _old_recognize(chunk)
+        old_total.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        transcribe_frames(_pcm16_frames(chunk))
+        new_total.append(time.perf_counter() - start)
+
+    old_latency = [_produce_then_decode(chunk, args.speed) for chunk in chunks]
+    new_latency = [_produce_while_decoding(chunk, args.speed) for chunk in chunks]
+
+    report = {
+        "chunks": len(chunks),
+        "chunk_seconds": args.chunk_seconds,
+        "frame_samples": transcribe_module._frame_samples(),
+        "producer_speed": args.speed,
+        "setup_ms": {"new_recognizer": build_s * 1000, "pooled_recognizer": borrow_s * 1000},
+        "decode": {"per_chunk_recognizer": _summary(old_total), "pooled_framed": _summary(new_total)},
+        "latency_after_last_sample": {
+            "per_chunk_recognizer": _summary(old_latency),
+            "pooled_framed": _summary(new_latency),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
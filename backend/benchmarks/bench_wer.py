@@ -0,0 +1,80 @@
+"""
+Benchmarks WER scoring of a large batch of (reference, hypothesis) pairs:
+one `jiwer.wer` call per pair (the old evaluate_wer path) against a single
+`word_error_rates` call, and checks that every rate is identical. Prints a
+JSON report.
+
+Run from backend/:  python -m benchmarks.bench_wer [--pairs 20000] [--repeats 3] [--threads 1]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import jiwer
+
+from src.utils.wer_engine import word_error_rates
+
+
+def _synthetic_pairs(count: int, seed: int = 0):
+    """Transcript-like pairs: 5-15s chunks of read speech (~10-40 words) with a few recognition errors."""
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    pairs = []
+    for _ in range(count):
+        reference = [rng.choice(vocabulary) for _ in range(rng.randint(10, 40))]
+        hypothesis = [word for word in reference if rng.random() > 0.03]
+        for _ in range(rng.randint(0, 3)):
+            position = rng.randint(0, len(hypothesis))
+            if rng.random() < 0.5 and position < len(hypothesis):
+                hypothesis[position] = rng.choice(vocabulary)
+            else:
+                hypothesis.insert(position, rng.choice(vocabulary))
+        pairs.append((" ".join(reference), " ".join(hypothesis)))
+    return pairs
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=1, help="WER_THREADS for the batched call")
+    args = parser.parse_args()
+    os.environ["WER_THREADS"] = str(args.threads)
+
+    pairs = _synthetic_pairs(args.pairs)
+    references = [reference for reference, _ in pairs]
+    hypotheses = [hypothesis for _, hypothesis in pairs]
+
+    expected = [jiwer.wer(reference, hypothesis) for reference, hypothesis in pairs]
+    rates = word_error_rates(references, hypotheses).rates.tolist()
+
+    jiwer_s = _best_of(lambda: [jiwer.wer(r, h) for r, h in pairs], args.repeats)
+    batch_s = _best_of(lambda: word_error_rates(references, hypotheses), args.repeats)
+    aligned_s = _best_of(lambda: word_error_rates(references, hypotheses, return_alignments=True), args.repeats)
+
+    report = {
+        "pairs": args.pairs,
+        "threads": args.threads,
+        "jiwer_loop_ms": jiwer_s * 1000,
+        "batch_ms": batch_s * 1000,
+        "batch_with_alignments_ms": aligned_s * 1000,
+        "speedup": jiwer_s / batch_s,
+        "pairs_per_second": args.pairs / batch_s,
+        "identical_to_jiwer": rates == expected,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
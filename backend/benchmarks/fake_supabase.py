@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSupabaseServer:
+    """
+    Local HTTP stand-in for the two Supabase endpoints the pipeline writes to:
+    - POST /storage/v1/object/<bucket>/<path>  (storage upload)
+    - POST /rest/v1/speech_chunks              (PostgREST insert, JSON list or object)
+
+    Like the real services, re-uploading an existing object needs
+    `x-upsert: true` and a duplicate row id is rejected unless the insert asks
+    for `Prefer: resolution=ignore-duplicates`.
+
+    Records every request, upload and row, the peak number of concurrent
+    requests and the client connections used. `latency` (seconds) delays
+    every response; it may also be a function of the number of requests in
+    flight, to model a service that slows down under load. `fail_status`
+    makes every request answer with that status code (both can be changed
+    while the server runs).
+    """
+
+    def __init__(self, latency: float = 0.0, fail_status: int = 0):
+        self.latency = latency
+        self.fail_status = fail_status
+
+        self.uploads = {}
+        self.rows = []
+        self.insert_requests = 0
+        self.requests = 0
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes: without this, Nagle's algorithm holds
+            # the body back until the client's delayed ACK (~40ms) on reused connections.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._handle(self, body)
+
+            do_PUT = do_POST
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def _handle(self, handler, body):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.connections.add(handler.client_address)
+            latency = self.latency(self.in_flight) if callable(self.latency) else self.latency
+
+        try:
+            if latency:
+                time.sleep(latency)
+
+            if self.fail_status:
+                self._respond(handler, self.fail_status, {"error": "injected failure"})
+                return
+
+            path = handler.path
+            if path.startswith("/storage/v1/object/"):
+                key = path[len("/storage/v1/object/"):]
+                with self._lock:
+                    duplicate = key in self.uploads and handler.headers.get("x-upsert") != "true"
+                    if not duplicate:
+                        self.uploads[key] = {"body": body, "content_type": handler.headers.get("content-type")}
+                if duplicate:
+                    self._respond(handler, 400, {"error": "Duplicate", "message": "The resource already exists"})
+                else:
+                    self._respond(handler, 200, {"Key": path})
+            elif path.startswith("/rest/v1/speech_chunks"):
+                payload = json.loads(body)
+                rows = payload if isinstance(payload, list) else [payload]
+                ignore_duplicates = "resolution=ignore-duplicates" in handler.headers.get("Prefer", "")
+                with self._lock:
+                    self.insert_requests += 1
+                    existing = {row.get("id") for row in self.rows}
+                    duplicate = any(row.get("id") in existing for row in rows)
+                    if not duplicate or ignore_duplicates:
+                        self.rows.extend(row for row in rows if row.get("id") not in existing)
+                if duplicate and not ignore_duplicates:
+                    self._respond(handler, 409, {"code": "23505", "message": "duplicate key value"})
+                else:
+                    self._respond(handler, 201, None)
+            else:
+                self._respond(handler, 404, {"error": "unknown endpoint"})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def _respond(handler, status, payload):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -1,10 +1,11 @@
-from typing import TypedDict, Any, List, Dict
-from langgraph.graph import StateGraph, START, END
+from typing import TypedDict, Any, Callable, List, Dict, Optional
 
 # Import actual pipeline execution nodes
-from src.nodes.transcribe_vosk import transcribe_vosk
-from src.nodes.evaluate_wer import evaluate_wer
-from src.nodes.insert_db import insert_db
+from src.nodes.transcribe_vosk import transcribe_vosk, transcribe_vosk_batch
+from src.nodes.align_reference import align_reference, align_reference_batch
+from src.nodes.evaluate_wer import evaluate_wer, evaluate_wer_batch
+from src.nodes.insert_db import insert_db, insert_db_batch
+from src.utils.metrics import PipelineMetrics, instrument
 
 # Quality Gate (WER)
 
@@ -21,14 +22,44 @@ PipelineState = TypedDict(
         "original_text": str,
         "dataset_id": str,
         "speaker_id": str,
+        "utterance_id": str,
+        "stream_index": int,
         "chunk_array": Any,
+        "chunk_handle": Any,
+        "pad_samples": int,
         "start_time": float,
         "end_time": float,
+        "start_sample": int,
+        "end_sample": int,
+        "chunk_index": int,
+        "chunk_count": int,
+        "utterance_speech_start": float,
+        "utterance_speech_end": float,
+        "utterance_text": str,
+        "reference_span": List[int],
         "duration": float,
         "transcribed_text": str,
         "aligned_words": List[Dict[str, Any]],
+        "transcription_aborted": bool,
+        "wer_lower_bound": float,
         "wer_score": float,
         "pass": bool,
+        "encoded_audio": bytes,
+        "audio_codec": str,
+        "insert_spooled": str,
+        "error": str,
+    },
+    total=False,
+)
+
+
+# State of the batch graph: the chunks still in flight, and those the
+# quality gate filtered out (failed WER or errored) on the way.
+BatchState = TypedDict(
+    "BatchState",
+    {
+        "chunks": List[PipelineState],
+        "dropped": List[PipelineState],
     },
     total=False,
 )
@@ -47,21 +78,29 @@ def route_quality_gate(state: PipelineState) -> str:
     return "end"
 
 
-def get_compiled_graph():
+def get_compiled_graph(metrics: Optional[PipelineMetrics] = None):
     """
     Constructs and compiles the `StateGraph` object managing traversal
-    from Start -> VAD -> Vosk -> WER (Conditional Branch) -> Insert DB
+    from Start -> VAD -> Vosk -> Reference alignment -> WER (Conditional Branch) -> Insert DB
+
+    With `metrics`, every node call is timed and counted under the node's name.
     """
+    # langgraph is imported here, so the streaming pipeline (which only
+    # needs `route_quality_gate`) starts without it.
+    from langgraph.graph import StateGraph, START, END
+
     builder = StateGraph(PipelineState)
 
     # Define Nodes
-    builder.add_node("transcribe_vosk", transcribe_vosk)
-    builder.add_node("evaluate_wer", evaluate_wer)
-    builder.add_node("insert_db", insert_db)
+    builder.add_node("transcribe_vosk", instrument(transcribe_vosk, "transcribe_vosk", metrics))
+    builder.add_node("align_reference", instrument(align_reference, "align_reference", metrics))
+    builder.add_node("evaluate_wer", instrument(evaluate_wer, "evaluate_wer", metrics))
+    builder.add_node("insert_db", instrument(insert_db, "insert_db", metrics))
 
     # Define primary linear traversal vectors
     builder.add_edge(START, "transcribe_vosk")
-    builder.add_edge("transcribe_vosk", "evaluate_wer")
+    builder.add_edge("transcribe_vosk", "align_reference")
+    builder.add_edge("align_reference", "evaluate_wer")
 
     # Conditional branching logic terminating off `pass` boolean flag
     builder.add_conditional_edges(
@@ -72,3 +111,81 @@ def get_compiled_graph():
     builder.add_edge("insert_db", END)
 
     return builder.compile()
+
+
+def _batch_node(name: str, fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]):
+    """
+    Adapts a batch node function to the batch graph: runs it over the
+    chunks without an `error`, and marks those with an `error` if the whole
+    call raised, like the streaming pipeline does.
+    """
+    def node(state: BatchState) -> Dict[str, Any]:
+        chunks = state.get("chunks", [])
+        healthy = [chunk for chunk in chunks if "error" not in chunk]
+        if healthy:
+            try:
+                fn(healthy)
+            except Exception as e:
+                for chunk in healthy:
+                    chunk["error"] = f"{name}: {e}"
+        return {"chunks": chunks}
+
+    return node
+
+
+def quality_gate(state: BatchState) -> Dict[str, Any]:
+    """
+    Batch counterpart of `route_quality_gate`: keeps the chunks that passed
+    the WER gate in `chunks` and moves the rest (and errored chunks) to
+    `dropped`.
+    """
+    kept, dropped = [], list(state.get("dropped", []))
+    for chunk in state.get("chunks", []):
+        if "error" not in chunk and chunk.get("pass", False) is True:
+            kept.append(chunk)
+        else:
+            dropped.append(chunk)
+    return {"chunks": kept, "dropped": dropped}
+
+
+def route_batch(state: BatchState) -> str:
+    # Skip the insertion node when nothing in the batch passed.
+    return "insert_db" if state.get("chunks") else "end"
+
+
+def get_compiled_batch_graph(metrics: Optional[PipelineMetrics] = None):
+    """
+    Batched variant of `get_compiled_graph`: the state carries a list of
+    chunks (`{"chunks": [...]}`), so LangGraph's per-invoke state handling
+    and routing are paid once per batch. Each node runs the batch
+    implementation of its step (WER scoring is one vectorized call, rows go
+    out as one multi-row insert), and `quality_gate` filters failing chunks
+    out of the batch before insertion.
+
+    Every chunk comes back, in `chunks` (inserted, or errored during
+    insertion) or in `dropped`.
+    """
+    from langgraph.graph import StateGraph, START, END
+
+    builder = StateGraph(BatchState)
+
+    builder.add_node(
+        "transcribe_vosk", _batch_node("transcribe_vosk", instrument(transcribe_vosk_batch, "transcribe_vosk", metrics))
+    )
+    builder.add_node(
+        "align_reference", _batch_node("align_reference", instrument(align_reference_batch, "align_reference", metrics))
+    )
+    builder.add_node(
+        "evaluate_wer", _batch_node("evaluate_wer", instrument(evaluate_wer_batch, "evaluate_wer", metrics))
+    )
+    builder.add_node("quality_gate", quality_gate)
+    builder.add_node("insert_db", _batch_node("insert_db", instrument(insert_db_batch, "insert_db", metrics)))
+
+    builder.add_edge(START, "transcribe_vosk")
+    builder.add_edge("transcribe_vosk", "align_reference")
+    builder.add_edge("align_reference", "evaluate_wer")
+    builder.add_edge("evaluate_wer", "quality_gate")
+    builder.add_conditional_edges("quality_gate", route_batch, {"insert_db": "insert_db", "end": END})
+    builder.add_edge("insert_db", END)
+
+    return builder.compile()
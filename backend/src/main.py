@@ -1,93 +1,395 @@
 import os
 import time
+from functools import partial
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from src.graph import get_compiled_graph
+from src.graph import route_quality_gate
+from src.pipeline import Stage, StreamingPipeline, log_result
 from src.nodes.fetch_hf import fetch_hf_stream
-from src.nodes.process_vad import process_vad
+from src.nodes.process_vad import process_vad_batch, vad_params
+from src.nodes.transcribe_vosk import transcribe_vosk, model_id, VoskProcessPool
+from src.nodes.align_reference import align_reference, speech_end
+from src.nodes.evaluate_wer import evaluate_wer, evaluate_wer_batch
+from src.nodes.insert_db import insert_db, ArchiveInsertSink, BufferedInsertSink, AsyncInsertSink, SpoolingInsertSink
+from src.utils.archive import open_shard_store
+from src.utils.audio_cache import open_audio_cache
+from src.utils.audio_codec import encode_chunk
+from src.utils.checkpoint import open_checkpoint
+from src.utils.memory import open_memory_budget
+from src.utils.metrics import open_metrics
+from src.utils.pcm import ingest_dtype
+from src.utils.rate_control import CircuitBreaker, open_upload_control
+from src.utils.shared_audio import SharedAudioRing
+from src.utils.sharding import leased_stream, open_sharding
+from src.utils.spool import open_spool
+from src.utils.transcript_cache import open_transcript_cache
+from src.warmup import warm_up
 
 
 def main():
     """
     Primary execution entrypoint for the Agentic Speech Backend Pipeline.
     Loads configurations, initiates the HuggingFace generator stream,
-    and maps the LangGraph compiled state machine across a ThreadPool.
+    and streams it through a stage-pipelined executor where fetching, VAD,
+    transcription, WER gating and insertion all overlap.
     """
     # 1. Load Configurations
     load_dotenv()
+    startup_start = time.perf_counter()
 
-    # We allow configurations to define parallelization and batch scale
+    # BATCH_SIZE now bounds the queue between stages (and the log cadence),
+    # MAX_WORKERS is the default worker count of the Vosk and upload stages.
     batch_size = int(os.environ.get("BATCH_SIZE", "10"))
     max_workers = int(os.environ.get("MAX_WORKERS", "4"))
+    queue_size = int(os.environ.get("QUEUE_SIZE", str(batch_size)))
+
+    # Silero keeps recurrent state on the shared model, so VAD defaults to one worker.
+    vad_workers = int(os.environ.get("VAD_WORKERS", "1"))
+    # Utterances scored per VAD call (one batched inference per window with VAD_BACKEND=onnx).
+    vad_batch_size = int(os.environ.get("VAD_BATCH_SIZE", "1"))
+    transcribe_workers = int(os.environ.get("TRANSCRIBE_WORKERS", str(max_workers)))
+    wer_workers = int(os.environ.get("WER_WORKERS", "1"))
+    # Chunks scored per native edit-distance call in the WER stage.
+    wer_batch_size = int(os.environ.get("WER_BATCH_SIZE", "1"))
+    encode_workers = int(os.environ.get("ENCODE_WORKERS", str(max_workers)))
+    insert_workers = int(os.environ.get("INSERT_WORKERS", str(max_workers)))
+
+    # METRICS_PORT serves Prometheus text at /metrics, METRICS_JSON_PATH gets periodic JSON snapshots.
+    metrics, metrics_exporter = open_metrics()
+
+    # TRANSCRIBE_BACKEND=process decodes in worker processes with a resident model.
+    transcribe_backend = os.environ.get("TRANSCRIBE_BACKEND", "thread")
+    vosk_pool = None
+    transcribe_fn = transcribe_vosk
+    if transcribe_backend == "process":
+        vosk_pool = VoskProcessPool(int(os.environ.get("TRANSCRIBE_PROCESSES", "0")) or None)
+        transcribe_fn = vosk_pool.transcribe
+        # Keep one extra request queued per process so no worker idles between chunks.
+        transcribe_workers = max(transcribe_workers, 2 * vosk_pool.processes)
+
+    # Load the VAD and Vosk models concurrently from local paths before streaming starts,
+    # so a missing model fails here rather than in the first worker that needs it.
+    try:
+        warmup_seconds = warm_up(vosk_pool=vosk_pool)
+    except Exception:
+        if vosk_pool is not None:
+            vosk_pool.close()
+        if metrics_exporter is not None:
+            metrics_exporter.close()
+        raise
+    print(
+        "[AgenticSpeech] Models loaded in "
+        + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in warmup_seconds.items())
+    )
+    if metrics is not None:
+        for name, seconds in warmup_seconds.items():
+            metrics.observe_startup(f"load_{name}", seconds)
+
+    # AUDIO_TRANSPORT=shm keeps chunk audio in a shared-memory ring so worker
+    # processes receive (buffer id, offset, length) handles instead of arrays.
+    audio_ring = None
+    if os.environ.get("AUDIO_TRANSPORT", "inline") == "shm":
+        ring_seconds = float(os.environ.get("SHM_RING_SECONDS", "600"))
+        audio_ring = SharedAudioRing(int(ring_seconds * 16000), dtype=ingest_dtype())
+
+    # AUDIO_CACHE_DIR replays previously decoded utterances from local disk.
+    audio_cache = open_audio_cache()
+
+    # TRANSCRIPT_CACHE_PATH keeps transcripts so src/regate.py can re-apply the WER gate offline.
+    transcript_cache = open_transcript_cache(model_id(), vad_params())
+    if transcript_cache is not None:
+        if os.environ.get("WER_GATE_MODE", "full") == "streaming":
+            # Transcripts cut short by the streaming gate are partial, so they could never be cached or re-gated.
+            print("  [Warning] WER_GATE_MODE=streaming ignored: TRANSCRIPT_CACHE_PATH needs full transcripts.")
+            os.environ["WER_GATE_MODE"] = "full"
+        transcribe_fn = partial(transcript_cache.transcribe, transcribe_fn=transcribe_fn)
+
+    insert_sink, insert_fn = open_insert_sink()
+
+    # WORKER_RANK / WORLD_SIZE give this container a disjoint slice of the stream;
+    # SHARD_LEASE_PATH hands slices out dynamically and reassigns those of dead workers.
+    static_shards, shard_leases = open_sharding()
+    owns = static_shards.owns if static_shards is not None else None
+
+    # CHECKPOINT_PATH records finished utterances so a restart resumes where it stopped.
+    # Leased shards are recorded in the lease file instead, and each rank keeps its own file.
+    checkpoint = None
+    checkpoint_path = os.environ.get("CHECKPOINT_PATH")
+    if checkpoint_path and shard_leases is not None:
+        print("  [Warning] CHECKPOINT_PATH ignored: progress is tracked per shard in SHARD_LEASE_PATH.")
+    elif checkpoint_path:
+        if static_shards is not None:
+            checkpoint_path = static_shards.scoped_path(checkpoint_path)
+        if isinstance(insert_sink, ArchiveInsertSink):
+            # Sealing the open shard on every save would cut tiny shards: publish the sealed ones
+            # and keep the utterances of chunks in the open shard pending until it is published.
+            checkpoint = open_checkpoint(checkpoint_path, on_save=insert_sink.publish_sealed)
+            insert_sink.on_staged, insert_sink.on_published = checkpoint.hold, checkpoint.finish
+        else:
+            checkpoint = open_checkpoint(checkpoint_path, on_save=insert_sink.flush if insert_sink else None)
+        if checkpoint is not None and hasattr(insert_sink, "on_failure"):
+            # Background uploads fail after their chunk left the pipeline: keep its utterance pending.
+            insert_sink.on_failure = checkpoint.reopen
+
+    if shard_leases is not None:
+        source = leased_stream(
+            shard_leases,
+            lambda owns: fetch_hf_stream(cache=audio_cache, owns=owns),
+            idle=lambda: pipeline.in_flight == 0,
+        )
+    else:
+        # The checkpoint's resume position needs the stream in order, whatever PREFETCH_ORDERED says.
+        source = fetch_hf_stream(
+            cache=audio_cache,
+            start=checkpoint.position if checkpoint is not None else 0,
+            owns=owns,
+            ordered=True if checkpoint is not None else None,
+        )
+    if static_shards is not None:
+        print(
+            f"[AgenticSpeech] Worker {static_shards.rank} of {static_shards.world_size}: "
+            f"shards {static_shards.shards} of {static_shards.num_shards}."
+        )
+    if checkpoint is not None:
+        print(f"[AgenticSpeech] Resuming at stream position {checkpoint.position}.")
+        source = checkpoint.pending(source)
 
     print(
-        f"[AgenticSpeech] Starting pipeline with BATCH_SIZE={batch_size} and MAX_WORKERS={max_workers}"
+        f"[AgenticSpeech] Starting pipeline with QUEUE_SIZE={queue_size} and workers "
+        f"vad={vad_workers} transcribe={transcribe_workers} ({transcribe_backend}) "
+        f"wer={wer_workers} encode={encode_workers} insert={insert_workers}"
     )
 
-    # 2. Compile Graph
-    graph = get_compiled_graph()
+    # 2. Assemble the stage pipeline from the existing node functions
+    pipeline = StreamingPipeline(
+        [
+            Stage(
+                "vad",
+                partial(_split_utterances, audio_ring=audio_ring, checkpoint=checkpoint),
+                workers=vad_workers,
+                expand=True,
+                batch_size=vad_batch_size,
+            ),
+            Stage("transcribe_vosk", transcribe_fn, workers=transcribe_workers),
+            Stage("align_reference", align_reference, workers=wer_workers),
+            Stage(
+                "evaluate_wer",
+                evaluate_wer_batch if wer_batch_size > 1 else evaluate_wer,
+                workers=wer_workers,
+                route=route_quality_gate,
+                batch_size=wer_batch_size,
+            ),
+            Stage("encode_audio", partial(_encode_and_release, audio_ring=audio_ring), workers=encode_workers),
+            Stage("insert_db", insert_fn, workers=insert_workers),
+        ],
+        queue_size=queue_size,
+        metrics=metrics,
+    )
 
-    # 3. Process Stream in Batches
-    stream_generator = fetch_hf_stream()
+    # MEMORY_BUDGET_MB pauses fetching while the process RSS is over the cap.
+    memory_budget = open_memory_budget()
+    if memory_budget is not None:
+        source = memory_budget.throttle(source, idle=lambda: pipeline.in_flight == 0)
 
+    # 3. Stream the HF generator through the pipeline
     processed_count = 0
+    accepted_seconds = 0.0
     start_time = time.time()
+    start_cpu = _cpu_seconds()
+
+    try:
+        for final_state in pipeline.run(source):
+            if processed_count == 0:
+                print(f"[AgenticSpeech] First chunk out {time.perf_counter() - startup_start:.2f}s after startup.")
+            log_result(final_state)
+            _release_audio(final_state, audio_ring)
+            if checkpoint is not None:
+                checkpoint.finish(final_state)
+            if shard_leases is not None and "error" in final_state:
+                # Keeps the chunk's shard from being recorded as done.
+                shard_leases.fail(final_state.get("utterance_id"))
+            processed_count += 1
+            if final_state.get("pass", False) and "error" not in final_state:
+                accepted_seconds += final_state.get("duration", 0.0)
+
+            if processed_count % batch_size == 0:
+                print(f"[AgenticSpeech] Processed {processed_count} audio chunks total.")
+    finally:
+        if checkpoint is not None:
+            if isinstance(insert_sink, ArchiveInsertSink):
+                # Seal and publish the open shard, so the final save covers its utterances.
+                try:
+                    insert_sink.flush()
+                except Exception as e:
+                    print(f"  [Error] Open archive shard not published: {str(e)}")
+            # Flushes the insert sink before the final save.
+            checkpoint.close()
+        if insert_sink is not None:
+            insert_sink.close()
+        if vosk_pool is not None:
+            vosk_pool.close()
+        if transcript_cache is not None:
+            transcript_cache.close()
+        if audio_ring is not None:
+            audio_ring.close()
+        if shard_leases is not None:
+            shard_leases.close()
+        if metrics_exporter is not None:
+            metrics_exporter.close()
+
+    end_time = time.time()
+    print(
+        f"[AgenticSpeech] Pipeline finished. Processed {processed_count} chunks in {end_time - start_time:.2f} seconds."
+    )
+    if memory_budget is not None and memory_budget.throttles:
+        print(
+            f"[AgenticSpeech] Fetching paused {memory_budget.throttles} times "
+            f"({memory_budget.throttled_seconds:.1f}s) to stay within MEMORY_BUDGET_MB."
+        )
+
+    # Yield per unit of compute, to compare gate and alignment settings.
+    cpu_hours = (_cpu_seconds() - start_cpu) / 3600
+    accepted_hours = accepted_seconds / 3600
+    print(
+        f"[AgenticSpeech] Accepted {accepted_hours:.3f} audio hours using {cpu_hours:.3f} CPU hours "
+        f"({accepted_hours / cpu_hours if cpu_hours else 0.0:.2f} accepted audio hours per CPU hour)."
+    )
 
-    batch = []
 
-    # We iterate over the infinite stream, collecting items up to BATCH_SIZE
-    for data_dict in stream_generator:
-        chunks = process_vad(data_dict)
-        for chunk in chunks:
-            # Propagate the parent metadata into each separate chunk state
+def open_insert_sink():
+    """
+    Builds the insertion stage from the environment and returns
+    (insert_sink, insert_fn); the sink is None for plain per-chunk inserts.
+
+    INSERT_BATCH_SIZE > 1 buffers rows into multi-row inserts (flushed every
+    INSERT_FLUSH_MS as well, and on shutdown). INSERT_BACKEND=async moves
+    uploads onto one asyncio thread with INSERT_CONCURRENCY requests in flight.
+    INSERT_BACKEND=archive packs chunks into ARCHIVE_SHARD_MB tar shards
+    (staged in ARCHIVE_STAGING_DIR) published to ARCHIVE_STORE.
+
+    The per-chunk backends send their requests through the upload gate of
+    `open_upload_control` (INSERT_ADAPTIVE, INSERT_RATE_LIMIT), whose
+    ceiling is INSERT_CONCURRENCY (async) or INSERT_WORKERS.
+
+    INSERT_SPOOL_DIR spools failed per-chunk insertions to disk for retries
+    instead of failing the chunk, behind a circuit breaker that pauses
+    inserts after INSERT_BREAKER_FAILURES consecutive failures for
+    INSERT_BREAKER_RESET_S seconds.
+    """
+    insert_backend = os.environ.get("INSERT_BACKEND", "sync")
+    insert_batch_size = int(os.environ.get("INSERT_BATCH_SIZE", "1"))
+    insert_flush_ms = int(os.environ.get("INSERT_FLUSH_MS", "1000"))
+    if insert_backend == "async":
+        max_concurrency = int(os.environ.get("INSERT_CONCURRENCY", "64"))
+        insert_sink = AsyncInsertSink(
+            max_concurrency=max_concurrency,
+            batch_size=insert_batch_size,
+            flush_interval_ms=insert_flush_ms,
+            control=open_upload_control(max_concurrency),
+        )
+        return insert_sink, insert_sink.write
+    if insert_backend == "archive":
+        insert_sink = ArchiveInsertSink(
+            open_shard_store(),
+            staging_dir=os.environ.get("ARCHIVE_STAGING_DIR"),
+            max_shard_bytes=int(float(os.environ.get("ARCHIVE_SHARD_MB", "256")) * 1024 * 1024),
+        )
+        return insert_sink, insert_sink.write
+
+    insert_workers = int(os.environ.get("INSERT_WORKERS", os.environ.get("MAX_WORKERS", "4")))
+    control = open_upload_control(insert_workers)
+    spool = open_spool()
+    if spool is not None and insert_batch_size == 1:
+        breaker = CircuitBreaker(
+            int(os.environ.get("INSERT_BREAKER_FAILURES", "5")),
+            float(os.environ.get("INSERT_BREAKER_RESET_S", "30")),
+        )
+        insert_sink = SpoolingInsertSink(spool, breaker, control=control)
+        return insert_sink, insert_sink.write
+    if spool is not None:
+        print("  [Warning] INSERT_SPOOL_DIR ignored: spooling needs per-chunk inserts (INSERT_BATCH_SIZE=1)")
+    if insert_batch_size > 1:
+        insert_sink = BufferedInsertSink(insert_batch_size, insert_flush_ms, control=control)
+        return insert_sink, insert_sink.write
+    if control is not None:
+        return None, partial(insert_db, control=control)
+    return None, insert_db
+
+
+def _cpu_seconds():
+    """
+    CPU time of this process plus its exited child processes (the Vosk
+    process pool is reaped by the time the pipeline finishes).
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _split_utterances(data_dicts, audio_ring=None, checkpoint=None):
+    """
+    VAD stage: splits a batch of streamed utterances into 5-15s chunks and
+    propagates the parent metadata into each separate chunk state.
+    With a shared audio ring, chunk audio is moved into shared memory and
+    `chunk_array` becomes a zero-copy view of it. Only the batch's first
+    chunk waits for ring space: later ones would wait on slots this very
+    call holds, so when the ring is full they keep their audio inline
+    (pickled to worker processes) instead. With a checkpoint, each
+    utterance's chunk count is registered so its completion can be tracked.
+    """
+    batch = data_dicts if isinstance(data_dicts, list) else [data_dicts]
+    all_chunks = process_vad_batch(batch)
+    holds_ring_slots = False
+
+    for data_dict, chunks in zip(batch, all_chunks):
+        for index, chunk in enumerate(chunks):
             chunk["original_text"] = data_dict.get("original_text", "")
+            # Where this chunk sits in the utterance, for slicing the reference text per chunk
+            chunk["chunk_index"] = index
+            chunk["chunk_count"] = len(chunks)
+            chunk["utterance_speech_start"] = chunks[0]["start_time"]
+            chunk["utterance_speech_end"] = speech_end(chunks[-1])
             chunk["dataset_id"] = data_dict.get("dataset_id", "")
             chunk["speaker_id"] = data_dict.get("speaker_id", "")
-            
-            batch.append(chunk)
+            chunk["utterance_id"] = data_dict.get("utterance_id", "")
+            chunk["stream_index"] = data_dict.get("stream_index")
 
-        if len(batch) >= batch_size:
-            _process_batch(graph, batch, max_workers)
-            processed_count += len(batch)
-            print(f"[AgenticSpeech] Processed {processed_count} audio chunks total.")
-            batch = []  # Reset batch
+            if audio_ring is not None:
+                handle = audio_ring.put(chunk["chunk_array"], block=not holds_ring_slots)
+                if handle is not None:
+                    chunk["chunk_handle"] = handle
+                    chunk["chunk_array"] = audio_ring.view(handle)
+                    holds_ring_slots = True
 
-    # Flush any remaining items in the final partial batch
-    if batch:
-        _process_batch(graph, batch, max_workers)
-        processed_count += len(batch)
+        if checkpoint is not None:
+            checkpoint.expect(data_dict["stream_index"], data_dict["utterance_id"], len(chunks))
 
-    end_time = time.time()
-    print(
-        f"[AgenticSpeech] Pipeline finished. Processed {processed_count} chunks in {end_time - start_time:.2f} seconds."
-    )
+    return all_chunks if isinstance(data_dicts, list) else all_chunks[0]
+
+
+def _encode_and_release(data, audio_ring=None):
+    """
+    Encode stage: once a passing chunk is encoded only its bytes travel on
+    to insertion, so its audio is released right away instead of when the
+    chunk leaves the pipeline.
+    """
+    data = encode_chunk(data)
+    if "encoded_audio" in data:
+        _release_audio(data, audio_ring)
+    return data
 
 
-def _process_batch(graph, batch, max_workers):
+def _release_audio(final_state, audio_ring):
     """
-    Executes a batch of PipelineState dictionaries against the LangGraph
-    using a concurrent ThreadPoolExecutor to accelerate IO-bound DB uploads.
+    Drops a chunk's audio: its view into the parent utterance (the
+    utterance is freed with its last chunk) and, with a shared audio ring,
+    the pipeline's reference on its ring slot. Runs when the chunk is
+    encoded, or when it leaves the pipeline (dropped by the WER gate or
+    failed along the way); releasing twice is a no-op.
     """
-    futures = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for state in batch:
-            # Graph.invoke executes the state machine synchronously inside
-            # its designated worker thread.
-            futures.append(executor.submit(graph.invoke, state))
-
-        # Await completion and catch potential node-level exceptions
-        for future in as_completed(futures):
-            try:
-                final_state = future.result()
-                # Optionally log pass/fail status
-                pass_status = final_state.get("pass", False)
-                if not pass_status:
-                    print(
-                        f"  [Gate] Dropped chunk due to high WER: {final_state.get('wer_score')}"
-                    )
-            except Exception as e:
-                print(f"  [Error] Chunk processing failed: {str(e)}")
+    # The view must not outlive the ring slot it points into.
+    final_state.pop("chunk_array", None)
+    if audio_ring is not None and "chunk_handle" in final_state:
+        audio_ring.release(final_state.pop("chunk_handle"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import os
+from typing import Any, Dict, List, Tuple
+
+from src.nodes.evaluate_wer import _normalize_text
+
+
+def alignment_enabled() -> bool:
+    # ALIGN_REFERENCE=0 keeps scoring every chunk against the whole utterance text.
+    return os.environ.get("ALIGN_REFERENCE", "1") != "0"
+
+
+def reference_is_final(data: Dict[str, Any]) -> bool:
+    """
+    True when `original_text` is already the text the chunk will be scored
+    against, i.e. `align_reference` will not re-slice it after decoding.
+    """
+    return not alignment_enabled() or data.get("chunk_count", 1) <= 1
+
+
+def speech_end(chunk: Dict[str, Any]) -> float:
+    """End of a chunk's audio in seconds, without the silence VAD padded it with."""
+    pad_samples = chunk.get("pad_samples", 0)
+    if not pad_samples or not chunk.get("sample_rate"):
+        return chunk["end_time"]
+    return chunk["end_time"] - pad_samples / chunk["sample_rate"]
+
+
+def _speech_fraction(data: Dict[str, Any]) -> Tuple[float, float]:
+    """
+    Where the chunk's VAD boundaries (without padding) sit within the
+    utterance's speech, as fractions in [0, 1]. The transcript's own word timestamps are not used:
+    a recognizer that drops the words at a chunk edge would shrink the span
+    it gets graded against.
+    """
+    chunk_end = speech_end(data)
+    utterance_start = data.get("utterance_speech_start", data["start_time"])
+    utterance_end = data.get("utterance_speech_end", chunk_end)
+    span = max(utterance_end - utterance_start, 1e-6)
+
+    def clamp(value):
+        return min(1.0, max(0.0, value))
+
+    return clamp((data["start_time"] - utterance_start) / span), clamp((chunk_end - utterance_start) / span)
+
+
+def _edits(hypothesis: List[str], reference: List[str]) -> int:
+    # Word-level Levenshtein distance, one row at a time.
+    row = list(range(len(reference) + 1))
+    for i, word in enumerate(hypothesis, start=1):
+        previous, row = row, [i]
+        for j, expected in enumerate(reference, start=1):
+            row.append(min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (expected != word)))
+    return row[-1]
+
+
+def _best_start(hypothesis: List[str], reference: List[str], starts: range, length: int) -> int:
+    """
+    Picks where the chunk's reference span of `length` words begins, a in
+    `starts`, with the fewest word edits against the hypothesis. Ties go to
+    the start closest to the centre of `starts` (the time-based estimate).
+    The length is fixed by timing, so this can slide the span over a
+    misplaced boundary but never shrink it around words the hypothesis
+    dropped.
+    """
+    prior = (starts.start + starts.stop - 1) / 2
+    return min(starts, key=lambda a: (_edits(hypothesis, reference[a:a + length]), abs(a - prior)))
+
+
+def align_reference(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Alignment stage between transcription and WER scoring: narrows
+    `original_text` of a chunk cut from a longer utterance down to the span
+    of the reference that chunk actually covers.
+
+    The chunk's VAD boundaries within the utterance's speech give which
+    reference words it should contain, in proportion to time. The first
+    and last chunk are anchored to the reference start and end; a middle
+    chunk's span keeps its time-based length, but may slide by up to a
+    margin (ALIGN_MARGIN words, default at least 3 or 15% of the
+    utterance) to where it best matches the transcript. The span is never
+    fitted to the transcript's length, so dropped words still count as
+    deletions. The full text is kept under `utterance_text` and the chosen
+    word span under `reference_span`.
+
+    Single-chunk utterances are returned untouched.
+    """
+    if not alignment_enabled() or data.get("chunk_count", 1) <= 1:
+        return data
+
+    tokens = [token for token in data.get("original_text", "").split() if _normalize_text(token)]
+    if not tokens:
+        return data
+
+    reference = [_normalize_text(token) for token in tokens]
+    hypothesis = _normalize_text(data.get("transcribed_text", "")).split()
+    n = len(reference)
+
+    fraction_start, fraction_end = _speech_fraction(data)
+    a0, b0 = round(fraction_start * n), round(fraction_end * n)
+    margin = int(os.environ.get("ALIGN_MARGIN", "0")) or max(3, int(0.15 * n))
+
+    index = data.get("chunk_index", 0)
+    if index == 0:
+        span = (0, max(1, b0))
+    elif index == data["chunk_count"] - 1:
+        span = (min(a0, n - 1), n)
+    else:
+        length = max(1, b0 - a0)
+        lowest = max(0, a0 - margin)
+        a = _best_start(hypothesis, reference, range(lowest, max(lowest, min(n - length, a0 + margin)) + 1), length)
+        span = (a, min(n, a + length))
+
+    data["utterance_text"] = data.get("original_text", "")
+    data["original_text"] = " ".join(tokens[span[0]:span[1]])
+    data["reference_span"] = list(span)
+
+    return data
+
+
+def align_reference_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Batched `align_reference` for the batch graph."""
+    return [align_reference(data) for data in items]
@@ -1,6 +1,13 @@
 import re
-import jiwer
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from src.utils.wer_engine import word_error_rates
+
+# Chunks pass the quality gate with a (rounded) WER of at most 15%
+WER_THRESHOLD = 0.15
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
 
 
 def _normalize_text(text: str) -> str:
@@ -15,38 +22,117 @@ def _normalize_text(text: str) -> str:
 
     # Remove punctuation (everything not word characters or spaces)
     # also remove apostrophes
-    text = re.sub(r"[^\w\s]", "", text)
+    text = _PUNCTUATION.sub("", text)
 
     # Normalize whitespace
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _WHITESPACE.sub(" ", text).strip()
 
     return text
 
 
+class StreamingWerGate:
+    """
+    Decides during decoding whether a chunk can still pass the WER gate.
+
+    Segments the recognizer has finalized are fixed prefixes of the final
+    transcript F + S, and any alignment of the reference R against F + S
+    splits R into a part aligned with F and a part aligned with S, so
+
+        edits(R, F + S) >= min_j edits(R[:j], F)
+
+    That bound is the minimum of the last row of the word-level edit
+    distance table between F and the reference prefixes, which is extended
+    by one row per finalized word. Once `round(bound / len(R), 3)` exceeds
+    the threshold the final rounded WER must as well, so stopping there
+    yields the same verdict as `evaluate_wer` on the full transcript.
+
+    Instances only hold plain data, so they can travel to and from
+    transcription worker processes.
+    """
+
+    def __init__(self, original_text: str, threshold: float = WER_THRESHOLD):
+        self.threshold = threshold
+        self.reference: List[str] = _normalize_text(original_text).split()
+        # row[j] = edits(reference[:j], finalized words so far)
+        self.row = list(range(len(self.reference) + 1))
+        self.hypothesis_words = 0
+        self.lower_bound = 0.0
+        self.lost = False
+
+    def add_segment(self, text: str) -> bool:
+        """Feeds one finalized segment; returns True once the gate is lost."""
+        for word in _normalize_text(text).split():
+            self._add_word(word)
+
+        if not self.reference:
+            # evaluate_wer scores any words against an empty reference as 1.0
+            self.lower_bound = 1.0 if self.hypothesis_words else 0.0
+        else:
+            self.lower_bound = round(min(self.row) / len(self.reference), 3)
+
+        self.lost = self.lower_bound > self.threshold
+        return self.lost
+
+    def _add_word(self, word: str):
+        previous = self.row
+        row = [previous[0] + 1]
+        for j, ref_word in enumerate(self.reference, start=1):
+            row.append(min(
+                previous[j] + 1,  # inserted hypothesis word
+                row[j - 1] + 1,  # deleted reference word
+                previous[j - 1] + (ref_word != word),  # match / substitution
+            ))
+        self.row = row
+        self.hypothesis_words += 1
+
+
 def evaluate_wer(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Evaluates the transcribed text against the original text using
-    Word Error Rate (WER) via the jiwer algorithm.
+    Word Error Rate (WER), scored exactly like `jiwer.wer`.
+
+    Chunks whose transcription was stopped early by a `StreamingWerGate`
+    (`transcription_aborted`) fail the gate without rescoring the partial
+    transcript, and their `wer_score` is the lower bound that stopped them.
+    """
+    return evaluate_wer_batch([data])[0]
+
+
+def evaluate_wer_batch(items: List[Dict[str, Any]], threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Batched `evaluate_wer`: normalizes every chunk and scores all pairs with
+    a non-empty reference in one native edit-distance call. `threshold`
+    overrides WER_THRESHOLD (eg. when re-gating cached transcripts).
     """
-    original = _normalize_text(data.get("original_text", ""))
-    transcribed = _normalize_text(data.get("transcribed_text", ""))
+    threshold = WER_THRESHOLD if threshold is None else threshold
+    scored = []
+    for data in items:
+        if data.get("transcription_aborted"):
+            _apply_gate(data, data["wer_lower_bound"], threshold)
+            continue
 
-    # If both strings are empty after normalization, WER is 0
-    # (though realistically shouldn't happen unless bad VAD slice)
-    if not original and not transcribed:
-        wer_score = 0.0
-    elif not original:
-        # We transcribed words that weren't in the ground truth text at all
-        wer_score = 1.0
-    else:
-        wer_score = jiwer.wer(original, transcribed)
+        original = _normalize_text(data.get("original_text", ""))
+        transcribed = _normalize_text(data.get("transcribed_text", ""))
 
-    wer_score = round(wer_score, 3)
+        # If both strings are empty after normalization, WER is 0
+        # (though realistically shouldn't happen unless bad VAD slice)
+        if not original and not transcribed:
+            _apply_gate(data, 0.0, threshold)
+        elif not original:
+            # We transcribed words that weren't in the ground truth text at all
+            _apply_gate(data, 1.0, threshold)
+        else:
+            scored.append((data, original, transcribed))
 
-    # Enforce quality gate. Threshold is <= 15% (0.15)
-    passed_gate = wer_score <= 0.15
+    if scored:
+        rates = word_error_rates([original for _, original, _ in scored], [transcribed for _, _, transcribed in scored])
+        for (data, _, _), rate in zip(scored, rates.rates):
+            _apply_gate(data, round(float(rate), 3), threshold)
+
+    return items
 
-    data["wer_score"] = wer_score
-    data["pass"] = passed_gate
 
-    return data
+def _apply_gate(data: Dict[str, Any], wer_score: float, threshold: float):
+    # Enforce quality gate. Threshold is <= 15% (0.15) by default
+    data["wer_score"] = wer_score
+    data["pass"] = wer_score <= threshold
@@ -1,29 +1,183 @@
-from datasets import load_dataset
+import io
+import os
+
 import numpy as np
-from typing import Iterator, Dict, Any
-import librosa
-def fetch_hf_stream() -> Iterator[Dict[str, Any]]:
+import soundfile as sf
+from typing import Callable, Iterator, Dict, Any, Optional, Tuple
+
+from src.utils.audio_cache import AudioCache
+from src.utils.pcm import as_ingest_dtype, ingest_dtype
+from src.utils.prefetch import prefetch
+from src.utils.resample import resample
+
+_DATASET_ID = "mythicinfinity/libritts"
+_DATASET_NAME = "dev"
+_DATASET_SPLIT = "dev.clean"
+
+
+def load_dataset(*args, **kwargs):
+    """
+    `datasets.load_dataset`, importing `datasets` (seconds of startup) only
+    when the stream actually goes to the Hub, not for cached replays.
+    """
+    import datasets
+
+    return datasets.load_dataset(*args, **kwargs)
+
+
+def _decode_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts one raw HF row into the pipeline's utterance dictionary.
+    """
+    # Extract required fields based on the schema mapping tests
+    audio_data = item.get("audio", {})
+    if audio_data.get("bytes") is not None:
+        # Still encoded (see _encoded_audio): decode here, in the decode pool
+        audio_arr, original_sr = sf.read(io.BytesIO(audio_data["bytes"]), dtype="float32")
+        if audio_arr.ndim > 1:
+            audio_arr = audio_arr.mean(axis=1, dtype=np.float32)
+    else:
+        original_sr = audio_data.get("sampling_rate", 24000)
+        audio_arr = np.asarray(audio_data.get("array", []), dtype=np.float32)
+
+    # Silero VAD strictly requires 16000 or 8000 Hz, resample with the cached
+    # polyphase filter for this rate pair (RESAMPLE_QUALITY)
+    if original_sr != 16000 and len(audio_arr) > 0:
+        audio_arr = resample(audio_arr, orig_sr=original_sr, target_sr=16000)
+
+    # Held as AUDIO_DTYPE (float32, or int16 to halve memory) from here on
+    audio_arr = as_ingest_dtype(audio_arr)
+
+    return {
+        "audio_array": audio_arr,
+        "sample_rate": 16000,
+        "original_text": item.get("text_normalized", ""),
+        "dataset_id": _DATASET_ID,
+        "speaker_id": str(item.get("speaker_id", "")),
+        "utterance_id": str(item.get("id", "")),
+    }
+
+
+def _encoded_audio(dataset):
+    """
+    Streams the audio column as the encoded file bytes, so that decoding
+    moves off the thread reading the stream into the decode pool. Only real
+    HF datasets support this; local stand-ins already hold arrays.
+    """
+    if not hasattr(dataset, "cast_column"):
+        return dataset
+    from datasets import Audio
+
+    return dataset.cast_column("audio", Audio(decode=False))
+
+
+def prefetch_settings() -> Tuple[int, int, bool]:
+    """
+    (PREFETCH_DEPTH, DECODE_WORKERS, PREFETCH_ORDERED): how many utterances
+    are decoded ahead of the pipeline (default 8, 0 decodes inline on the
+    consumer's thread), by how many threads (default 2), and whether they
+    keep stream order (default 1; 0 yields them as soon as decoded).
+    """
+    return (
+        int(os.environ.get("PREFETCH_DEPTH", "8")),
+        int(os.environ.get("DECODE_WORKERS", "2")),
+        os.environ.get("PREFETCH_ORDERED", "1") != "0",
+    )
+
+
+def _positioned(dataset, position: int, owns: Optional[Callable[[str], bool]]):
+    """Pairs raw rows with their stream position, dropping rows `owns` rejects."""
+    for item in dataset:
+        if owns is None or owns(str(item.get("id") or f"{_DATASET_SPLIT}/{position}")):
+            yield position, item
+        position += 1
+
+
+def _decode_at(entry) -> Dict[str, Any]:
+    position, item = entry
+    return _with_position(_decode_item(item), position)
+
+
+def _with_position(record: Dict[str, Any], stream_index: int) -> Dict[str, Any]:
+    """
+    Stamps the utterance's position in the stream, which also stands in for
+    its id when the dataset row has none.
+    """
+    record["stream_index"] = stream_index
+    if not record.get("utterance_id"):
+        record["utterance_id"] = f"{_DATASET_SPLIT}/{stream_index}"
+    return record
+
+
+def fetch_hf_stream(
+    cache: Optional[AudioCache] = None, start: int = 0, owns: Optional[Callable[[str], bool]] = None,
+    ordered: Optional[bool] = None,
+) -> Iterator[Dict[str, Any]]:
     """
     Streams the parler-tts/libritts_r dataset from HuggingFace without downloading to disk.
     Yields chunks formatted for the AgenticSpeech pipeline.
+
+    With an `AudioCache`, the already decoded and resampled prefix of the
+    stream is replayed from local memory-mapped shards first, and only the
+    remainder is streamed (and written through to the cache) from the Hub.
+
+    `start` resumes the stream at that position (e.g. from a checkpoint)
+    without decoding the items before it. Every record carries its
+    `stream_index` and an `utterance_id`.
+
+    `owns` restricts the stream to the utterance ids it accepts (this
+    worker's shards, see src/utils/sharding.py); the others are skipped
+    before decoding, and `stream_index` stays the position in the full
+    stream. A sharded stream replays the cache but does not write to it,
+    since the cache holds the full stream.
+
+    Rows are read from the Hub on a background thread and decoded and
+    resampled in a small thread pool ahead of the consumer (see
+    `prefetch_settings`); `ordered` overrides PREFETCH_ORDERED. Out of
+    order streams are not written through to the cache either.
     """
+    stream_key = f"{_DATASET_ID}/{_DATASET_NAME}/{_DATASET_SPLIT}@16000"
+    cached_count = 0
+
+    if cache is not None:
+        for record in cache.read(stream_key, dtype=ingest_dtype()):
+            if cached_count >= start:
+                record = _with_position(record, cached_count)
+                if owns is None or owns(record["utterance_id"]):
+                    yield record
+            cached_count += 1
+
+        if cache.is_complete(stream_key):
+            return
+
     # Load dataset in streaming mode
-    dataset = load_dataset("mythicinfinity/libritts", name="dev", split="dev.clean", streaming=True)
+    dataset = load_dataset(_DATASET_ID, name=_DATASET_NAME, split=_DATASET_SPLIT, streaming=True)
+    position = max(cached_count, start)
+    if position:
+        dataset = dataset.skip(position)
 
-    for item in dataset:
-        # Extract required fields based on the schema mapping tests
-        audio_data = item.get("audio", {})
-        original_sr = audio_data.get("sampling_rate", 24000)
-        audio_arr = np.array(audio_data.get("array", []), dtype=np.float32)
-
-        # Silero VAD strictly requires 16000 or 8000 Hz, resample using librosa
-        if original_sr != 16000 and len(audio_arr) > 0:
-            audio_arr = librosa.resample(audio_arr, orig_sr=original_sr, target_sr=16000)
-
-        yield {
-            "audio_array": audio_arr,
-            "sample_rate": 16000,
-            "original_text": item.get("text_normalized", ""),
-            "dataset_id": "mythicinfinity/libritts",
-            "speaker_id": str(item.get("speaker_id", "")),
-        }
+    depth, decode_workers, prefetch_ordered = prefetch_settings()
+    ordered = prefetch_ordered if ordered is None else ordered
+    if depth > 0:
+        # Audio decoding moves into the pool along with resampling
+        entries = _positioned(_encoded_audio(dataset), position, owns)
+        records = prefetch(entries, _decode_at, decode_workers, depth, ordered)
+    else:
+        records = map(_decode_at, _positioned(dataset, position, owns))
+
+    # Skipping past the cached prefix would leave a gap, so only write through when contiguous.
+    contiguous = position == cached_count and owns is None and (ordered or depth == 0)
+    writer = cache.writer(stream_key) if cache is not None and contiguous else None
+    finished = False
+    try:
+        for record in records:
+            if writer is not None:
+                writer.append(record)
+            yield record
+        finished = True
+    finally:
+        if depth > 0:
+            records.close()
+        # Persist the partial shard as well when the consumer stops early.
+        if writer is not None:
+            writer.close(complete=finished)
@@ -1,62 +1,75 @@
+import os
 import uuid
-import io
-import soundfile as sf
-from typing import Dict, Any
+import asyncio
+import tempfile
+import threading
+import time
+import httpx
+from contextlib import nullcontext
+from typing import Callable, Dict, Any, List, Optional, Protocol, Tuple
+from src.utils.archive import INDEX_CONTENT_TYPE, SHARD_CONTENT_TYPE, TarShardWriter, shard_name
+from src.utils.audio_codec import encode_audio, get_codec
+from src.utils.pcm import padded_chunk
+from src.utils.rate_control import ROWS, UPLOAD, CircuitBreaker, UploadControl
+from src.utils.spool import RetrySpool
 from src.utils.supabase_client import get_supabase_client
 
+_BUCKET = "audio_chunks"
 
-def insert_db(data: Dict[str, Any]) -> Dict[str, Any]:
+# Namespace of the deterministic (uuid5) chunk ids.
+_CHUNK_NAMESPACE = uuid.UUID("fd07e84c-f746-44a5-b218-d403e8dd79f0")
+
+
+def _public_url(storage_path: str, base_url: Optional[str] = None) -> str:
     """
-    Takes the fully processed pipeline payload and inserts it into Supabase.
-    - Encodes raw audio to Wav bytes strictly in memory.
-    - Uploads the audio buffer to Supabase Storage `audio_chunks` bucket.
-    - Inserts the metadata payload into `speech_chunks` table.
+    Builds the public object URL locally instead of asking the storage API.
+    Mirrors `bucket.get_public_url` for our public `audio_chunks` bucket.
+    """
+    base_url = (base_url or os.environ.get("SUPABASE_URL", "")).rstrip("/")
+    return f"{base_url}/storage/v1/object/public/{_BUCKET}/{storage_path}"
 
-    If the upstream pipeline returned `pass=False` (ie. high WER), this node
-    skips the insertion and immediately returns the data dictionary.
+
+def _chunk_id(data: Dict[str, Any]) -> str:
     """
-    if not data.get("pass", False):
-        return data
+    Derives the chunk id from (dataset id, utterance id, sample offsets), so a
+    chunk re-processed after a restart maps onto the same storage object and
+    row and the writes below are idempotent. Chunks that lack that identity
+    (e.g. built by hand) get a random id as before.
+    """
+    if not data.get("utterance_id") or "start_sample" not in data or "end_sample" not in data:
+        return str(uuid.uuid4())
 
-    client = get_supabase_client()
+    name = f"{data.get('dataset_id', 'unknown_ds')}/{data['utterance_id']}/{data['start_sample']}-{data['end_sample']}"
+    return str(uuid.uuid5(_CHUNK_NAMESPACE, name))
 
-    # 1. Generate unique identifier for this chunk
-    chunk_id = str(uuid.uuid4())
-    dataset_id = data.get("dataset_id", "unknown_ds")
 
-    # 2. Convert Audio to In-Memory Wav Bytes
-    # Instead of writing a file to disk and immediately uploading it, we write
-    # to a BytesIO stream using soundfile to prevent disk I/O bottlenecks.
-    wav_io = io.BytesIO()
-    sf.write(
-        file=wav_io,
-        data=data["chunk_array"],
-        samplerate=data["sample_rate"],
-        format="WAV",
-        subtype="PCM_16",
-    )
-    wav_bytes = wav_io.getvalue()
-
-    # 3. Upload to Supabase Storage
-    # Pattern: audio_chunks/dataset_id/uuid.wav
-    storage_path = f"{dataset_id}/{chunk_id}.wav"
-    bucket = client.storage.from_("audio_chunks")
-
-    bucket.upload(
-        path=storage_path, file=wav_bytes, file_options={"content-type": "audio/wav"}
-    )
-
-    # Get public URL
-    public_url = bucket.get_public_url(storage_path)
-
-    # 4. Insert Metadata into Database
-    # This dictionary shape explicitly mirrors our `0000_initial_schema.sql`
-    # definitions.
-    payload = {
+def _encode_audio(data: Dict[str, Any]):
+    """
+    Converts the chunk audio to in-memory bytes with the configured codec
+    (AUDIO_CODEC, WAV by default), reusing bytes already produced by the
+    `encode_chunk` pipeline stage. Returns (audio_bytes, codec).
+    Instead of writing a file to disk and immediately uploading it, we write
+    to a BytesIO stream using soundfile to prevent disk I/O bottlenecks.
+    """
+    if "encoded_audio" in data:
+        return data["encoded_audio"], get_codec(data.get("audio_codec"))
+
+    codec = get_codec()
+    return encode_audio(padded_chunk(data), data["sample_rate"], codec), codec
+
+
+def _build_row(
+    data: Dict[str, Any], chunk_id: str, storage_path: str, base_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    This dictionary shape explicitly mirrors our `0000_initial_schema.sql`
+    definitions.
+    """
+    return {
         "id": chunk_id,
-        "dataset_id": dataset_id,
+        "dataset_id": data.get("dataset_id", "unknown_ds"),
         "speaker_id": str(data.get("speaker_id", "")),
-        "audio_url": public_url,
+        "audio_url": _public_url(storage_path, base_url),
         "original_text": data.get("original_text", ""),
         "aligned_text_with_timestamps": {
             "transcribed_text": data.get("transcribed_text", ""),
@@ -67,6 +80,652 @@ def insert_db(data: Dict[str, Any]) -> Dict[str, Any]:
         "status": "pending_review",  # Explicitly queue for HITL UI
     }
 
-    client.table("speech_chunks").insert(payload).execute()
+
+def _prepare_upload(
+    data: Dict[str, Any], base_url: Optional[str] = None
+) -> Tuple[str, bytes, str, Dict[str, Any]]:
+    """
+    CPU half of an insertion: assigns the chunk id, encodes the audio and
+    builds its row. Returns (storage_path, audio_bytes, content_type, row).
+    """
+    # 1. Deterministic identifier for this chunk
+    chunk_id = _chunk_id(data)
+    dataset_id = data.get("dataset_id", "unknown_ds")
+    audio_bytes, codec = _encode_audio(data)
+
+    # 2. Pattern: audio_chunks/dataset_id/uuid.<codec extension>
+    storage_path = f"{dataset_id}/{chunk_id}.{codec.extension}"
+
+    return storage_path, audio_bytes, codec.content_type, _build_row(data, chunk_id, storage_path, base_url)
+
+
+def _gate(control: Optional[UploadControl], kind: str = UPLOAD):
+    """One request's slot of the upload gate (no-op without one)."""
+    return control.slot(kind) if control is not None else nullcontext()
+
+
+def _upload_audio(client, data: Dict[str, Any], control: Optional[UploadControl] = None) -> Dict[str, Any]:
+    """
+    Encodes the chunk and uploads it to Supabase Storage, returning the
+    `speech_chunks` row describing it. Only the request itself holds a slot
+    of `control`; encoding happens outside it.
+    """
+    storage_path, audio_bytes, content_type, row = _prepare_upload(data)
+    _store_audio(client, storage_path, audio_bytes, content_type, control)
+    return row
+
+
+def _store_audio(
+    client, storage_path: str, audio_bytes: bytes, content_type: str, control: Optional[UploadControl] = None
+):
+    bucket = client.storage.from_(_BUCKET)
+    # Overwrite an object left behind by an interrupted earlier run.
+    with _gate(control):
+        bucket.upload(
+            path=storage_path, file=audio_bytes, file_options={"content-type": content_type, "upsert": "true"}
+        )
+
+
+def _insert_rows(client, rows, control: Optional[UploadControl] = None):
+    with _gate(control, ROWS):
+        client.table("speech_chunks").upsert(rows, ignore_duplicates=True).execute()
+
+
+def insert_db(data: Dict[str, Any], control: Optional[UploadControl] = None) -> Dict[str, Any]:
+    """
+    Takes the fully processed pipeline payload and inserts it into Supabase.
+    - Encodes raw audio (WAV, FLAC or Opus per AUDIO_CODEC) strictly in memory.
+    - Uploads the audio buffer to Supabase Storage `audio_chunks` bucket.
+    - Inserts the metadata payload into `speech_chunks` table. Rows are
+      upserted with `ignore_duplicates`, so re-running a chunk is a no-op and
+      never resets the review status of an existing row.
+
+    If the upstream pipeline returned `pass=False` (ie. high WER), this node
+    skips the insertion and immediately returns the data dictionary. Both
+    requests go through `control` (adaptive concurrency / rate cap) if given.
+    """
+    if not data.get("pass", False):
+        return data
+
+    client = get_supabase_client()
+
+    payload = _upload_audio(client, data, control)
+    _insert_rows(client, payload, control)
 
     return data
+
+
+def insert_db_batch(items: List[Dict[str, Any]], control: Optional[UploadControl] = None) -> List[Dict[str, Any]]:
+    """
+    Batched `insert_db` for the batch graph: uploads the audio of every
+    passing chunk (storage has no multi-object upload), then writes all
+    their rows with one multi-row upsert. A chunk whose upload fails gets
+    an `error` and no row; a failed row insert marks every uploaded chunk.
+    """
+    passing = [data for data in items if data.get("pass", False)]
+    if not passing:
+        return items
+
+    client = get_supabase_client()
+    rows, uploaded = [], []
+    for data in passing:
+        try:
+            rows.append(_upload_audio(client, data, control))
+            uploaded.append(data)
+        except Exception as e:
+            data["error"] = f"insert_db: {e}"
+
+    if rows:
+        try:
+            _insert_rows(client, rows, control)
+        except Exception as e:
+            for data in uploaded:
+                data["error"] = f"insert_db: {e}"
+
+    return items
+
+
+class InsertSink(Protocol):
+    """
+    What the pipeline expects of an insertion stage that buffers: `write` is
+    the node function (passing chunks are handed over, every chunk is
+    returned), `flush` makes everything written so far durable (the
+    checkpoint calls it before saving) and `close` flushes and stops it.
+    """
+
+    def write(self, data: Dict[str, Any]) -> Dict[str, Any]: ...
+
+    def flush(self): ...
+
+    def close(self): ...
+
+
+class BufferedInsertSink:
+    """
+    Buffered alternative to the `insert_db` node for the streaming pipeline.
+
+    Audio is still uploaded per chunk (storage has no multi-object upload),
+    but metadata rows are collected and written as one multi-row insert
+    every `batch_size` chunks or once the oldest buffered row is
+    `flush_interval_ms` old, whichever comes first. Rows of a failed insert
+    stay buffered for the next flush, and `close()` flushes whatever is left
+    when the stream ends. Uploads and inserts go through `control` if given.
+    """
+
+    def __init__(
+        self, batch_size: int = 50, flush_interval_ms: int = 1000, control: Optional[UploadControl] = None
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.control = control
+
+        self._rows: List[Dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        self._timer = threading.Thread(target=self._flush_periodically, name="insert-sink-timer", daemon=True)
+        self._timer.start()
+
+    def write(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Node-compatible entrypoint: uploads a passing chunk's audio and
+        buffers its row. Chunks with `pass=False` are returned untouched.
+        """
+        if not data.get("pass", False):
+            return data
+
+        payload = _upload_audio(get_supabase_client(), data, self.control)
+
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(payload)
+            is_full = len(self._rows) >= self.batch_size
+
+        if is_full:
+            self.flush()
+
+        return data
+
+    def flush(self):
+        """Writes every buffered row with a single multi-row insert."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._oldest = None
+
+            if not rows:
+                return
+
+            try:
+                _insert_rows(get_supabase_client(), rows, self.control)
+            except Exception:
+                # Keep the rows (ahead of newer ones) for the next attempt.
+                with self._lock:
+                    self._rows = rows + self._rows
+                    self._oldest = time.monotonic()
+                raise
+
+    def close(self):
+        """Stops the flush timer and writes any remaining rows."""
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval / 4):
+            with self._lock:
+                is_due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+
+            if is_due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"  [Error] Buffered insert failed, retrying on next flush: {str(e)}")
+
+
+# Stops the asyncio upload workers once the queue has drained.
+_STOP = object()
+
+
+class AsyncInsertSink:
+    """
+    Asyncio-native insertion stage talking to the Supabase REST APIs directly.
+
+    A single background thread runs an event loop with one pooled
+    `httpx.AsyncClient` (keep-alive connections, at most `max_concurrency`
+    of them), so hundreds of uploads can be in flight without a thread each.
+    CPU stages hand chunks over through `write()`: the audio is encoded on
+    the calling thread, then the job is placed on a bounded asyncio queue,
+    blocking the caller while the queue is full. Rows of uploaded chunks are
+    written in multi-row inserts every `batch_size` rows or
+    `flush_interval_ms`, like `BufferedInsertSink`.
+
+    Uploads happen after `write()` returns, so failures are counted in
+    `failed` and logged rather than raised into the pipeline. The chunk has
+    left the pipeline by then, so `on_failure(chunk)` is called with its
+    `stream_index` / `utterance_id` (the checkpoint passes `reopen`, which
+    keeps the utterance pending), and the next `flush()` raises.
+
+    With `control`, every request waits for a slot of it: its adaptive
+    limit then decides how many of the `max_concurrency` connections are
+    actually in use.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        key: Optional[str] = None,
+        max_concurrency: int = 64,
+        queue_size: int = 256,
+        batch_size: int = 50,
+        flush_interval_ms: int = 1000,
+        timeout: float = 30.0,
+        control: Optional[UploadControl] = None,
+        on_failure: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.url = (url or os.environ.get("SUPABASE_URL", "")).rstrip("/")
+        key = key or os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+
+        if not self.url or not key:
+            raise RuntimeError(
+                "Missing Supabase credentials. Ensure SUPABASE_URL and "
+                "SUPABASE_SERVICE_ROLE_KEY are set in the environment."
+            )
+
+        self._headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.timeout = timeout
+        self.control = control
+        self.on_failure = on_failure
+
+        self.uploaded = 0
+        self.failed = 0
+        # Uploads failed since the last flush()
+        self._unreported_failures = 0
+        self._rows: List[Dict[str, Any]] = []
+
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="async-insert-sink", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def write(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Node-compatible entrypoint: encodes a passing chunk and queues its
+        upload. Chunks with `pass=False` are returned untouched.
+        """
+        if not data.get("pass", False):
+            return data
+
+        job = _prepare_upload(data, self.url) + (
+            {"stream_index": data.get("stream_index"), "utterance_id": data.get("utterance_id")},
+        )
+        asyncio.run_coroutine_threadsafe(self._queue.put(job), self._loop).result()
+
+        return data
+
+    def flush(self):
+        """
+        Blocks until every chunk written so far is uploaded (or counted as
+        failed) and its row inserted. Raises if the rows could not be inserted
+        or if any upload failed since the last flush.
+        """
+        asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result()
+
+    def close(self):
+        """Drains queued uploads, inserts the remaining rows and stops the loop."""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._client = httpx.AsyncClient(
+            base_url=self.url,
+            headers=self._headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        self._flush_lock = asyncio.Lock()
+        self._workers = [self._loop.create_task(self._upload_worker()) for _ in range(self.max_concurrency)]
+        self._timer = self._loop.create_task(self._flush_periodically())
+        self._loop.call_soon(self._ready.set)
+        self._loop.run_forever()
+
+    async def _upload_worker(self):
+        while True:
+            job = await self._queue.get()
+            if job is _STOP:
+                return
+
+            try:
+                await self._upload(job)
+            finally:
+                self._queue.task_done()
+
+    async def _upload(self, job):
+        storage_path, audio_bytes, content_type, row, chunk = job
+        try:
+            async with self._gate():
+                response = await self._client.post(
+                    f"/storage/v1/object/{_BUCKET}/{storage_path}",
+                    content=audio_bytes,
+                    headers={"content-type": content_type, "x-upsert": "true"},
+                )
+                response.raise_for_status()
+        except Exception as e:
+            self.failed += 1
+            self._unreported_failures += 1
+            print(f"  [Error] Async upload failed for {storage_path}: {str(e)}")
+            if self.on_failure is not None:
+                self.on_failure(chunk)
+            return
+
+        self.uploaded += 1
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            await self._flush()
+
+    async def _flush(self) -> bool:
+        """Inserts the buffered rows; returns False if they had to be kept."""
+        async with self._flush_lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return True
+
+            try:
+                async with self._gate(ROWS):
+                    response = await self._client.post(
+                        "/rest/v1/speech_chunks",
+                        json=rows,
+                        headers={"Prefer": "resolution=ignore-duplicates,return=minimal"},
+                    )
+                    response.raise_for_status()
+            except asyncio.CancelledError:
+                # The timer's flush is cancelled on shutdown (possibly while waiting for a slot):
+                # the final flush inserts these rows instead.
+                self._rows = rows + self._rows
+                raise
+            except Exception as e:
+                # Keep the rows (ahead of newer ones) for the next attempt.
+                self._rows = rows + self._rows
+                print(f"  [Error] Async insert failed, retrying on next flush: {str(e)}")
+                return False
+
+            return True
+
+    def _gate(self, kind: str = UPLOAD):
+        return self.control.async_slot(kind) if self.control is not None else nullcontext()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    async def _drain(self):
+        await self._queue.join()
+        if not await self._flush():
+            raise RuntimeError("Buffered speech_chunks rows could not be inserted")
+
+        failures, self._unreported_failures = self._unreported_failures, 0
+        if failures:
+            raise RuntimeError(f"{failures} audio upload(s) failed since the last flush")
+
+    async def _shutdown(self):
+        for _ in self._workers:
+            await self._queue.put(_STOP)
+        await asyncio.gather(*self._workers)
+        self._timer.cancel()
+        await self._flush()
+        await self._client.aclose()
+
+
+class ArchiveInsertSink:
+    """
+    Insertion stage that packs chunks into size-bounded WebDataset tar
+    shards instead of uploading one object per chunk.
+
+    Each passing chunk's encoded audio and its metadata (transcript, aligned
+    words, WER) are appended to the open shard in `staging_dir`. Once the
+    shard reaches `max_shard_bytes`, or on `flush()`, it is sealed and
+    published: the tar and its index are handed to `store` (a local
+    directory or a Storage bucket, see src/utils/archive.py). Then the rows
+    of its chunks are inserted with one multi-row upsert. Each row's
+    `audio_url` is the shard, and `audio_offset` / `audio_length` give the
+    byte range of the chunk's audio in it, so rows never point at
+    unpublished data. A shard that fails to publish is kept and retried on
+    the next seal or flush; only `flush()` raises the failure.
+
+    With a checkpoint, use `publish_sealed` as its save hook rather than
+    `flush`: sealing on every save would cut a tiny shard each interval.
+    Chunks still in the open shard are not durable yet, so `on_staged` is
+    called for each chunk appended (the checkpoint's `hold`) and
+    `on_published` once its shard and row are out (the checkpoint's
+    `finish`), which keeps their utterances pending until then.
+    """
+
+    def __init__(
+        self, store, staging_dir: Optional[str] = None, max_shard_bytes: int = 256 * 1024 * 1024,
+        prefix: str = "shards", on_staged: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_published: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.store = store
+        self.staging_dir = staging_dir or os.path.join(tempfile.gettempdir(), "agentic-speech-shards")
+        self.max_shard_bytes = max_shard_bytes
+        self.prefix = prefix
+        self.on_staged = on_staged
+        self.on_published = on_published
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+        self.published = 0
+        self._shard: Optional[TarShardWriter] = None
+        self._rows: List[Dict[str, Any]] = []
+        # (stream index, utterance id) of the chunks in the open shard
+        self._chunks: List[Dict[str, Any]] = []
+        # Sealed shards not fully published yet, with the rows and identities of their chunks
+        self._sealed: List[Tuple[TarShardWriter, List[Dict[str, Any]], List[Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+
+    def write(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Node-compatible entrypoint: appends a passing chunk to the open shard.
+        Chunks with `pass=False` are returned untouched.
+        """
+        if not data.get("pass", False):
+            return data
+
+        chunk_id = _chunk_id(data)
+        audio_bytes, codec = _encode_audio(data)
+        row = _build_row(data, chunk_id, "")
+        metadata = {
+            "id": chunk_id,
+            "utterance_id": data.get("utterance_id"),
+            "sample_rate": data.get("sample_rate"),
+            **{key: row[key] for key in ("dataset_id", "speaker_id", "original_text", "wer_score", "duration")},
+            **row["aligned_text_with_timestamps"],
+        }
+
+        with self._lock:
+            if self._shard is None:
+                name = shard_name(self.prefix)
+                self._shard = TarShardWriter(os.path.join(self.staging_dir, os.path.basename(name)), name)
+            offset, length = self._shard.add(chunk_id, codec.extension, audio_bytes, metadata)
+            row.update(audio_url=self.store.url(self._shard.name), audio_offset=offset, audio_length=length)
+            self._rows.append(row)
+            chunk = {"stream_index": data.get("stream_index"), "utterance_id": data.get("utterance_id")}
+            self._chunks.append(chunk)
+            if self.on_staged is not None:
+                self.on_staged(chunk)
+            is_full = self._shard.bytes >= self.max_shard_bytes
+            if is_full:
+                self._seal()
+
+        if is_full:
+            # The chunk is staged either way; a shard that fails to publish stays queued for the next attempt.
+            try:
+                self._publish()
+            except Exception as e:
+                print(f"  [Error] Archive shard publish failed, retrying on next flush: {str(e)}")
+
+        return data
+
+    def flush(self):
+        """Seals the open shard and publishes every sealed one with its rows."""
+        with self._lock:
+            if self._shard is not None:
+                self._seal()
+        self._publish()
+
+    def publish_sealed(self):
+        """Publishes the shards sealed so far, leaving the open one to fill up."""
+        self._publish()
+
+    def close(self):
+        self.flush()
+
+    def _seal(self):
+        self._shard.close()
+        self._sealed.append((self._shard, self._rows, self._chunks))
+        self._shard, self._rows, self._chunks = None, [], []
+
+    def _publish(self):
+        with self._publish_lock:
+            while True:
+                with self._lock:
+                    if not self._sealed:
+                        return
+                    shard, rows, chunks = self._sealed[0]
+
+                # Stores consume the staged file once it is published, so a retry skips it.
+                for name, path, content_type in (
+                    (shard.name, shard.path, SHARD_CONTENT_TYPE),
+                    (f"{shard.name}.index.json", shard.index_path, INDEX_CONTENT_TYPE),
+                ):
+                    if os.path.exists(path):
+                        self.store.put(name, path, content_type)
+                get_supabase_client().table("speech_chunks").upsert(rows, ignore_duplicates=True).execute()
+
+                with self._lock:
+                    self._sealed.pop(0)
+                self.published += 1
+                if self.on_published is not None:
+                    for chunk in chunks:
+                        self.on_published(chunk)
+
+
+class SpoolingInsertSink:
+    """
+    Per-chunk insertion like the `insert_db` node that never loses a chunk
+    to a failed request: if the upload or the row insert raises, the
+    encoded audio and its row go to `spool` (see src/utils/spool.py) and
+    the chunk leaves the pipeline with `insert_spooled` set instead of an
+    `error`. Both writes are idempotent, so replaying a half-done insertion
+    is safe.
+
+    A background thread replays due jobs every `replay_interval` seconds,
+    and jobs left over from an earlier run too. `breaker` opens after
+    consecutive failures. While it is open, `write` spools right away
+    without touching the network, so the insert stage keeps pace with the
+    CPU stages during an outage. Replays wait for the breaker's probe.
+    """
+
+    def __init__(
+        self, spool: RetrySpool, breaker: Optional[CircuitBreaker] = None, control: Optional[UploadControl] = None,
+        replay_interval: float = 1.0,
+    ):
+        self.spool = spool
+        self.breaker = breaker or CircuitBreaker()
+        self.control = control
+        self.replay_interval = replay_interval
+
+        self.spooled = 0
+        self.replayed = 0
+        self._replay_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._replayer = threading.Thread(target=self._replay_periodically, name="insert-spool-replayer", daemon=True)
+        self._replayer.start()
+
+    def write(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Node-compatible entrypoint: inserts a passing chunk, or spools it.
+        Chunks with `pass=False` are returned untouched.
+        """
+        if not data.get("pass", False):
+            return data
+
+        storage_path, audio_bytes, content_type, row = _prepare_upload(data)
+        if not self.breaker.allow():
+            error = "circuit open"
+        else:
+            try:
+                self._store(storage_path, audio_bytes, content_type, row)
+                self.breaker.record_success()
+                return data
+            except Exception as e:
+                self.breaker.record_failure()
+                error = str(e)
+
+        self.spool.put(row["id"], storage_path, audio_bytes, content_type, row, error)
+        self.spooled += 1
+        data["insert_spooled"] = error
+        return data
+
+    def replay(self) -> int:
+        """Retries every due job while the breaker allows it; returns how many were inserted."""
+        inserted = 0
+        with self._replay_lock:
+            for job in self.spool.due():
+                if not self.breaker.allow():
+                    break
+                try:
+                    self._store(job["storage_path"], self.spool.audio(job), job["content_type"], job["row"])
+                except Exception as e:
+                    self.breaker.record_failure()
+                    self.spool.failed(job, str(e))
+                    continue
+
+                self.breaker.record_success()
+                self.spool.succeeded(job)
+                inserted += 1
+        self.replayed += inserted
+        return inserted
+
+    def flush(self):
+        """Nothing is buffered: once `write` returns, a chunk is inserted or on disk."""
+
+    def close(self):
+        """Stops the replayer after a last replay; jobs still pending wait for the next run."""
+        self._closed.set()
+        self._replayer.join()
+        self.replay()
+        if self.spool.pending_count():
+            print(
+                f"  [Warning] {self.spool.pending_count()} failed insertions remain in {self.spool.pending_dir}; "
+                "they are retried on the next run"
+            )
+
+    def _store(self, storage_path: str, audio_bytes: bytes, content_type: str, row: Dict[str, Any]):
+        client = get_supabase_client()
+        _store_audio(client, storage_path, audio_bytes, content_type, self.control)
+        _insert_rows(client, row, self.control)
+
+    def _replay_periodically(self):
+        while not self._closed.wait(self.replay_interval):
+            # A failed replay pass must not stop the thread; the next one may succeed.
+            try:
+                self.replay()
+            except Exception as e:
+                print(f"  [Error] Spool replay failed: {str(e)}")
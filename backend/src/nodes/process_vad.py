@@ -1,24 +1,85 @@
-import torch
+import os
+import threading
 import numpy as np
 from typing import Dict, List, Any
 
+from src.utils.pcm import to_float32
+from src.utils.vad_engine import TorchJitEngine, SileroOnnxEngine, _bundled_jit_path
+
 # Lazy-load model to save RAM until called
 _vad_model = None
 _get_speech_timestamps = None
+_vad_engine = None
+# Concurrent first callers (VAD workers, the startup warm-up) load the engine once
+_load_lock = threading.Lock()
+
+# Chunks are merged / split / padded to MIN_CHUNK_SECONDS <= d <= MAX_CHUNK_SECONDS
+MIN_CHUNK_SECONDS = 5.0
+MAX_CHUNK_SECONDS = 15.0
+
+
+def _model_file(variable: str) -> str:
+    # A configured model path must exist; failing here beats failing in the first worker.
+    path = os.environ.get(variable)
+    if path and not os.path.isfile(path):
+        raise FileNotFoundError(f"{variable} '{path}' does not exist")
+    return path or None
 
 
 def _load_silero():
     global _vad_model, _get_speech_timestamps
     if _vad_model is None:
-        # Load silero-vad
-        model, utils = torch.hub.load(
-            repo_or_dir="snakers4/silero-vad",
-            model="silero_vad",
-            force_reload=False,
-            onnx=False,
-        )
+        # torch is only imported by the jit backend
+        import torch
+        from silero_vad import get_speech_timestamps
+
+        # VAD_JIT_PATH, else the model bundled in the silero-vad wheel (no torch.hub fetch)
+        model = torch.jit.load(_model_file("VAD_JIT_PATH") or _bundled_jit_path(), map_location="cpu")
+        model.eval()
+        _get_speech_timestamps = get_speech_timestamps
         _vad_model = model
-        _get_speech_timestamps = utils[0]
+
+
+def _load_engine():
+    """
+    Selects the VAD engine from the environment:
+    - VAD_BACKEND: `jit` (default, Silero's PyTorch JIT model) or `onnx` (batched ONNX Runtime CPU).
+    - VAD_JIT_PATH / VAD_ONNX_PATH: local model files, defaulting to the ones
+      bundled in the silero-vad wheel.
+    - VAD_SAMPLE_RATE: 16000 (default) or 8000. Timestamps always map back to 16kHz.
+    """
+    global _vad_engine
+    if _vad_engine is not None:
+        return
+
+    with _load_lock:
+        if _vad_engine is not None:
+            return
+
+        backend = os.environ.get("VAD_BACKEND", "jit")
+        vad_sample_rate = int(os.environ.get("VAD_SAMPLE_RATE", "16000"))
+
+        if backend == "onnx":
+            engine = SileroOnnxEngine(model_path=_model_file("VAD_ONNX_PATH"), vad_sample_rate=vad_sample_rate)
+        elif backend == "jit":
+            _load_silero()
+            engine = TorchJitEngine(_vad_model, _get_speech_timestamps, vad_sample_rate)
+        else:
+            raise ValueError(f"Unknown VAD_BACKEND '{backend}', expected 'jit' or 'onnx'")
+        _vad_engine = engine
+
+
+def vad_params() -> Dict[str, Any]:
+    """
+    The settings that decide where chunks are cut, for keying anything
+    derived from chunk audio (eg. the transcript cache).
+    """
+    return {
+        "backend": os.environ.get("VAD_BACKEND", "jit"),
+        "sample_rate": int(os.environ.get("VAD_SAMPLE_RATE", "16000")),
+        "min_chunk_seconds": MIN_CHUNK_SECONDS,
+        "max_chunk_seconds": MAX_CHUNK_SECONDS,
+    }
 
 
 def process_vad(data: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -26,26 +87,41 @@ def process_vad(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     Takes the raw audio array, applies Silero VAD to find speech regions,
     and returns chunks constrained between 5-15 seconds.
     """
-    _load_silero()
+    return process_vad_batch([data])[0]
+
+
+def process_vad_batch(items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Batched variant of `process_vad`: runs VAD over several utterances in one
+    engine call (a single batched inference per window with the ONNX engine)
+    and returns the list of chunks for each input utterance.
 
-    audio_full = data["audio_array"]
-    sr = data["sample_rate"]
+    Chunk audio is a view into the utterance's `audio_array` (any dtype the
+    pipeline holds audio in); short chunks record their trailing silence as
+    `pad_samples` instead of copying the audio to pad it.
+    """
+    _load_engine()
 
-    # Silero works best at 16k.
-    # We will compute timestamps based on the provided sample rate,
-    # but strictly speaking PyTorch tensors are expected.
-    tensor_audio = torch.from_numpy(audio_full)
+    audios = []
+    for data in items:
+        audio_full = data["audio_array"]
+        if audio_full.ndim > 1:
+            audio_full = audio_full.squeeze()
+        audios.append(audio_full)
 
-    if len(tensor_audio.shape) > 1:
-        tensor_audio = tensor_audio.squeeze()
+    # All items come from the same stream, so they share one sample rate.
+    sr = items[0]["sample_rate"] if items else 16000
 
-    # Get timestamps in samples (default output of silero)
-    # Note: For production fidelity, audio should be resampled to 16kHz if not already.
-    # For MVP we pass `sampling_rate=sr`.
-    speech_timestamps = _get_speech_timestamps(
-        tensor_audio, _vad_model, sampling_rate=sr
-    )
+    # Get timestamps in samples of the input audio (int16 audio is scored on a transient float copy)
+    all_timestamps = _vad_engine.speech_timestamps_batch([to_float32(audio) for audio in audios], sr)
 
+    return [
+        _chunks_from_timestamps(audio_full, data["sample_rate"], speech_timestamps)
+        for data, audio_full, speech_timestamps in zip(items, audios, all_timestamps)
+    ]
+
+
+def _chunks_from_timestamps(audio_full, sr, speech_timestamps) -> List[Dict[str, Any]]:
     # Strategy: Merge short segments, split long segments
     # to enforce chunks of duration 5.0s <= d <= 15.0s
     chunks = []
@@ -53,8 +129,8 @@ def process_vad(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     current_chunk_start = -1
     current_chunk_end = -1
 
-    min_length_samples = int(5.0 * sr)
-    max_length_samples = int(15.0 * sr)
+    min_length_samples = int(MIN_CHUNK_SECONDS * sr)
+    max_length_samples = int(MAX_CHUNK_SECONDS * sr)
 
     for ts in speech_timestamps:
         start_samples = ts["start"]
@@ -128,35 +204,32 @@ def _flush_chunk(chunks, audio_full, sr, start, end, min_len, max_len):
             chunks.append(
                 {
                     "chunk_array": arr,
+                    "pad_samples": 0,
                     "start_time": sub_start / sr,
                     "end_time": sub_end / sr,
+                    "start_sample": int(sub_start),
+                    "end_sample": int(sub_end),
                     "duration": dur,
                     "sample_rate": sr,
                 }
             )
     else:
-        # Check if padding is required to reach 5s
-        if total_len < min_len:
-            # Add silence padding to reach exactly 5.0 seconds
-            pad_amount = min_len - total_len
-            arr = np.concatenate(
-                [audio_full[start:end], np.zeros(pad_amount, dtype=np.float32)]
-            )
-            sub_start = start
-            sub_end = start + min_len
-        else:
-            arr = audio_full[start:end]
-            sub_start = start
-            sub_end = end
-
-        dur = len(arr) / sr
+        # Short chunks are padded with silence to exactly 5.0 seconds. The
+        # padding is only recorded: the chunk stays a view of the utterance.
+        pad_amount = max(min_len - total_len, 0)
+        arr = audio_full[start:end]
+        sub_start = start
+        sub_end = end + pad_amount
 
         chunks.append(
             {
                 "chunk_array": arr,
+                "pad_samples": int(pad_amount),
                 "start_time": sub_start / sr,
                 "end_time": sub_end / sr,
-                "duration": dur,
+                "start_sample": int(sub_start),
+                "end_sample": int(sub_end),
+                "duration": (len(arr) + pad_amount) / sr,
                 "sample_rate": sr,
             }
         )
@@ -1,62 +1,333 @@
 import json
-from typing import Dict, Any
+import multiprocessing
+import os
+import queue
+import threading
+from contextlib import contextmanager
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 from vosk import Model, KaldiRecognizer
 
+from src.nodes.align_reference import reference_is_final
+from src.nodes.evaluate_wer import StreamingWerGate
+from src.utils.pcm import to_pcm16
+from src.utils.shared_audio import AudioHandle, attach_view
+
 # Lazy-load model to save resources when not in use
 _vosk_model = None
+# Idle recognizers for `_vosk_model`, reused across chunks instead of rebuilt
+_recognizers = None
+# Language of the default small Vosk model
+_MODEL_LANG = "en-us"
+# Concurrent first callers (transcription workers, the startup warm-up) load the model once
+_load_lock = threading.Lock()
+
+
+def model_path() -> Optional[str]:
+    """
+    The unpacked Vosk model directory from VOSK_MODEL_PATH, or None to use
+    the default small English model (which vosk downloads on first use).
+    Raises FileNotFoundError when the configured directory is missing.
+    """
+    path = os.environ.get("VOSK_MODEL_PATH")
+    if path and not os.path.isdir(path):
+        raise FileNotFoundError(f"VOSK_MODEL_PATH '{path}' is not a directory")
+    return path or None
+
 
 def _load_model():
-    global _vosk_model
-    if _vosk_model is None:
-        # Load the default small English model
-        # You can specify the model path here if you have downloaded a specific one
-        # vosk downloads this on first execution of Model(model_name="...") if missing
-        _vosk_model = Model(lang="en-us")
+    global _vosk_model, _recognizers
+    if _vosk_model is not None:
+        return
 
+    with _load_lock:
+        if _vosk_model is None:
+            path = model_path()
+            model = Model(model_path=path) if path else Model(lang=_MODEL_LANG)
+            # The pool exists before the model is published to lock-free readers.
+            _recognizers = queue.SimpleQueue()
+            _vosk_model = model
 
-def transcribe_vosk(data: Dict[str, Any]) -> Dict[str, Any]:
+
+def model_id() -> str:
     """
-    Transcribes the audio chunk using Vosk and performs word-level timestamp alignment.
-    This replaces the heavy WhisperX usage for low-resource environments.
+    Identifies the decoder setup for the transcript cache: VOSK_MODEL_ID if
+    set (bump it when the downloaded model changes), else the model
+    directory name or language, plus the frame size, which shifts where Vosk
+    finalizes segments.
     """
-    _load_model()
-    
-    # Audio from process_vad is expected to be a numpy array. 
-    # We need to convert it to raw bytes for Vosk, 
-    # making sure it's 16kHz, 16-bit mono PCM.
-    import numpy as np
-    audio_np = data["chunk_array"]
-    # Ensure standard format (-1.0 to 1.0 -> Int16)
-    audio_int16 = (audio_np * 32767).astype(np.int16)
-    audio_bytes = audio_int16.tobytes()
-
-    # The sampling rate is 16kHz as configured in process_vad.py
-    rec = KaldiRecognizer(_vosk_model, 16000)
-    
-    # Enable word-level details
-    rec.SetWords(True)
-
-    # Process all audio bytes
-    rec.AcceptWaveform(audio_bytes)
-    
-    # Retrieve the final result
-    result_json = rec.FinalResult()
-    result_dict = json.loads(result_json)
-
-    transcribed_text = result_dict.get("text", "")
+    path = os.environ.get("VOSK_MODEL_PATH")
+    default = os.path.basename(os.path.normpath(path)) if path else "vosk-" + _MODEL_LANG
+    return f"{os.environ.get('VOSK_MODEL_ID') or default}/{_frame_samples()}"
+
+
+class _PooledRecognizer:
+    """
+    A KaldiRecognizer kept alive between chunks. FinalResult() ends the
+    chunk and the next AcceptWaveform() starts a fresh decoding round, but
+    Vosk keeps counting word times from the recognizer's creation, so the
+    samples fed so far are tracked to shift times back to the chunk start.
+    """
+
+    def __init__(self, model):
+        self.rec = KaldiRecognizer(model, 16000)
+        # Enable word-level details
+        self.rec.SetWords(True)
+        self.samples_fed = 0
+
+
+@contextmanager
+def _borrow_recognizer() -> Iterator[_PooledRecognizer]:
+    """
+    Hands out an idle recognizer, building one only when every existing
+    recognizer is busy, so the pool grows to the number of concurrent
+    workers. A recognizer abandoned mid-chunk is dropped rather than reused,
+    since its time offset is no longer exact.
+    """
+    try:
+        recognizer = _recognizers.get_nowait()
+    except queue.Empty:
+        recognizer = _PooledRecognizer(_vosk_model)
+
+    yield recognizer
+    _recognizers.put(recognizer)
+
+
+def _frame_samples() -> int:
+    # VOSK_FRAME_MS of 16kHz audio per AcceptWaveform call (default 200 ms)
+    return int(16000 * int(os.environ.get("VOSK_FRAME_MS", "200")) / 1000)
+
+
+def _to_pcm16(audio_np) -> bytes:
+    """
+    Audio from process_vad is expected to be a numpy array.
+    We need to convert it to raw bytes for Vosk,
+    making sure it's 16kHz, 16-bit mono PCM.
+    Int16 audio (AUDIO_DTYPE=int16) is only copied out, not converted.
+    """
+    return to_pcm16(audio_np).tobytes()
+
+
+def _pcm16_frames(
+    audio: Union[bytes, np.ndarray], frame_samples: Optional[int] = None, pad_samples: int = 0
+) -> Iterator[bytes]:
+    """
+    Splits a chunk (float or int16 audio, or PCM16 bytes) followed by
+    `pad_samples` of silence into fixed-size PCM16 frames, converting audio
+    one frame at a time. The frames are the same as for the padded chunk.
+    """
+    frame_samples = frame_samples or _frame_samples()
+
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        samples = len(audio) // 2
+
+        def frame(start, end):
+            return bytes(audio[2 * start:2 * end])
+    else:
+        samples = len(audio)
+
+        def frame(start, end):
+            return _to_pcm16(audio[start:end])
+
+    for start in range(0, samples + pad_samples, frame_samples):
+        end = start + frame_samples
+        silence = max(0, min(end, samples + pad_samples) - max(start, samples))
+        if start >= samples:
+            yield bytes(2 * silence)
+        elif silence:
+            yield frame(start, samples) + bytes(2 * silence)
+        else:
+            yield frame(start, end)
+
+
+def _parse_words(segment: Dict[str, Any], offset: float) -> List[Dict[str, Any]]:
     aligned_words = []
+    for word_info in segment.get("result", []):
+        aligned_words.append({
+            "word": word_info.get("word", ""),
+            "start": round(word_info.get("start", 0.0) - offset, 3),
+            "end": round(word_info.get("end", 0.0) - offset, 3),
+            "confidence": round(word_info.get("conf", 0.0), 3),
+        })
+    return aligned_words
+
+
+def transcribe_frames(
+    frames: Iterable[Union[bytes, np.ndarray]], gate: Optional[StreamingWerGate] = None
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Decodes a chunk fed as consecutive 16kHz frames (PCM16 bytes or float
+    arrays) on a pooled recognizer and returns (transcribed_text,
+    aligned_words). Frames are decoded as they arrive, so a producer can
+    pass a generator and decoding overlaps with producing the chunk. Every
+    segment Vosk finalizes at an endpoint mid-chunk is collected along with
+    the final one.
+
+    With a `gate`, each finalized segment is checked against the reference
+    and decoding stops as soon as the chunk can no longer pass (`gate.lost`);
+    the transcript returned is then only the decoded prefix.
+    """
+    _load_model()
+
+    with _borrow_recognizer() as recognizer:
+        offset = recognizer.samples_fed / 16000
+        segments = []
 
-    if "result" in result_dict:
-        for word_info in result_dict["result"]:
-            aligned_words.append({
-                "word": word_info.get("word", ""),
-                "start": round(word_info.get("start", 0.0), 3),
-                "end": round(word_info.get("end", 0.0), 3),
-                "confidence": round(word_info.get("conf", 0.0), 3),
-            })
+        for frame in frames:
+            if not isinstance(frame, (bytes, bytearray)):
+                frame = _to_pcm16(frame)
+            recognizer.samples_fed += len(frame) // 2
 
+            if recognizer.rec.AcceptWaveform(frame):
+                segments.append(json.loads(recognizer.rec.Result()))
+                if gate is not None and gate.add_segment(segments[-1].get("text", "")):
+                    break
+
+        # Retrieve the final result (after an abort this only flushes the
+        # current frame, and leaves the recognizer clean for the next chunk)
+        segments.append(json.loads(recognizer.rec.FinalResult()))
+
+    transcribed_text = " ".join(segment["text"] for segment in segments if segment.get("text"))
+    aligned_words = [word for segment in segments for word in _parse_words(segment, offset)]
+
+    return transcribed_text, aligned_words
+
+
+def _recognize(
+    audio: Union[bytes, np.ndarray], gate: Optional[StreamingWerGate] = None, pad_samples: int = 0
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Runs the loaded Vosk model over a whole chunk (raw PCM16 bytes or float
+    / int16 audio, then `pad_samples` of silence), fed in VOSK_FRAME_MS
+    frames, and parses the recognizer output into (transcribed_text,
+    aligned_words).
+    """
+    return transcribe_frames(_pcm16_frames(audio, pad_samples=pad_samples), gate)
+
+
+def _streaming_gate(data: Dict[str, Any]) -> Optional[StreamingWerGate]:
+    # WER_GATE_MODE=streaming stops decoding chunks that are certain to fail the gate.
+    if os.environ.get("WER_GATE_MODE", "full") != "streaming":
+        return None
+    # The bound only holds against the final reference; split utterances get theirs after decoding.
+    if not reference_is_final(data):
+        return None
+    return StreamingWerGate(data.get("original_text", ""))
+
+
+def _store_transcription(data, transcribed_text, aligned_words, gate):
     # Mutate data dict to pass forwards
     data["transcribed_text"] = transcribed_text
     data["aligned_words"] = aligned_words
 
+    if gate is not None and gate.lost:
+        # evaluate_wer fails these without rescoring the partial transcript
+        data["transcription_aborted"] = True
+        data["wer_lower_bound"] = gate.lower_bound
+
     return data
+
+
+def transcribe_vosk(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Transcribes the audio chunk using Vosk and performs word-level timestamp alignment.
+    This replaces the heavy WhisperX usage for low-resource environments.
+    """
+    gate = _streaming_gate(data)
+    transcribed_text, aligned_words = _recognize(data["chunk_array"], gate, data.get("pad_samples", 0))
+
+    return _store_transcription(data, transcribed_text, aligned_words, gate)
+
+
+def transcribe_vosk_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Batched `transcribe_vosk` for the batch graph. Vosk's CPU recognizer
+    decodes one stream at a time, so chunks are decoded back to back on one
+    pooled recognizer; a chunk that fails gets an `error` instead of failing
+    the batch.
+    """
+    for data in items:
+        try:
+            transcribe_vosk(data)
+        except Exception as e:
+            data["error"] = f"transcribe_vosk: {e}"
+    return items
+
+
+def _transcribe_in_worker(audio_bytes: bytes, gate: Optional[StreamingWerGate] = None, pad_samples: int = 0):
+    # Runs inside a pool process; the model was loaded once by the initializer.
+    # The gate is sent back as well, since it was updated in this process.
+    return _recognize(audio_bytes, gate, pad_samples) + (gate,)
+
+
+def _worker_ready() -> int:
+    # Runs once the initializer has loaded the model in this worker.
+    return os.getpid()
+
+
+def _transcribe_handle_in_worker(
+    handle: AudioHandle, gate: Optional[StreamingWerGate] = None, pad_samples: int = 0
+):
+    # Reads the chunk straight out of the parent's shared audio ring.
+    return _recognize(attach_view(handle), gate, pad_samples) + (gate,)
+
+
+class VoskProcessPool:
+    """
+    Process-pool execution mode for the transcription stage.
+
+    Decoding and the JSON parsing around it hold the GIL, so threads only
+    use a few cores. Each worker process here loads `_vosk_model` once at
+    startup (pool initializer) and keeps it, and its pooled recognizer,
+    resident for every chunk it decodes. Only the compact PCM16 bytes travel to the worker and only the
+    parsed (text, words) tuple travels back, never the full state dict.
+    States carrying a `chunk_handle` (shared audio ring) send just the handle.
+
+    `transcribe` has the same signature as the `transcribe_vosk` node, so it
+    drops into the pipeline stage (or a graph node) unchanged. The calling
+    stage should run at least `processes` threads to keep every worker busy.
+    """
+
+    def __init__(self, processes: Optional[int] = None, start_method: str = "spawn"):
+        self.processes = processes or multiprocessing.cpu_count()
+        # spawn avoids forking a parent that already holds torch/OpenMP threads.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_load_model,
+        )
+
+    def transcribe(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        gate = _streaming_gate(data)
+        # Padding travels as a count, never as bytes of silence.
+        pad_samples = data.get("pad_samples", 0)
+        if "chunk_handle" in data:
+            future = self._executor.submit(_transcribe_handle_in_worker, data["chunk_handle"], gate, pad_samples)
+        else:
+            future = self._executor.submit(
+                _transcribe_in_worker, _to_pcm16(data["chunk_array"]), gate, pad_samples
+            )
+        transcribed_text, aligned_words, gate = future.result()
+
+        return _store_transcription(data, transcribed_text, aligned_words, gate)
+
+    def warm_up(self):
+        """
+        Starts every worker process now, blocking until their model is
+        loaded, instead of on the first chunks. A model that fails to load
+        breaks the pool and raises here.
+        """
+        # Workers are started on demand, one per task submitted while none is idle.
+        futures = [self._executor.submit(_worker_ready) for _ in range(self.processes)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
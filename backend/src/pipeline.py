@@ -0,0 +1,248 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Sentinel pushed through the queues once the upstream producer is exhausted.
+_DONE = object()
+
+
+class _Counter:
+    """Thread-safe running count of the states inside a pipeline run."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int):
+        with self._lock:
+            self.value += n
+
+
+class Stage:
+    """
+    A single step of the streaming pipeline, wrapping one of the node functions.
+
+    - `fn` receives one state dict and returns the (mutated) state dict.
+    - `workers` is the number of threads pulling from this stage's input queue.
+    - `expand=True` means `fn` returns a list of states (eg. VAD turning one
+      utterance into several chunks), each forwarded downstream individually.
+    - `route` mirrors the LangGraph conditional edges: when it returns "end"
+      the state skips every remaining stage and goes straight to the output.
+    - `batch_size > 1` hands `fn` a list of up to that many queued states
+      (whatever is already waiting, never blocking to fill the batch) and
+      expects one result per input state back, in order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Dict[str, Any]], Any],
+        workers: int = 1,
+        expand: bool = False,
+        route: Optional[Callable[[Dict[str, Any]], str]] = None,
+        batch_size: int = 1,
+    ):
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker, got {workers}")
+        if batch_size < 1:
+            raise ValueError(f"Stage '{name}' needs a batch size of at least one, got {batch_size}")
+
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.expand = expand
+        self.route = route
+        self.batch_size = batch_size
+
+
+class StreamingPipeline:
+    """
+    Stage-pipelined executor connecting `Stage`s with bounded queues.
+
+    Every stage runs its own pool of long-lived worker threads, so fetching,
+    VAD, transcription, WER gating and insertion overlap instead of waiting on
+    a per-batch barrier. A full downstream queue blocks the upstream `put`,
+    which gives steady-state backpressure all the way back to the source.
+
+    Every state that enters a stage eventually comes out of `run()`: either
+    after the last stage, short-circuited by a `route` returning "end", or with
+    an `error` key set when a node raised.
+
+    With `metrics` (a `PipelineMetrics`), every stage call is timed, the
+    source's time per item is recorded as the `fetch` stage, each queue's
+    depth is watched and every final state is counted by outcome.
+
+    `in_flight` counts the states taken from the source (and the chunks
+    they expanded into) that the consumer of `run()` is not done with yet:
+    a state counts until the consumer asks for the next one.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 8, metrics=None):
+        if not stages:
+            raise ValueError("StreamingPipeline requires at least one stage")
+
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self._in_flight = _Counter()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight.value
+
+    def run(self, source: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Streams `source` through every stage and yields the final states in
+        completion order. Re-raises any exception thrown by the source itself
+        once the in-flight states have drained.
+        """
+        # queues[i] feeds stages[i]; the extra trailing queue is the output.
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        output = queues[-1]
+        in_flight = self._in_flight = _Counter()
+        source_errors: List[BaseException] = []
+        threads: List[threading.Thread] = []
+        if self.metrics is not None:
+            names = [stage.name for stage in self.stages] + ["output"]
+            self.metrics.watch_queues(dict(zip(names, queues)))
+
+        threads.append(
+            threading.Thread(
+                target=self._feed_source,
+                args=(source, queues[0], self.stages[0].workers, source_errors, self.metrics, in_flight),
+                name="pipeline-source",
+                daemon=True,
+            )
+        )
+
+        for index, stage in enumerate(self.stages):
+            # Number of sentinels the next queue expects (1 for the output).
+            downstream_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            remaining = {"workers": stage.workers}
+            lock = threading.Lock()
+
+            for worker_id in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._run_worker,
+                        args=(
+                            stage, queues[index], queues[index + 1], output, downstream_workers, remaining, lock,
+                            self.metrics, in_flight,
+                        ),
+                        name=f"pipeline-{stage.name}-{worker_id}",
+                        daemon=True,
+                    )
+                )
+
+        for thread in threads:
+            thread.start()
+
+        while True:
+            state = output.get()
+            if state is _DONE:
+                break
+            if self.metrics is not None:
+                self.metrics.observe_output(state)
+            yield state
+            in_flight.add(-1)
+
+        for thread in threads:
+            thread.join()
+
+        if source_errors:
+            raise source_errors[0]
+
+    @staticmethod
+    def _feed_source(source, out_queue, downstream_workers, errors, metrics=None, in_flight=None):
+        in_flight = in_flight or _Counter()
+        try:
+            if metrics is None:
+                for item in source:
+                    in_flight.add(1)
+                    out_queue.put(item)
+            else:
+                # Time spent producing each item (HF download, decode, resample), excluding backpressure.
+                items = iter(source)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        break
+                    metrics.observe_stage("fetch", time.perf_counter() - start, [item])
+                    in_flight.add(1)
+                    out_queue.put(item)
+        except BaseException as e:  # noqa: B902 - surfaced to the caller of run()
+            errors.append(e)
+        finally:
+            for _ in range(downstream_workers):
+                out_queue.put(_DONE)
+
+    @staticmethod
+    def _run_worker(
+        stage, in_queue, out_queue, output, downstream_workers, remaining, lock, metrics=None, in_flight=None
+    ):
+        finished = False
+        while not finished:
+            items = [in_queue.get()]
+
+            # Opportunistically drain whatever is already queued into the batch.
+            while len(items) < stage.batch_size and items[-1] is not _DONE:
+                try:
+                    items.append(in_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if items[-1] is _DONE:
+                items.pop()
+                finished = True
+
+            if items:
+                StreamingPipeline._process(stage, items, out_queue, output, metrics, in_flight)
+
+        # The last worker of this stage to finish releases the next one.
+        with lock:
+            remaining["workers"] -= 1
+            is_last = remaining["workers"] == 0
+        if is_last:
+            for _ in range(downstream_workers):
+                out_queue.put(_DONE)
+
+    @staticmethod
+    def _process(stage, items, out_queue, output, metrics=None, in_flight=None):
+        start = time.perf_counter()
+        try:
+            results = stage.fn(items) if stage.batch_size > 1 else [stage.fn(items[0])]
+        except Exception as e:
+            if metrics is not None:
+                metrics.observe_stage(stage.name, time.perf_counter() - start, items, error=True)
+            for item in items:
+                item["error"] = f"{stage.name}: {e}"
+                output.put(item)
+            return
+
+        if metrics is not None:
+            metrics.observe_stage(stage.name, time.perf_counter() - start, items)
+
+        for result in results:
+            if stage.expand and in_flight is not None:
+                # One state in, len(result) states out
+                in_flight.add(len(result) - 1)
+            for state in result if stage.expand else [result]:
+                if stage.route is not None and stage.route(state) == "end":
+                    output.put(state)
+                else:
+                    out_queue.put(state)
+
+
+def log_result(final_state):
+    """
+    Reports the outcome of a state leaving the pipeline.
+    """
+    if "error" in final_state:
+        print(f"  [Error] Chunk processing failed: {final_state['error']}")
+    elif "insert_spooled" in final_state:
+        print(f"  [Warning] Insert failed, chunk spooled for retry: {final_state['insert_spooled']}")
+    elif not final_state.get("pass", False):
+        print(f"  [Gate] Dropped chunk due to high WER: {final_state.get('wer_score')}")
@@ -0,0 +1,139 @@
+import argparse
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from src.main import open_insert_sink
+from src.pipeline import Stage, StreamingPipeline, log_result
+from src.nodes.fetch_hf import fetch_hf_stream
+from src.nodes.process_vad import vad_params
+from src.nodes.transcribe_vosk import model_id
+from src.nodes.align_reference import align_reference
+from src.nodes.evaluate_wer import WER_THRESHOLD, evaluate_wer_batch
+from src.utils.audio_cache import open_audio_cache
+from src.utils.audio_codec import encode_chunk
+from src.utils.transcript_cache import audio_hash, open_transcript_cache
+
+
+def regate_states(states: List[Dict[str, Any]], threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Re-runs reference alignment and the WER gate over cached, transcribed
+    chunk states with the current normalization and `threshold`.
+    """
+    return evaluate_wer_batch([align_reference(state) for state in states], threshold)
+
+
+def attach_audio(states: List[Dict[str, Any]], source: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Re-slices each chunk's audio out of its utterance in `source` (the
+    fetch_hf stream) by its sample offsets, as a view with its trailing
+    silence in `pad_samples` like VAD leaves it. The stream is only read up to the last utterance
+    needed. Chunks whose re-sliced audio no longer hashes to the transcribed
+    audio (the source changed) come back with an `error` instead.
+    """
+    by_utterance: Dict[str, List[Dict[str, Any]]] = {}
+    for state in states:
+        by_utterance.setdefault(state["utterance_id"], []).append(state)
+
+    for record in source:
+        chunks = by_utterance.pop(record["utterance_id"], None)
+        if chunks is not None:
+            audio = record["audio_array"]
+            if audio.ndim > 1:
+                audio = audio.squeeze()
+
+            for chunk in chunks:
+                start, end = chunk["start_sample"], chunk["end_sample"]
+                # Chunks cached before padding was recorded were padded where the utterance ran out.
+                pad_samples = chunk.get("pad_samples", max(0, end - max(start, len(audio))))
+                chunk["chunk_array"] = audio[start:end - pad_samples]
+                chunk["pad_samples"] = pad_samples
+
+                if audio_hash(chunk["chunk_array"], pad_samples) != chunk["audio_hash"]:
+                    chunk["error"] = "regate: source audio differs from the transcribed chunk"
+                yield chunk
+
+        if not by_utterance:
+            return
+
+    for chunks in by_utterance.values():
+        for chunk in chunks:
+            chunk["error"] = "regate: utterance not found in the source stream"
+            yield chunk
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Re-gates the transcript cache (TRANSCRIPT_CACHE_PATH) without running
+    VAD or Vosk: every cached chunk is re-scored, and the chunks that now
+    pass are re-sliced from the stream (served by AUDIO_CACHE_DIR when
+    set), encoded and inserted. Inserts are idempotent upserts, so chunks
+    that were already stored are left as they are, and rows stored earlier
+    that would now fail the gate are not removed. Only fully decoded
+    chunks are cached, which is why the pipeline ignores
+    WER_GATE_MODE=streaming while the cache is enabled.
+    """
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Re-apply the WER gate to cached transcripts.")
+    parser.add_argument("--threshold", type=float, default=WER_THRESHOLD, help="maximum (rounded) WER to keep")
+    parser.add_argument("--dry-run", action="store_true", help="only report how many chunks pass")
+    args = parser.parse_args(argv)
+
+    transcript_cache = open_transcript_cache(model_id(), vad_params())
+    if transcript_cache is None:
+        raise SystemExit("TRANSCRIPT_CACHE_PATH is not set, there is nothing to re-gate.")
+
+    start_time = time.time()
+    try:
+        states = regate_states(list(transcript_cache.chunks()), args.threshold)
+    finally:
+        transcript_cache.close()
+
+    passed = [state for state in states if state["pass"]]
+    print(
+        f"[Regate] {len(passed)} of {len(states)} cached chunks pass at WER <= {args.threshold} "
+        f"(scored in {time.time() - start_time:.2f} seconds)."
+    )
+    if args.dry_run or not passed:
+        return
+
+    max_workers = int(os.environ.get("MAX_WORKERS", "4"))
+    encode_workers = int(os.environ.get("ENCODE_WORKERS", str(max_workers)))
+    insert_workers = int(os.environ.get("INSERT_WORKERS", str(max_workers)))
+
+    first = min(state.get("stream_index") or 0 for state in passed)
+    source = fetch_hf_stream(cache=open_audio_cache(), start=first)
+    insert_sink, insert_fn = open_insert_sink()
+    pipeline = StreamingPipeline(
+        [
+            Stage("encode_audio", encode_chunk, workers=encode_workers),
+            Stage("insert_db", insert_fn, workers=insert_workers),
+        ],
+        queue_size=int(os.environ.get("QUEUE_SIZE", os.environ.get("BATCH_SIZE", "10"))),
+    )
+
+    def sliced_chunks():
+        for chunk in attach_audio(passed, source):
+            if "error" in chunk:
+                log_result(chunk)
+            else:
+                yield chunk
+
+    inserted = 0
+    try:
+        for final_state in pipeline.run(sliced_chunks()):
+            log_result(final_state)
+            if "error" not in final_state:
+                inserted += 1
+    finally:
+        if insert_sink is not None:
+            insert_sink.close()
+
+    print(f"[Regate] Inserted {inserted} chunks in {time.time() - start_time:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.supabase_client import get_supabase_client
+
+SHARD_CONTENT_TYPE = "application/x-tar"
+INDEX_CONTENT_TYPE = "application/json"
+
+
+class TarShardWriter:
+    """
+    Appends WebDataset-style samples to a local tar file: each sample is an
+    audio member `<key>.<ext>` and a metadata member `<key>.json`. Both are
+    stored uncompressed, so `add` can return the byte range of the audio
+    inside the tar and a reader (or the review UI, with an HTTP Range
+    request) fetches one chunk without reading the shard.
+    """
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self.index_path = f"{path}.index.json"
+        self.index: List[Dict[str, Any]] = []
+        self._tar = tarfile.open(path, mode="w", format=tarfile.USTAR_FORMAT)
+
+    @property
+    def bytes(self) -> int:
+        return self._tar.offset
+
+    def add(self, key: str, extension: str, audio: bytes, metadata: Dict[str, Any]) -> Tuple[int, int]:
+        """Appends one sample; returns (offset, length) of its audio bytes in the tar."""
+        entry = {"key": key}
+        for field, member, payload in (
+            ("audio", f"{key}.{extension}", audio),
+            ("json", f"{key}.json", _json_bytes(metadata)),
+        ):
+            info = tarfile.TarInfo(member)
+            info.size = len(payload)
+            info.mtime = int(time.time())
+            self._tar.addfile(info, io.BytesIO(payload))
+            # addfile leaves the offset after the member's data, padded to a whole block
+            entry[field] = {"name": member, "offset": self._tar.offset - _blocks(len(payload)), "length": len(payload)}
+        self.index.append(entry)
+        return entry["audio"]["offset"], entry["audio"]["length"]
+
+    def close(self):
+        """Finishes the tar and writes its index (member byte ranges per sample) to `index_path`."""
+        if self._tar.closed:
+            return
+        self._tar.close()
+        with open(self.index_path, "wb") as f:
+            f.write(_json_bytes({"shard": self.name, "samples": self.index}))
+
+
+class LocalShardStore:
+    """
+    Keeps sealed shards under `root` (a local disk or mounted volume). URLs
+    are `base_url/<name>` when the directory is served over HTTP, file
+    paths otherwise (only readable on this machine, e.g. in tests).
+    """
+
+    def __init__(self, root: str, base_url: Optional[str] = None):
+        self.root = root
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def url(self, name: str) -> str:
+        if self.base_url:
+            return f"{self.base_url}/{name}"
+        return os.path.abspath(os.path.join(self.root, name))
+
+    def put(self, name: str, path: str, content_type: str):
+        destination = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        # Staging may be on another filesystem; the final rename is atomic either way.
+        shutil.move(path, f"{destination}.partial")
+        os.replace(f"{destination}.partial", destination)
+
+
+class StorageShardStore:
+    """
+    Uploads sealed shards to a bucket of Supabase Storage (S3-compatible),
+    one request per shard instead of one per chunk.
+    """
+
+    def __init__(self, bucket: str = "audio_shards", base_url: Optional[str] = None):
+        self.bucket = bucket
+        self.base_url = (base_url or os.environ.get("SUPABASE_URL", "")).rstrip("/")
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/storage/v1/object/public/{self.bucket}/{name}"
+
+    def put(self, name: str, path: str, content_type: str):
+        with open(path, "rb") as f:
+            payload = f.read()
+        get_supabase_client().storage.from_(self.bucket).upload(
+            path=name, file=payload, file_options={"content-type": content_type, "upsert": "true"}
+        )
+        os.remove(path)
+
+
+def shard_name(prefix: str = "shards") -> str:
+    """Unique, time-ordered shard name, e.g. shards/20260101-120000-1a2b3c4d.tar."""
+    return f"{prefix}/{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.tar"
+
+
+def open_shard_store():
+    """
+    Builds the shard store from ARCHIVE_STORE: `local` (default) moves
+    shards into ARCHIVE_DIR, served at ARCHIVE_BASE_URL; `storage` uploads
+    them to the ARCHIVE_BUCKET Supabase Storage bucket. A local store needs
+    ARCHIVE_BASE_URL: the rows' `audio_url` must be fetchable by the review
+    UI, not a path on this machine.
+    """
+    store = os.environ.get("ARCHIVE_STORE", "local")
+    if store == "local":
+        base_url = os.environ.get("ARCHIVE_BASE_URL")
+        if not base_url:
+            raise ValueError(
+                "ARCHIVE_STORE=local needs ARCHIVE_BASE_URL (the public URL serving ARCHIVE_DIR), "
+                "or use ARCHIVE_STORE=storage"
+            )
+        return LocalShardStore(os.environ.get("ARCHIVE_DIR", "/app/archive"), base_url)
+    if store == "storage":
+        return StorageShardStore(os.environ.get("ARCHIVE_BUCKET", "audio_shards"))
+    raise ValueError(f"Unknown ARCHIVE_STORE '{store}', expected 'local' or 'storage'")
+
+
+def read_sample(path: str, offset: int, length: int) -> bytes:
+    """Reads one member's bytes from a local shard by its recorded byte range."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _blocks(size: int) -> int:
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+
+def _json_bytes(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,241 @@
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.utils.pcm import to_float32, to_pcm16
+
+_INDEX_FILE = "index.json"
+
+
+def _write_atomic(path: str, write_fn):
+    # Write to a temporary sibling first so readers never see half a file.
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    write_fn(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class AudioCache:
+    """
+    On-disk cache of decoded, resampled utterances from the HF stream.
+
+    Items are grouped into shards of `shard_items` utterances: one `.npy`
+    file holding all their samples back to back (read with `mmap_mode="r"`,
+    so cached audio is served as zero-copy views) and one `.json` file with
+    each item's metadata plus (offset, length) into that array. `index.json`
+    records, per stream key, the ordered shards and whether the stream was
+    read to the end.
+
+    The cache keeps a contiguous prefix of every stream, so a later run
+    replays the cached prefix from disk and only resumes the network stream
+    after it. `max_bytes` is therefore not an LRU over shards: within one
+    stream it caps the prefix. Evicting a shard of the stream being written
+    would cut the prefix short of where it grows, so that stream simply
+    stops growing once the budget is reached, and its first `max_bytes` of
+    audio stay cached. Only across streams (several datasets or splits in
+    one directory) does `last_access` matter: before the total size would
+    exceed `max_bytes`, the least recently read shard of another stream is
+    evicted together with every later shard of that stream.
+
+    `dtype=int16` halves the footprint. Items are read back as zero-copy
+    views when the reader asks for the stored dtype (eg. AUDIO_DTYPE=int16
+    over an int16 cache), and converted with a copy otherwise.
+    """
+
+    def __init__(self, root: str, max_bytes: int, shard_items: int = 256, dtype=np.float32):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.shard_items = shard_items
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.int16):
+            raise ValueError(f"Audio cache dtype must be float32 or int16, got {self.dtype}")
+
+        os.makedirs(root, exist_ok=True)
+        self._index = self._load_index()
+
+    def cached_items(self, stream_key: str) -> int:
+        """Number of leading stream items currently served from disk."""
+        stream = self._index["streams"].get(stream_key)
+        if stream is None:
+            return 0
+        return sum(self._index["shards"][name]["count"] for name in stream["shards"])
+
+    def is_complete(self, stream_key: str) -> bool:
+        stream = self._index["streams"].get(stream_key)
+        return bool(stream and stream["complete"])
+
+    def read(self, stream_key: str, dtype=np.float32) -> Iterator[Dict[str, Any]]:
+        """
+        Replays the cached prefix of a stream in order. `audio_array` of each
+        item is `dtype` (float32 or int16), a read-only view into a
+        memory-mapped shard when that is the dtype stored.
+        """
+        as_dtype = to_pcm16 if np.dtype(dtype) == np.int16 else to_float32
+        stream = self._index["streams"].get(stream_key)
+        if stream is None:
+            return
+
+        for name in list(stream["shards"]):
+            self._index["shards"][name]["last_access"] = time.time()
+            self._save_index()
+
+            audio = np.load(os.path.join(self.root, f"{name}.npy"), mmap_mode="r")
+            with open(os.path.join(self.root, f"{name}.json")) as f:
+                entries = json.load(f)
+
+            for entry in entries:
+                item = dict(entry["metadata"])
+                item["audio_array"] = as_dtype(audio[entry["offset"]:entry["offset"] + entry["length"]])
+                yield item
+
+    def writer(self, stream_key: str) -> "AudioCacheWriter":
+        """Returns a writer appending new items after the cached prefix."""
+        return AudioCacheWriter(self, stream_key)
+
+    def total_bytes(self) -> int:
+        return sum(shard["bytes"] for shard in self._index["shards"].values())
+
+    def _add_shard(self, stream_key: str, items: List[Dict[str, Any]]) -> bool:
+        """Writes one shard; returns False when it cannot fit within `max_bytes`."""
+        audio = np.concatenate([item["audio_array"] for item in items])
+        if self.dtype == np.int16:
+            audio = to_pcm16(audio)
+        else:
+            audio = to_float32(audio).astype(self.dtype, copy=False)
+
+        if not self._evict(stream_key, incoming_bytes=audio.nbytes):
+            return False
+
+        name = f"shard-{uuid.uuid4().hex}"
+
+        entries = []
+        offset = 0
+        for item in items:
+            length = len(item["audio_array"])
+            metadata = {key: value for key, value in item.items() if key != "audio_array"}
+            entries.append({"offset": offset, "length": length, "metadata": metadata})
+            offset += length
+
+        _write_atomic(os.path.join(self.root, f"{name}.npy"), lambda path: _save_npy(path, audio))
+        _write_atomic(os.path.join(self.root, f"{name}.json"), lambda path: _save_json(path, entries))
+
+        stream = self._index["streams"].setdefault(stream_key, {"shards": [], "complete": False})
+        stream["shards"].append(name)
+        self._index["shards"][name] = {
+            "stream": stream_key,
+            "count": len(items),
+            "bytes": int(audio.nbytes),
+            "last_access": time.time(),
+        }
+
+        self._save_index()
+        return True
+
+    def _mark_complete(self, stream_key: str):
+        stream = self._index["streams"].setdefault(stream_key, {"shards": [], "complete": False})
+        stream["complete"] = True
+        self._save_index()
+
+    def _evict(self, protected_stream: str, incoming_bytes: int) -> bool:
+        """
+        Frees LRU shards of other streams until `incoming_bytes` fit.
+        Returns False if that is impossible: `protected_stream` itself is
+        never trimmed, since its new shard goes after all of its others.
+        """
+        while self.total_bytes() + incoming_bytes > self.max_bytes:
+            candidates = [
+                name for name, shard in self._index["shards"].items() if shard["stream"] != protected_stream
+            ]
+            if not candidates:
+                return False
+
+            victim = min(candidates, key=lambda name: self._index["shards"][name]["last_access"])
+            stream = self._index["streams"][self._index["shards"][victim]["stream"]]
+
+            # Keep each stream a contiguous prefix: drop the victim and all later shards.
+            position = stream["shards"].index(victim)
+            for name in stream["shards"][position:]:
+                self._remove_shard(name)
+            del stream["shards"][position:]
+            stream["complete"] = False
+
+        return True
+
+    def _remove_shard(self, name: str):
+        del self._index["shards"][name]
+        for suffix in (".npy", ".json"):
+            try:
+                os.remove(os.path.join(self.root, name + suffix))
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self) -> Dict[str, Any]:
+        path = os.path.join(self.root, _INDEX_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return {"streams": {}, "shards": {}}
+
+    def _save_index(self):
+        _write_atomic(os.path.join(self.root, _INDEX_FILE), lambda path: _save_json(path, self._index))
+
+
+class AudioCacheWriter:
+    """
+    Buffers items of one stream and writes them to the cache a shard at a time.
+    """
+
+    def __init__(self, cache: AudioCache, stream_key: str):
+        self.cache = cache
+        self.stream_key = stream_key
+        self._pending: List[Dict[str, Any]] = []
+        # Set once the cache is full: later items would leave a gap in the prefix.
+        self.full = False
+
+    def append(self, item: Dict[str, Any]):
+        if self.full:
+            return
+        self._pending.append(item)
+        if len(self._pending) >= self.cache.shard_items:
+            self.flush()
+
+    def flush(self):
+        if self._pending and not self.full:
+            self.full = not self.cache._add_shard(self.stream_key, self._pending)
+        self._pending = []
+
+    def close(self, complete: bool = False):
+        """Writes the partial shard; `complete=True` marks the stream fully cached."""
+        self.flush()
+        if complete and not self.full:
+            self.cache._mark_complete(self.stream_key)
+
+
+def open_audio_cache(root: Optional[str] = None, max_gb: Optional[float] = None) -> Optional[AudioCache]:
+    """
+    Builds the cache from AUDIO_CACHE_DIR / AUDIO_CACHE_MAX_GB (default 20GB)
+    and AUDIO_CACHE_DTYPE (`float32` or `int16`). Returns None when no cache
+    directory is configured.
+    """
+    root = root or os.environ.get("AUDIO_CACHE_DIR")
+    if not root:
+        return None
+
+    max_gb = max_gb if max_gb is not None else float(os.environ.get("AUDIO_CACHE_MAX_GB", "20"))
+    dtype = os.environ.get("AUDIO_CACHE_DTYPE", "float32")
+    if dtype not in ("float32", "int16"):
+        raise ValueError(f"Unknown AUDIO_CACHE_DTYPE '{dtype}', expected 'float32' or 'int16'")
+    return AudioCache(root, int(max_gb * 1024**3), dtype=dtype)
+
+
+def _save_npy(path: str, array: np.ndarray):
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def _save_json(path: str, payload: Any):
+    with open(path, "w") as f:
+        json.dump(payload, f)
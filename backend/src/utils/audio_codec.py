@@ -0,0 +1,74 @@
+import io
+import os
+from typing import Any, Dict, NamedTuple, Optional
+
+import soundfile as sf
+
+from src.utils.pcm import padded_chunk
+
+
+class AudioCodec(NamedTuple):
+    """
+    How a chunk is encoded before upload, and how the stored object is named
+    and served. Every codec here decodes natively in the browsers the review
+    UI targets (wavesurfer.js hands the bytes to Web Audio `decodeAudioData`).
+    """
+
+    name: str
+    format: str
+    subtype: str
+    extension: str
+    content_type: str
+
+
+CODECS: Dict[str, AudioCodec] = {
+    # Largest payload, kept as the default for backwards compatibility.
+    "wav": AudioCodec("wav", "WAV", "PCM_16", "wav", "audio/wav"),
+    # Lossless, typically ~50-60% of the WAV size for speech.
+    "flac": AudioCodec("flac", "FLAC", "PCM_16", "flac", "audio/flac"),
+    # Lossy Opus in an Ogg container, a small fraction of the WAV size.
+    "opus": AudioCodec("opus", "OGG", "OPUS", "ogg", "audio/ogg"),
+}
+
+
+def get_codec(name: Optional[str] = None) -> AudioCodec:
+    """
+    Resolves a codec by name, defaulting to the AUDIO_CODEC environment
+    variable (`wav`, `flac` or `opus`).
+    """
+    name = (name or os.environ.get("AUDIO_CODEC", "wav")).lower()
+    if name not in CODECS:
+        raise ValueError(f"Unknown AUDIO_CODEC '{name}', expected one of {sorted(CODECS)}")
+    return CODECS[name]
+
+
+def encode_audio(audio, sample_rate: int, codec: AudioCodec) -> bytes:
+    """
+    Encodes audio strictly in memory (BytesIO) with the given codec.
+    """
+    buffer = io.BytesIO()
+    sf.write(
+        file=buffer,
+        data=audio,
+        samplerate=sample_rate,
+        format=codec.format,
+        subtype=codec.subtype,
+    )
+    return buffer.getvalue()
+
+
+def encode_chunk(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pipeline stage placed after the WER gate: encodes a passing chunk with
+    the configured codec on the CPU worker pool, so the insert stage only
+    does I/O. Stores the bytes under `encoded_audio` and the codec name
+    under `audio_codec`. Chunks with `pass=False` are returned untouched.
+    """
+    if not data.get("pass", False):
+        return data
+
+    codec = get_codec()
+    data["encoded_audio"] = encode_audio(padded_chunk(data), data["sample_rate"], codec)
+    data["audio_codec"] = codec.name
+
+    return data
@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set
+
+
+class ProgressCheckpoint:
+    """
+    Durable record of which streamed utterances are fully processed, so a
+    restarted run resumes instead of re-transcribing and re-uploading.
+
+    Utterances finish out of order (chunks of one utterance fan out over the
+    worker pools), so progress is kept as:
+    - `position`: every utterance before this stream index is done, and the
+      stream can be resumed there (`fetch_hf_stream(start=position)`);
+    - `completed`: utterance ids after `position` that are done as well and
+      are skipped on resume.
+
+    An utterance is done once the VAD stage announced its chunk count
+    (`expect`) and that many of its chunks left the pipeline (`finish`),
+    whether inserted or dropped by the WER gate. A chunk that failed keeps
+    its utterance pending, so it is retried on the next run.
+
+    The file is rewritten atomically at most every `save_interval` seconds
+    and on `close()`. `on_save` runs right before each write; pass the
+    insert sink's `flush` so the checkpoint never runs ahead of rows that
+    are still buffered.
+    """
+
+    def __init__(self, path: str, save_interval: float = 5.0, on_save: Optional[Callable[[], None]] = None):
+        self.path = path
+        self.save_interval = save_interval
+        self.on_save = on_save
+
+        self.position = 0
+        self.completed: Set[str] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.position = state["position"]
+            self.completed = set(state["completed"])
+
+        # stream index -> utterance id of done utterances past `position`
+        # (None for positions the stream skipped)
+        self._done: Dict[int, Optional[str]] = {}
+        # stream index -> [utterance id, chunks still in flight, failed]
+        self._pending: Dict[int, list] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+
+    def pending(self, stream: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Filters a stream started at `position`, dropping utterances recorded
+        as completed by an earlier run. Positions the stream skips (other
+        workers' shards) count as done.
+        """
+        next_index = self.position
+        for record in stream:
+            if record["stream_index"] > next_index:
+                with self._lock:
+                    for skipped in range(next_index, record["stream_index"]):
+                        self._mark_done(skipped, None)
+            next_index = record["stream_index"] + 1
+
+            if record["utterance_id"] in self.completed:
+                with self._lock:
+                    self._mark_done(record["stream_index"], record["utterance_id"])
+                continue
+            yield record
+
+    def expect(self, stream_index: int, utterance_id: str, chunk_count: int):
+        """Registers how many chunks an utterance was split into (VAD stage)."""
+        with self._lock:
+            if chunk_count == 0:
+                self._mark_done(stream_index, utterance_id)
+            else:
+                self._pending[stream_index] = [utterance_id, chunk_count, False]
+
+    def finish(self, state: Dict[str, Any]):
+        """
+        Records a state leaving the pipeline. An errored state without a
+        known chunk count (the VAD stage itself failed) leaves its utterance
+        pending.
+        """
+        stream_index = state.get("stream_index")
+        if stream_index is None:
+            return
+
+        with self._lock:
+            entry = self._pending.get(stream_index)
+            if entry is None:
+                return
+
+            entry[1] -= 1
+            entry[2] = entry[2] or "error" in state
+            if entry[1] == 0:
+                del self._pending[stream_index]
+                if not entry[2]:
+                    self._mark_done(stream_index, entry[0])
+
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self._try_save()
+
+    def hold(self, state: Dict[str, Any]):
+        """
+        Keeps the utterance of a chunk the insert sink has taken but not made
+        durable yet pending, until `finish` is called for the chunk once more.
+        """
+        stream_index = state.get("stream_index")
+        with self._lock:
+            entry = self._pending.get(stream_index)
+            if entry is not None:
+                entry[1] += 1
+
+    def reopen(self, state: Dict[str, Any]):
+        """
+        Marks the utterance of a chunk that failed after it left the pipeline
+        (e.g. a background upload) as not done. If the resume position had
+        already moved past it, it is moved back: utterances after it are
+        re-run on resume, which the idempotent inserts make harmless.
+        """
+        stream_index = state.get("stream_index")
+        if stream_index is None:
+            return
+
+        with self._lock:
+            entry = self._pending.get(stream_index)
+            if entry is not None:
+                entry[2] = True
+                return
+
+            self._done.pop(stream_index, None)
+            self.completed.discard(state.get("utterance_id"))
+            if stream_index < self.position:
+                self.position = stream_index
+
+    def save(self):
+        with self._lock:
+            payload = {"position": self.position, "completed": sorted(self.completed)}
+            self._last_save = time.monotonic()
+
+        # Everything counted in `payload` was handed to the sink before this point.
+        if self.on_save is not None:
+            self.on_save()
+
+        # Write to a temporary sibling first so a crash never leaves half a file.
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        self._try_save()
+
+    def _try_save(self):
+        # A failed flush must not take the pipeline down; progress is simply saved later.
+        try:
+            self.save()
+        except Exception as e:
+            print(f"  [Error] Checkpoint not saved: {str(e)}")
+
+    def _mark_done(self, stream_index: int, utterance_id: Optional[str]):
+        if utterance_id is not None:
+            self.completed.add(utterance_id)
+        self._done[stream_index] = utterance_id
+
+        # Advance the resume position over the contiguous done prefix.
+        while self.position in self._done:
+            self.completed.discard(self._done.pop(self.position))
+            self.position += 1
+
+
+def open_checkpoint(
+    path: Optional[str] = None, on_save: Optional[Callable[[], None]] = None
+) -> Optional[ProgressCheckpoint]:
+    """
+    Builds the checkpoint from CHECKPOINT_PATH (saved every
+    CHECKPOINT_INTERVAL_S seconds, default 5). Returns None when unset.
+    """
+    path = path or os.environ.get("CHECKPOINT_PATH")
+    if not path:
+        return None
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return ProgressCheckpoint(
+        path, save_interval=float(os.environ.get("CHECKPOINT_INTERVAL_S", "5")), on_save=on_save
+    )
@@ -0,0 +1,82 @@
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class MemoryBudget:
+    """
+    Global memory cap for the pipeline. `throttle` wraps the source so that,
+    before each utterance is fetched, it waits while the process RSS is
+    above `max_bytes`, until it drops back under `resume_fraction` of the
+    cap (the hysteresis keeps fetching from flapping around the limit). The
+    stages keep draining meanwhile, and their finished chunks free memory.
+
+    It never waits while the pipeline is `idle` (nothing in flight could
+    free anything), so a cap below the baseline of the loaded models
+    degrades to fetching one utterance at a time instead of deadlocking.
+    """
+
+    def __init__(
+        self, max_bytes: int, resume_fraction: float = 0.9, poll_interval: float = 0.05,
+        rss: Callable[[], Optional[int]] = current_rss_bytes,
+    ):
+        if max_bytes <= 0:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+
+        self.max_bytes = max_bytes
+        self.resume_bytes = int(max_bytes * resume_fraction)
+        self.poll_interval = poll_interval
+        self._rss = rss
+        # Times fetching paused, and for how long in total
+        self.throttles = 0
+        self.throttled_seconds = 0.0
+
+    def wait(self, idle: Optional[Callable[[], bool]] = None):
+        """Blocks while RSS is over the cap and something is still in flight."""
+        rss = self._rss()
+        if rss is None or rss <= self.max_bytes:
+            return
+
+        self.throttles += 1
+        start = time.perf_counter()
+        while rss is not None and rss > self.resume_bytes and not (idle is not None and idle()):
+            time.sleep(self.poll_interval)
+            rss = self._rss()
+        self.throttled_seconds += time.perf_counter() - start
+
+    def throttle(
+        self, source: Iterable[Dict[str, Any]], idle: Optional[Callable[[], bool]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yields from `source`, waiting for memory before fetching each item."""
+        items = iter(source)
+        while True:
+            self.wait(idle)
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            yield item
+
+
+def open_memory_budget() -> Optional[MemoryBudget]:
+    """
+    Builds the memory budget from MEMORY_BUDGET_MB (RSS cap of the whole
+    process, models included); None when it is unset or RSS cannot be read.
+    """
+    max_mb = os.environ.get("MEMORY_BUDGET_MB")
+    if not max_mb:
+        return None
+    if current_rss_bytes() is None:
+        print("  [Warning] MEMORY_BUDGET_MB ignored: process RSS is not readable on this platform")
+        return None
+    return MemoryBudget(int(float(max_mb) * 1024 * 1024))
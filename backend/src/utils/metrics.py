@@ -0,0 +1,344 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_PREFIX = "agentic_speech"
+
+
+def _audio_seconds(state: Dict[str, Any]) -> float:
+    """Audio a state carries: a chunk's `duration`, or a whole streamed utterance."""
+    if "duration" in state:
+        return state["duration"]
+    audio = state.get("audio_array")
+    if audio is not None and state.get("sample_rate"):
+        return len(audio) / state["sample_rate"]
+    return 0.0
+
+
+class Histogram:
+    """Fixed-bucket histogram; not thread-safe on its own (guarded by PipelineMetrics)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # counts[i] observations <= buckets[i] (and > buckets[i - 1]); the last slot is +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, cumulative count) pairs, ending with +Inf."""
+        pairs, total = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return pairs
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound holding the q-th observation (0.0 when empty)."""
+        if not self.count:
+            return 0.0
+        rank, total = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+class _StageStats:
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.audio_seconds = 0.0
+
+
+class PipelineMetrics:
+    """
+    In-process counters for the streaming pipeline, cheap enough to leave on:
+    recording is two `perf_counter` calls and a short critical section per
+    stage call.
+
+    Per stage (pipeline `Stage`s, LangGraph nodes wrapped with `instrument`,
+    and `fetch`, the time the source spends producing each utterance):
+    - a latency histogram of each call (one call covers a whole batch in
+      batched stages),
+    - items and errors,
+    - busy seconds over audio seconds handled, i.e. the real-time factor.
+
+    Plus end-to-end chunk outcomes (passed / dropped by the WER gate /
+    error), the depth of every watched queue, sampled when exported, and
+    startup phases: model warm-up times and `first_chunk`, the seconds from
+    creating the metrics to the first chunk leaving the pipeline.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.started = time.time()
+        self._clock_start = time.perf_counter()
+        self._stages: Dict[str, _StageStats] = {}
+        self._outcomes = {"passed": 0, "dropped": 0, "error": 0}
+        self._startup: Dict[str, float] = {}
+        self._queues: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage: str, seconds: float, states: List[Dict[str, Any]], error: bool = False):
+        audio_seconds = sum(_audio_seconds(state) for state in states)
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = _StageStats(self.buckets)
+            stats.latency.observe(seconds)
+            stats.items += len(states)
+            stats.errors += len(states) if error else 0
+            stats.busy_seconds += seconds
+            stats.audio_seconds += audio_seconds
+
+    def observe_output(self, state: Dict[str, Any]):
+        """Counts a state leaving the pipeline by outcome."""
+        if "error" in state:
+            outcome = "error"
+        elif state.get("pass", False):
+            outcome = "passed"
+        else:
+            outcome = "dropped"
+        with self._lock:
+            self._outcomes[outcome] += 1
+            if "first_chunk" not in self._startup:
+                self._startup["first_chunk"] = time.perf_counter() - self._clock_start
+
+    def observe_startup(self, phase: str, seconds: float):
+        """Records how long a startup phase (eg. loading a model) took."""
+        with self._lock:
+            self._startup[phase] = seconds
+
+    def watch_queues(self, queues: Dict[str, Any]):
+        """Registers queues (anything with `qsize()`) whose depth is reported."""
+        with self._lock:
+            self._queues = dict(queues)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                name: {
+                    "items": stats.items,
+                    "errors": stats.errors,
+                    "busy_seconds": stats.busy_seconds,
+                    "audio_seconds": stats.audio_seconds,
+                    "realtime_factor": stats.busy_seconds / stats.audio_seconds if stats.audio_seconds else None,
+                    "latency_seconds": {
+                        "count": stats.latency.count,
+                        "sum": stats.latency.sum,
+                        "p50": stats.latency.quantile(0.5),
+                        "p95": stats.latency.quantile(0.95),
+                        "p99": stats.latency.quantile(0.99),
+                        "buckets": dict(stats.latency.cumulative()),
+                    },
+                }
+                for name, stats in self._stages.items()
+            }
+            outcomes = dict(self._outcomes)
+            queues = dict(self._queues)
+            startup = dict(self._startup)
+
+        finished = sum(outcomes.values())
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self.started,
+            "stages": stages,
+            "chunks": outcomes,
+            "pass_rate": outcomes["passed"] / finished if finished else None,
+            "queue_depth": {name: q.qsize() for name, q in queues.items()},
+            "startup_seconds": startup,
+        }
+
+    def render_prometheus(self) -> str:
+        """The current values in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+
+        lines = [
+            f"# HELP {_PREFIX}_stage_latency_seconds Wall time of one stage call.",
+            f"# TYPE {_PREFIX}_stage_latency_seconds histogram",
+        ]
+        for name, stats in snapshot["stages"].items():
+            for le, count in stats["latency_seconds"]["buckets"].items():
+                lines.append(f'{_PREFIX}_stage_latency_seconds_bucket{{stage="{name}",le="{le}"}} {count}')
+            lines.append(f'{_PREFIX}_stage_latency_seconds_sum{{stage="{name}"}} {stats["latency_seconds"]["sum"]}')
+            lines.append(
+                f'{_PREFIX}_stage_latency_seconds_count{{stage="{name}"}} {stats["latency_seconds"]["count"]}'
+            )
+
+        counters = [
+            ("stage_items_total", "items", "counter", "States processed by the stage."),
+            ("stage_errors_total", "errors", "counter", "States the stage failed on."),
+            ("stage_busy_seconds_total", "busy_seconds", "counter", "Seconds spent in stage calls."),
+            ("stage_audio_seconds_total", "audio_seconds", "counter", "Seconds of audio handled by the stage."),
+            ("stage_realtime_factor", "realtime_factor", "gauge", "Busy seconds per second of audio."),
+        ]
+        for metric, key, kind, help_text in counters:
+            lines.append(f"# HELP {_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {_PREFIX}_{metric} {kind}")
+            for name, stats in snapshot["stages"].items():
+                if stats[key] is not None:
+                    lines.append(f'{_PREFIX}_{metric}{{stage="{name}"}} {stats[key]}')
+
+        lines.append(f"# HELP {_PREFIX}_chunks_total Chunks that left the pipeline, by outcome.")
+        lines.append(f"# TYPE {_PREFIX}_chunks_total counter")
+        for outcome, count in snapshot["chunks"].items():
+            lines.append(f'{_PREFIX}_chunks_total{{outcome="{outcome}"}} {count}')
+
+        if snapshot["pass_rate"] is not None:
+            lines.append(f"# HELP {_PREFIX}_pass_rate Fraction of finished chunks that passed the WER gate.")
+            lines.append(f"# TYPE {_PREFIX}_pass_rate gauge")
+            lines.append(f"{_PREFIX}_pass_rate {snapshot['pass_rate']}")
+
+        lines.append(f"# HELP {_PREFIX}_queue_depth States waiting in a pipeline queue.")
+        lines.append(f"# TYPE {_PREFIX}_queue_depth gauge")
+        for name, depth in snapshot["queue_depth"].items():
+            lines.append(f'{_PREFIX}_queue_depth{{queue="{name}"}} {depth}')
+
+        lines.append(f"# HELP {_PREFIX}_startup_seconds Duration of startup phases, up to the first chunk out.")
+        lines.append(f"# TYPE {_PREFIX}_startup_seconds gauge")
+        for phase, seconds in snapshot["startup_seconds"].items():
+            lines.append(f'{_PREFIX}_startup_seconds{{phase="{phase}"}} {seconds}')
+
+        return "\n".join(lines) + "\n"
+
+
+def instrument(fn: Callable, name: str, metrics: Optional[PipelineMetrics]) -> Callable:
+    """
+    Wraps a node function (state in, state or list of states out) so each
+    call is recorded as stage `name`. Returns `fn` itself without metrics.
+    """
+    if metrics is None:
+        return fn
+
+    @functools.wraps(fn)
+    def timed(state):
+        states = state if isinstance(state, list) else [state]
+        start = time.perf_counter()
+        try:
+            result = fn(state)
+        except Exception:
+            metrics.observe_stage(name, time.perf_counter() - start, states, error=True)
+            raise
+        metrics.observe_stage(name, time.perf_counter() - start, states)
+        return result
+
+    return timed
+
+
+class MetricsExporter:
+    """
+    Publishes `PipelineMetrics` as a Prometheus text endpoint (`GET /metrics`
+    on `port`) and/or a JSON snapshot rewritten atomically at `json_path`
+    every `interval` seconds and on `close()`.
+    """
+
+    def __init__(
+        self, metrics: PipelineMetrics, port: Optional[int] = None, json_path: Optional[str] = None,
+        interval: float = 10.0,
+    ):
+        self.metrics = metrics
+        self.json_path = json_path
+        self.interval = interval
+        self._server = None
+        self._stop = threading.Event()
+        self._writer = None
+
+        if port is not None:
+            self._server = ThreadingHTTPServer(("0.0.0.0", port), _handler_for(metrics))
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+        if json_path is not None:
+            self._writer = threading.Thread(target=self._write_periodically, name="metrics-json", daemon=True)
+            self._writer.start()
+
+    @property
+    def port(self) -> Optional[int]:
+        return self._server.server_address[1] if self._server is not None else None
+
+    def write_json(self):
+        # Write to a temporary sibling first so readers never see half a file.
+        tmp_path = f"{self.json_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.metrics.snapshot(), f)
+        os.replace(tmp_path, self.json_path)
+
+    def close(self):
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self.write_json()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write_json()
+            except OSError as e:
+                print(f"  [Error] Metrics not written: {str(e)}")
+
+
+def _handler_for(metrics: PipelineMetrics):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the pipeline's log.
+            pass
+
+    return MetricsHandler
+
+
+def open_metrics() -> Tuple[Optional[PipelineMetrics], Optional[MetricsExporter]]:
+    """
+    Builds metrics and their exporter from METRICS_PORT (Prometheus endpoint)
+    and METRICS_JSON_PATH (snapshot every METRICS_INTERVAL_S seconds,
+    default 10). Returns (None, None) when neither is set.
+    """
+    port = os.environ.get("METRICS_PORT")
+    json_path = os.environ.get("METRICS_JSON_PATH")
+    if not port and not json_path:
+        return None, None
+
+    if json_path:
+        directory = os.path.dirname(json_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    metrics = PipelineMetrics()
+    exporter = MetricsExporter(
+        metrics,
+        port=int(port) if port else None,
+        json_path=json_path or None,
+        interval=float(os.environ.get("METRICS_INTERVAL_S", "10")),
+    )
+    return metrics, exporter
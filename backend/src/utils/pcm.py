@@ -0,0 +1,54 @@
+import os
+from typing import Any, Dict
+
+import numpy as np
+
+# Full scale of 16-bit PCM, as fed to Vosk and stored in the audio cache.
+PCM16_SCALE = 32767
+
+
+def ingest_dtype() -> np.dtype:
+    """
+    AUDIO_DTYPE: the dtype utterance audio is held in from ingest onwards,
+    `float32` (default) or `int16`. int16 halves every utterance and chunk
+    in flight and is what Vosk decodes anyway; VAD scores a transient
+    float32 copy.
+    """
+    name = os.environ.get("AUDIO_DTYPE", "float32")
+    if name not in ("float32", "int16"):
+        raise ValueError(f"Unknown AUDIO_DTYPE '{name}', expected 'float32' or 'int16'")
+    return np.dtype(name)
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """Float audio in [-1, 1] as int16 PCM (clipped); int16 audio is returned as is."""
+    if audio.dtype == np.int16:
+        return audio
+    scaled = np.multiply(audio, PCM16_SCALE, dtype=np.float32)
+    np.clip(scaled, -PCM16_SCALE, PCM16_SCALE, out=scaled)
+    return scaled.astype(np.int16)
+
+
+def to_float32(audio: np.ndarray) -> np.ndarray:
+    """int16 PCM as float32 in [-1, 1]; float32 audio is returned as is."""
+    if audio.dtype == np.int16:
+        return np.divide(audio, PCM16_SCALE, dtype=np.float32)
+    return np.asarray(audio, dtype=np.float32)
+
+
+def as_ingest_dtype(audio: np.ndarray) -> np.ndarray:
+    """Converts audio to the AUDIO_DTYPE of this run (no copy when it already is)."""
+    return to_pcm16(audio) if ingest_dtype() == np.int16 else to_float32(audio)
+
+
+def padded_chunk(data: Dict[str, Any]) -> np.ndarray:
+    """
+    A chunk's audio with its trailing silence materialized. VAD keeps chunks
+    as views into their utterance and records padding as `pad_samples`;
+    only consumers that need one contiguous array (the codecs) pay for it.
+    """
+    audio = data["chunk_array"]
+    pad_samples = data.get("pad_samples", 0)
+    if not pad_samples:
+        return audio
+    return np.concatenate([audio, np.zeros(pad_samples, dtype=audio.dtype)])
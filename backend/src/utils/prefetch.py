@@ -0,0 +1,73 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+def prefetch(
+    items: Iterable[T], fn: Callable[[T], R], workers: int = 2, depth: int = 8, ordered: bool = True
+) -> Iterator[R]:
+    """
+    Yields `fn(item)` for every item, reading `items` on a background thread
+    and running `fn` in a pool of `workers` threads, up to `depth` results
+    ahead of the consumer. Results come in input order, or in completion
+    order with `ordered=False` (one slow item then does not hold back the
+    ones behind it).
+
+    Exceptions raised by `items` or `fn` are re-raised to the consumer at
+    the position they occurred. Closing the generator stops reading ahead.
+    """
+    if depth < 1:
+        raise ValueError(f"depth must be at least 1, got {depth}")
+
+    results: "queue.Queue" = queue.Queue()
+    slots = threading.Semaphore(depth)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def produce():
+        submitted = []
+        failure = None
+        try:
+            for item in items:
+                # Waits for the consumer to take a result before reading further ahead.
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                future = executor.submit(fn, item)
+                if ordered:
+                    results.put(future)
+                else:
+                    submitted.append(future)
+                    future.add_done_callback(results.put)
+        except BaseException as e:  # noqa: B902 - surfaced to the consumer
+            failure = e
+        finally:
+            # In completion order, the results still in the pool come before the end (or the failure).
+            wait(submitted)
+            if failure is not None:
+                failed = Future()
+                failed.set_exception(failure)
+                results.put(failed)
+            results.put(_DONE)
+
+    producer = threading.Thread(target=produce, name="prefetch-source", daemon=True)
+    producer.start()
+    try:
+        while True:
+            future = results.get()
+            if future is _DONE:
+                break
+            slots.release()
+            yield future.result()
+    finally:
+        stop.set()
+        producer.join()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,306 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Optional
+
+# Request kinds of the upload gate: audio objects, and `speech_chunks` row upserts.
+UPLOAD = "upload"
+ROWS = "rows"
+
+
+class AIMDConcurrency:
+    """
+    Adaptive limit on the requests in flight, resized like TCP's congestion
+    window from the outcome of each request:
+
+    - a success within the latency target raises the limit by one per
+      round trip (1 / limit per request), as long as the limit was actually
+      reached, so idle capacity is not mistaken for headroom;
+    - a failure, or a request slower than the target, multiplies it by
+      `backoff`, at most once per round trip: requests started before the
+      last decrease report on the old limit and are ignored.
+
+    The target is `latency_target` seconds or, if None, `tolerance` times
+    the baseline latency: the fastest seen, raised toward the latencies
+    observed at `min_limit`, where the slowdown cannot come from our own
+    load (so a service that is slower for good is accepted as such once
+    the limit has backed off to the minimum). Requests of different
+    `kind`s (e.g. audio uploads and small row upserts) share the limit but
+    each kind has its own baseline, so a fast kind does not make a slow
+    one look congested.
+    """
+
+    def __init__(
+        self, initial: int = 4, min_limit: int = 1, max_limit: int = 64, latency_target: Optional[float] = None,
+        tolerance: float = 2.0, backoff: float = 0.5, clock: Callable[[], float] = time.monotonic,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Need 1 <= min_limit <= max_limit, got {min_limit} and {max_limit}")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self._clock = clock
+
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        # Request kind -> baseline latency
+        self._baselines: Dict[str, float] = {}
+        self._last_decrease = float("-inf")
+        # Last time an acquisition filled every slot
+        self._last_full = float("-inf")
+        self.in_flight = 0
+        # Times the limit was cut, and the lowest and highest it went
+        self.decreases = 0
+        self.low = self.high = self.limit
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def target(self) -> Optional[float]:
+        """Latency above which an upload counts as congested (None until the first sample)."""
+        return self.target_for(UPLOAD)
+
+    def target_for(self, kind: str) -> Optional[float]:
+        """Latency above which a request of `kind` counts as congested (None until its first sample)."""
+        if self.latency_target is not None:
+            return self.latency_target
+        baseline = self._baselines.get(kind)
+        return None if baseline is None else self.tolerance * baseline
+
+    def try_acquire(self) -> Optional[float]:
+        """Takes a slot if one is free; returns its start time, or None."""
+        with self._condition:
+            if self.in_flight >= self.limit:
+                return None
+            return self._take()
+
+    def acquire(self) -> float:
+        """Blocks until a slot is free; returns its start time for `release`."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            return self._take()
+
+    def release(self, started: float, ok: bool = True, kind: str = UPLOAD):
+        """Frees the slot taken at `started` and adjusts the limit from how the request went."""
+        with self._condition:
+            now = self._clock()
+            latency = now - started
+            self.in_flight -= 1
+
+            if ok:
+                baseline = self._baselines.get(kind)
+                if baseline is None or latency < baseline:
+                    self._baselines[kind] = latency
+                elif self.limit <= self.min_limit:
+                    # At the lowest limit our own concurrency is not to blame: this is the service's pace.
+                    self._baselines[kind] = baseline + (latency - baseline) * 0.2
+
+            if not ok or latency > self.target_for(kind):
+                if started >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif self._last_full >= started:
+                # Only while the limit was reached at some point during this request
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            self.low = min(self.low, self.limit)
+            self.high = max(self.high, self.limit)
+            self._condition.notify_all()
+
+    def _take(self) -> float:
+        now = self._clock()
+        self.in_flight += 1
+        if self.in_flight >= self.limit:
+            self._last_full = now
+        return now
+
+
+class TokenBucket:
+    """
+    Caps the request rate at `rate` per second, allowing bursts of up to
+    `burst` requests (default: one second's worth). Thread-safe; a caller
+    that finds the bucket empty reserves the next token and sleeps until it
+    is due, so waiting callers are served in order.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+
+        self.rate = rate
+        self.burst = max(burst or rate, 1.0)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+        # Total seconds callers were told to wait
+        self.waited_seconds = 0.0
+
+    def reserve(self) -> float:
+        """Takes a token; returns how many seconds to wait before using it."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = max(0.0, -self._tokens / self.rate)
+            self.waited_seconds += delay
+            return delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a service that is down. After
+    `failure_threshold` consecutive failures the breaker opens and `allow()`
+    refuses everything for `reset_timeout` seconds. Then it lets a single
+    probe through (half-open): its success closes the breaker again, its
+    failure reopens it for another `reset_timeout`. Thread-safe.
+    """
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        # Times the breaker opened
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; a True in half-open state is the probe."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print("[AgenticSpeech] Supabase reachable again, resuming inserts.")
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                if self.state == "closed":
+                    print(
+                        f"  [Warning] {self._failures} inserts failed in a row: pausing inserts "
+                        f"for {self.reset_timeout:.0f}s"
+                    )
+                    self.trips += 1
+                self.state = "open"
+                self._opened_at = self._clock()
+                self._probing = False
+
+
+class UploadControl:
+    """
+    Gate in front of every storage request: an optional adaptive
+    concurrency limit and an optional token-bucket rate cap. `slot()`
+    wraps one request (from any thread); `async_slot()` does the same for
+    coroutines running on one event loop. A request that raises counts as
+    failed for the concurrency controller. `kind` tells the controller
+    which latency baseline the request is measured against (`UPLOAD` or
+    `ROWS`).
+    """
+
+    def __init__(self, concurrency: Optional[AIMDConcurrency] = None, bucket: Optional[TokenBucket] = None):
+        self.concurrency = concurrency
+        self.bucket = bucket
+        self._released: Optional[asyncio.Event] = None
+
+    @contextmanager
+    def slot(self, kind: str = UPLOAD):
+        # Tokens are taken before the slot, so waiting on the rate cap does not count as latency.
+        if self.bucket is not None:
+            self.bucket.acquire()
+        started = self.concurrency.acquire() if self.concurrency is not None else None
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            if started is not None:
+                self.concurrency.release(started, ok, kind)
+
+    @asynccontextmanager
+    async def async_slot(self, kind: str = UPLOAD):
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        started = None
+        if self.concurrency is not None:
+            if self._released is None:
+                self._released = asyncio.Event()
+            # Slots are only freed by coroutines on this loop, which set the event.
+            while (started := self.concurrency.try_acquire()) is None:
+                self._released.clear()
+                await self._released.wait()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            if started is not None:
+                self.concurrency.release(started, ok, kind)
+                self._released.set()
+
+
+def open_upload_control(max_concurrency: int) -> Optional[UploadControl]:
+    """
+    Builds the upload gate from the environment; None when neither control
+    is enabled. INSERT_ADAPTIVE=1 resizes the uploads in flight between
+    INSERT_MIN_CONCURRENCY and `max_concurrency` (the upload workers),
+    treating failures and requests slower than INSERT_LATENCY_TARGET_MS
+    (default: twice the fastest seen) as congestion. INSERT_RATE_LIMIT caps
+    storage requests per second, with bursts of INSERT_RATE_BURST.
+    """
+    concurrency = None
+    if os.environ.get("INSERT_ADAPTIVE", "0") == "1":
+        min_limit = min(int(os.environ.get("INSERT_MIN_CONCURRENCY", "1")), max_concurrency)
+        target_ms = float(os.environ.get("INSERT_LATENCY_TARGET_MS", "0"))
+        concurrency = AIMDConcurrency(
+            initial=min(4, max_concurrency),
+            min_limit=min_limit,
+            max_limit=max_concurrency,
+            latency_target=target_ms / 1000 if target_ms > 0 else None,
+        )
+
+    bucket = None
+    rate = float(os.environ.get("INSERT_RATE_LIMIT", "0"))
+    if rate > 0:
+        bucket = TokenBucket(rate, float(os.environ.get("INSERT_RATE_BURST", "0")) or None)
+
+    if concurrency is None and bucket is None:
+        return None
+    return UploadControl(concurrency, bucket)
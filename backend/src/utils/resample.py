@@ -0,0 +1,66 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import soxr
+
+# quality -> libsoxr recipe. "hq" is what librosa.resample uses by default
+# (res_type="soxr_hq"), so it reproduces the previous output bit for bit.
+QUALITY_PRESETS = {
+    "fast": "LQ",
+    "medium": "MQ",
+    "hq": "HQ",
+    "vhq": "VHQ",
+}
+
+_local = threading.local()
+
+
+def _get_stream(orig_sr: int, target_sr: int, quality: str) -> soxr.ResampleStream:
+    """
+    Returns this thread's resampler for (orig_sr, target_sr, quality).
+
+    The polyphase filter bank is designed once when the stream is created;
+    later calls only `clear()` its state. Streams are stateful and not
+    thread-safe, hence one cache per thread.
+    """
+    streams: Dict[Tuple[int, int, str], soxr.ResampleStream] = getattr(_local, "streams", None)
+    if streams is None:
+        streams = _local.streams = {}
+
+    key = (orig_sr, target_sr, quality)
+    stream = streams.get(key)
+    if stream is None:
+        stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype="float32", quality=QUALITY_PRESETS[quality])
+        streams[key] = stream
+    return stream
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int = 16000, quality: Optional[str] = None) -> np.ndarray:
+    """
+    Resamples a 1-D signal from `orig_sr` to `target_sr` in float32.
+
+    `quality` is one of QUALITY_PRESETS, defaulting to RESAMPLE_QUALITY
+    (`hq` if unset). Float32 C-contiguous input is passed through without a
+    copy. Returns the input unchanged when the rates already match.
+    """
+    quality = (quality or os.environ.get("RESAMPLE_QUALITY", "hq")).lower()
+    if quality not in QUALITY_PRESETS:
+        raise ValueError(f"Unknown resample quality '{quality}', expected one of {sorted(QUALITY_PRESETS)}")
+
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio
+
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+    stream = _get_stream(int(orig_sr), int(target_sr), quality)
+    try:
+        output = stream.resample_chunk(audio, last=True)
+    finally:
+        stream.clear()
+
+    # Same length as librosa.resample(fix=True): ceil(n * target_sr / orig_sr).
+    expected = int(np.ceil(len(audio) * target_sr / orig_sr))
+    if len(output) < expected:
+        output = np.pad(output, (0, expected - len(output)))
+    return output[:expected]
@@ -0,0 +1,305 @@
+import fcntl
+import hashlib
+import json
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+def shard_of(utterance_id: str, num_shards: int) -> int:
+    """
+    Stable shard of an utterance: a hash of its id, so every worker agrees
+    on the partition without coordinating and regardless of stream order.
+    """
+    digest = hashlib.blake2b(utterance_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+class StaticShards:
+    """
+    Fixed partition of the stream: worker `rank` of `world_size` owns the
+    shards `s` with `s % world_size == rank`, out of `num_shards`
+    (default `world_size`, i.e. one shard per worker).
+    """
+
+    def __init__(self, rank: int, world_size: int, num_shards: Optional[int] = None):
+        num_shards = num_shards or world_size
+        if not 0 <= rank < world_size:
+            raise ValueError(f"WORKER_RANK must be in [0, {world_size}), got {rank}")
+        if num_shards < world_size:
+            raise ValueError(f"NUM_SHARDS ({num_shards}) must be at least WORLD_SIZE ({world_size})")
+
+        self.rank = rank
+        self.world_size = world_size
+        self.num_shards = num_shards
+        self.shards = [shard for shard in range(num_shards) if shard % world_size == rank]
+        self._owned = set(self.shards)
+
+    def owns(self, utterance_id: str) -> bool:
+        return shard_of(utterance_id, self.num_shards) in self._owned
+
+    def scoped_path(self, path: str) -> str:
+        """Per-worker variant of a state file path, e.g. progress.rank-1-of-4.json."""
+        root, extension = os.path.splitext(path)
+        return f"{root}.rank-{self.rank}-of-{self.world_size}{extension}"
+
+
+class ShardLeases:
+    """
+    Hands out shard leases to the workers sharing one JSON file (on a volume
+    mounted by every container), serialized with an exclusive `flock` on a
+    sibling `.lock` file.
+
+    A worker `claim`s shards nobody holds, whose lease expired (its worker
+    stopped renewing, i.e. died) or that it already holds, and a daemon
+    thread renews its leases every `ttl / 3` seconds while it works on
+    them. Finished shards are recorded as done and never handed out again,
+    so the file doubles as the progress record of a sharded run.
+
+    A shard with a chunk reported through `fail` is not done: `complete`
+    releases it for another pass (which redoes its utterances; inserts are
+    idempotent) and counts the pass in the file's `failed` map. After
+    `max_passes` failed passes the shard is no longer claimed, but stays
+    out of `done`; drop it from `failed` to retry it.
+    """
+
+    def __init__(
+        self, path: str, num_shards: int, worker_id: Optional[str] = None, ttl: float = 60.0,
+        claim_limit: Optional[int] = None, max_passes: int = 3, clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.num_shards = num_shards
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        # Shards leased per claim by default (None: as many as are open)
+        self.claim_limit = claim_limit
+        self.max_passes = max_passes
+        self._clock = clock
+
+        self.held: Set[int] = set()
+        # Held shards with a chunk that failed in the current pass
+        self._failed: Set[int] = set()
+        self._held_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+        # Creates the file, or checks it was set up for the same partition.
+        with self._state():
+            pass
+
+    def claim(self, limit: Optional[int] = None) -> List[int]:
+        """Leases up to `limit` (default `claim_limit`) open shards; returns the held shards."""
+        limit = self.claim_limit if limit is None else limit
+        with self._state() as state:
+            now = self._clock()
+            leases = state["leases"]
+            held = [int(shard) for shard, lease in leases.items() if lease["worker"] == self.worker_id]
+            for shard in range(self.num_shards):
+                if limit is not None and len(held) >= limit:
+                    break
+                lease = leases.get(str(shard))
+                if shard in state["done"] or shard in held or self._exhausted(state, shard):
+                    continue
+                if lease is None or lease["expires"] <= now:
+                    held.append(shard)
+            for shard in held:
+                leases[str(shard)] = {"worker": self.worker_id, "expires": now + self.ttl}
+
+        with self._held_lock:
+            self.held = set(held)
+        if held:
+            self._start_heartbeat()
+        return sorted(held)
+
+    def renew(self) -> List[int]:
+        """Extends this worker's leases; returns those it still holds (others may have taken expired ones)."""
+        with self._held_lock:
+            held = set(self.held)
+        if not held:
+            return []
+
+        with self._state() as state:
+            expires = self._clock() + self.ttl
+            kept = []
+            for shard in sorted(held):
+                lease = state["leases"].get(str(shard))
+                if lease is not None and lease["worker"] == self.worker_id:
+                    lease["expires"] = expires
+                    kept.append(shard)
+
+        lost = held.difference(kept)
+        if lost:
+            print(f"  [Warning] Shard leases {sorted(lost)} expired and were taken over by another worker")
+        with self._held_lock:
+            self.held.difference_update(lost)
+        return kept
+
+    def fail(self, utterance_id: Optional[str]):
+        """Reports a chunk that errored, so its shard is not recorded as done (all held shards if unknown)."""
+        with self._held_lock:
+            if utterance_id is None:
+                self._failed.update(self.held)
+            else:
+                self._failed.add(shard_of(utterance_id, self.num_shards))
+
+    def complete(self, shards: List[int]):
+        """
+        Records shards as fully processed and drops their leases; shards
+        with a failed chunk are released for another pass instead.
+        """
+        with self._held_lock:
+            failed = self._failed.intersection(shards)
+            self._failed.difference_update(shards)
+        done = [shard for shard in shards if shard not in failed]
+
+        with self._state() as state:
+            state["done"] = sorted(set(state["done"]).union(done))
+            passes = state.setdefault("failed", {})
+            for shard in sorted(failed):
+                passes[str(shard)] = passes.get(str(shard), 0) + 1
+                if self._exhausted(state, shard):
+                    print(
+                        f"  [Warning] Shard {shard} had failed chunks in {passes[str(shard)]} passes; "
+                        f"leaving it pending (drop it from 'failed' in {self.path} to retry)"
+                    )
+            for shard in shards:
+                state["leases"].pop(str(shard), None)
+        with self._held_lock:
+            self.held.difference_update(shards)
+
+    def remaining(self) -> int:
+        """Shards not done yet that can still be claimed, leased or not."""
+        with self._state() as state:
+            exhausted = sum(self._exhausted(state, shard) for shard in range(self.num_shards))
+            return self.num_shards - len(state["done"]) - exhausted
+
+    def close(self):
+        """Stops renewing and releases unfinished leases so other workers can claim them right away."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        with self._held_lock:
+            held, self.held = self.held, set()
+        if held:
+            with self._state() as state:
+                for shard in held:
+                    lease = state["leases"].get(str(shard))
+                    if lease is not None and lease["worker"] == self.worker_id:
+                        del state["leases"][str(shard)]
+
+    def _exhausted(self, state: Dict[str, Any], shard: int) -> bool:
+        return state.get("failed", {}).get(str(shard), 0) >= self.max_passes
+
+    def _start_heartbeat(self):
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._renew_periodically, daemon=True)
+            self._heartbeat.start()
+
+    def _renew_periodically(self):
+        while not self._stop.wait(self.ttl / 3):
+            # A failed renewal must not stop the heartbeat; the next one may succeed.
+            try:
+                self.renew()
+            except Exception as e:
+                print(f"  [Error] Shard lease renewal failed: {str(e)}")
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, Any]]:
+        """Reads the lease file under the lock and writes it back (atomically) on exit."""
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                state = {"num_shards": self.num_shards, "leases": {}, "done": []}
+                if os.path.exists(self.path):
+                    with open(self.path) as f:
+                        state = json.load(f)
+                if state["num_shards"] != self.num_shards:
+                    raise ValueError(
+                        f"{self.path} partitions the stream into {state['num_shards']} shards, "
+                        f"not NUM_SHARDS={self.num_shards}"
+                    )
+
+                yield state
+
+                tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def leased_stream(
+    leases: ShardLeases,
+    fetch: Callable[[Callable[[str], bool]], Iterator[Dict[str, Any]]],
+    idle: Optional[Callable[[], bool]] = None,
+    poll_interval: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streams the utterances of leased shards, one pass over the stream per
+    claim (up to `claim_limit` shards). `fetch(owns)` streams the utterances
+    whose id `owns` accepts.
+
+    A pass's shards are completed once its last record has been fetched and
+    the pipeline is `idle` again (all of their chunks are through); shards
+    with a chunk reported to `leases.fail` are released for a retry. While
+    other workers still hold leases on the remaining shards it keeps
+    polling, so the shards of a worker that dies are picked up when its
+    leases expire; it returns once every shard is done.
+    """
+    poll_interval = leases.ttl / 3 if poll_interval is None else poll_interval
+    while True:
+        shards = leases.claim()
+        if not shards:
+            if leases.remaining() == 0:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        owned = set(shards)
+        print(f"[AgenticSpeech] Streaming shards {shards} of {leases.num_shards}.")
+        yield from fetch(lambda utterance_id: shard_of(utterance_id, leases.num_shards) in owned)
+
+        while idle is not None and not idle():
+            time.sleep(0.05)
+        leases.complete(shards)
+
+
+def open_sharding() -> Tuple[Optional[StaticShards], Optional[ShardLeases]]:
+    """
+    Builds the stream partition from WORKER_RANK / WORLD_SIZE (and
+    NUM_SHARDS). With SHARD_LEASE_PATH set, shards are leased dynamically
+    through that file instead: NUM_SHARDS defaults to 4 per worker (finer
+    shards make a dead worker's backlog quicker to redistribute), each pass
+    claims a WORLD_SIZE-th of them, leases expire after SHARD_LEASE_TTL_S
+    without renewal, and a shard with failed chunks is retried for up to
+    SHARD_MAX_PASSES passes. Returns (None, None) for a single
+    unsharded worker.
+    """
+    world_size = int(os.environ.get("WORLD_SIZE", "1"))
+    lease_path = os.environ.get("SHARD_LEASE_PATH")
+
+    if lease_path:
+        directory = os.path.dirname(lease_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        num_shards = int(os.environ.get("NUM_SHARDS", str(4 * world_size)))
+        ttl = float(os.environ.get("SHARD_LEASE_TTL_S", "60"))
+        leases = ShardLeases(
+            lease_path, num_shards, worker_id=os.environ.get("WORKER_ID"), ttl=ttl,
+            claim_limit=math.ceil(num_shards / max(world_size, 1)),
+            max_passes=int(os.environ.get("SHARD_MAX_PASSES", "3")),
+        )
+        return None, leases
+
+    if world_size <= 1:
+        return None, None
+    rank = int(os.environ.get("WORKER_RANK", "0"))
+    num_shards = int(os.environ.get("NUM_SHARDS", "0")) or None
+    return StaticShards(rank, world_size, num_shards), None
@@ -0,0 +1,163 @@
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+# Decoded utterance audio is float32 unless AUDIO_DTYPE=int16.
+_DTYPE = np.float32
+
+
+class AudioHandle(NamedTuple):
+    """
+    Picklable reference to audio living in a `SharedAudioRing`.
+    `offset` and `length` are expressed in samples of `dtype`, not bytes.
+    """
+
+    buffer_id: str
+    offset: int
+    length: int
+    dtype: str = "float32"
+
+
+class SharedAudioRing:
+    """
+    Ring buffer of audio (float32, or the pipeline's `dtype`) backed by
+    `multiprocessing.shared_memory`.
+
+    Chunks coming out of VAD are copied in once; afterwards pipeline states
+    only carry an `AudioHandle` of (buffer id, offset, length), which worker
+    processes resolve with `attach_view` instead of unpickling a fresh array.
+
+    Every allocation is reference counted. Space is reclaimed in ring order
+    once the oldest allocations drop to zero references, so `put` blocks
+    (backpressure) while the ring is full of chunks still in flight.
+    This object must only be used from the process that created it.
+    """
+
+    def __init__(self, capacity_samples: int, dtype=_DTYPE):
+        if capacity_samples <= 0:
+            raise ValueError(f"capacity_samples must be positive, got {capacity_samples}")
+
+        self.capacity = capacity_samples
+        self.dtype = np.dtype(dtype)
+        self._shm = shared_memory.SharedMemory(create=True, size=capacity_samples * self.dtype.itemsize)
+        self.buffer_id = self._shm.name
+        self._array = np.ndarray((capacity_samples,), dtype=self.dtype, buffer=self._shm.buf)
+
+        self._cond = threading.Condition()
+        # Monotonic write / reclaim cursors; physical position is cursor % capacity.
+        self._head = 0
+        self._tail = 0
+        # Live allocations in ring order: monotonic start -> [end cursor, refcount]
+        self._allocations: "OrderedDict[int, list]" = OrderedDict()
+        self._by_offset: Dict[int, int] = {}
+
+    def put(
+        self, audio: np.ndarray, refs: int = 1, timeout: Optional[float] = None, block: bool = True
+    ) -> Optional[AudioHandle]:
+        """
+        Copies `audio` into the ring and returns its handle holding `refs` references.
+        Blocks until enough space is released, raising TimeoutError after `timeout`.
+        With `block=False` it returns None right away when the ring is full: a
+        caller holding references of its own (that only it can release) must
+        not wait for space.
+        """
+        length = len(audio)
+        if length > self.capacity:
+            raise ValueError(f"Audio of {length} samples exceeds ring capacity {self.capacity}")
+
+        with self._cond:
+            while True:
+                position = self._head % self.capacity
+                # Allocations are contiguous: skip the ring's tail end if it is too short.
+                skip = self.capacity - position if position + length > self.capacity else 0
+                if self._head + skip + length - self._tail <= self.capacity:
+                    break
+                if not block:
+                    return None
+                if not self._cond.wait(timeout):
+                    raise TimeoutError("Timed out waiting for free space in the shared audio ring")
+
+            # The skipped gap is owned by this allocation and reclaimed along with it.
+            reserved_from = self._head
+            offset = (reserved_from + skip) % self.capacity
+            self._head = reserved_from + skip + length
+
+            self._allocations[reserved_from] = [self._head, refs]
+            self._by_offset[offset] = reserved_from
+
+        self._array[offset:offset + length] = audio
+        return AudioHandle(self.buffer_id, offset, length, self.dtype.name)
+
+    def view(self, handle: AudioHandle) -> np.ndarray:
+        """Zero-copy view of the audio referenced by `handle`."""
+        return self._array[handle.offset:handle.offset + handle.length]
+
+    def acquire(self, handle: AudioHandle):
+        with self._cond:
+            self._allocations[self._by_offset[handle.offset]][1] += 1
+
+    def release(self, handle: AudioHandle):
+        """
+        Drops one reference. Once the oldest allocations are unreferenced
+        their space is reclaimed and blocked writers are woken up.
+        """
+        with self._cond:
+            key = self._by_offset[handle.offset]
+            allocation = self._allocations[key]
+            allocation[1] -= 1
+            if allocation[1] > 0:
+                return
+
+            del self._by_offset[handle.offset]
+            while self._allocations:
+                _, (end, refs) = next(iter(self._allocations.items()))
+                if refs > 0:
+                    break
+                self._allocations.popitem(last=False)
+                self._tail = end
+
+            if not self._allocations:
+                # Nothing in flight: rewind so the next chunk never needs a wrap gap.
+                self._head = self._tail = 0
+
+            self._cond.notify_all()
+
+    def used(self) -> int:
+        """Samples currently reserved, including wrap-around gaps."""
+        with self._cond:
+            return self._head - self._tail
+
+    def close(self):
+        """Releases and unlinks the shared memory segment."""
+        self._array = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+# Segments attached by worker processes, kept open for the life of the process.
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+_attach_lock = threading.Lock()
+
+
+def attach_view(handle: AudioHandle) -> np.ndarray:
+    """
+    Resolves `handle` to a read-only array view from any process.
+    The segment is attached on first use and cached per buffer id.
+    """
+    with _attach_lock:
+        shm = _attached.get(handle.buffer_id)
+        if shm is None:
+            try:
+                # Python 3.13+: the creating process owns the segment's lifetime.
+                shm = shared_memory.SharedMemory(name=handle.buffer_id, track=False)
+            except TypeError:
+                shm = shared_memory.SharedMemory(name=handle.buffer_id)
+            _attached[handle.buffer_id] = shm
+
+    dtype = np.dtype(handle.dtype)
+    view = np.ndarray((handle.length,), dtype=dtype, buffer=shm.buf, offset=handle.offset * dtype.itemsize)
+    view.flags.writeable = False
+    return view
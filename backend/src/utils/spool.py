@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import shutil
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+_AUDIO_SUFFIX = ".audio"
+_JOB_SUFFIX = ".json"
+
+
+def _write_atomic(path: str, payload: bytes):
+    # Write to a temporary sibling first so the replayer never sees half a file.
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class RetrySpool:
+    """
+    On-disk queue of insertions that failed, so a transcribed chunk
+    survives a Supabase outage or a restart.
+
+    Each job is two files in `root/pending`: `<id>.audio` with the encoded
+    audio and `<id>.json` with where it goes (storage path, content type),
+    its `speech_chunks` row and its retry state. The audio is written
+    first, so a job exists once its `.json` does. Ids are the chunk ids,
+    which makes spooling the same chunk twice a single job.
+
+    A failed attempt is retried after an exponential backoff with full
+    jitter (uniformly up to `base_delay * 2**attempts`, at most
+    `max_delay`), so workers recovering from the same outage do not retry
+    in lockstep. After `max_attempts` the job is moved to `root/dead`, the
+    dead-letter queue, for inspection; `requeue_dead()` puts it back.
+    """
+
+    def __init__(
+        self, root: str, max_attempts: int = 8, base_delay: float = 2.0, max_delay: float = 300.0,
+        clock: Callable[[], float] = time.time, rng: Optional[random.Random] = None,
+    ):
+        self.root = root
+        self.pending_dir = os.path.join(root, "pending")
+        self.dead_dir = os.path.join(root, "dead")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._rng = rng or random.Random()
+
+        os.makedirs(self.pending_dir, exist_ok=True)
+        os.makedirs(self.dead_dir, exist_ok=True)
+
+    def put(self, job_id: str, storage_path: str, audio: bytes, content_type: str, row: Dict[str, Any], error: str):
+        """Spools a failed insertion for its first retry."""
+        _write_atomic(self._path(self.pending_dir, job_id, _AUDIO_SUFFIX), audio)
+        now = self._clock()
+        self._save(job_id, {
+            "id": job_id,
+            "storage_path": storage_path,
+            "content_type": content_type,
+            "row": row,
+            "attempts": 0,
+            "first_failed": now,
+            "next_attempt": now + self._backoff(0),
+            "last_error": error,
+        })
+
+    def due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Pending jobs whose backoff has elapsed, oldest first."""
+        now = self._clock() if now is None else now
+        jobs = [job for job in self._jobs(self.pending_dir) if job["next_attempt"] <= now]
+        return sorted(jobs, key=lambda job: job["next_attempt"])
+
+    def audio(self, job: Dict[str, Any]) -> bytes:
+        with open(self._path(self.pending_dir, job["id"], _AUDIO_SUFFIX), "rb") as f:
+            return f.read()
+
+    def succeeded(self, job: Dict[str, Any]):
+        """Removes a job that was inserted."""
+        # The job file goes first: without it the audio is just an orphan to clean up.
+        for suffix in (_JOB_SUFFIX, _AUDIO_SUFFIX):
+            _remove(self._path(self.pending_dir, job["id"], suffix))
+
+    def failed(self, job: Dict[str, Any], error: str) -> bool:
+        """Records a failed retry; returns False once the job went to the dead-letter queue."""
+        job["attempts"] += 1
+        job["last_error"] = error
+        if job["attempts"] >= self.max_attempts:
+            self._move(job["id"], self.pending_dir, self.dead_dir)
+            self._save(job["id"], job, self.dead_dir)
+            print(
+                f"  [Error] Giving up on chunk {job['id']} after {job['attempts']} retries "
+                f"(moved to {self.dead_dir}): {error}"
+            )
+            return False
+
+        job["next_attempt"] = self._clock() + self._backoff(job["attempts"])
+        self._save(job["id"], job)
+        return True
+
+    def requeue_dead(self) -> int:
+        """Moves every dead-lettered job back to pending with a fresh retry budget."""
+        jobs = self._jobs(self.dead_dir)
+        for job in jobs:
+            job.update(attempts=0, next_attempt=self._clock())
+            self._save(job["id"], job, self.dead_dir)
+            self._move(job["id"], self.dead_dir, self.pending_dir)
+        return len(jobs)
+
+    def pending_count(self) -> int:
+        return len(self._job_files(self.pending_dir))
+
+    def dead_count(self) -> int:
+        return len(self._job_files(self.dead_dir))
+
+    def _backoff(self, attempts: int) -> float:
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempts))
+
+    def _save(self, job_id: str, job: Dict[str, Any], directory: Optional[str] = None):
+        path = self._path(directory or self.pending_dir, job_id, _JOB_SUFFIX)
+        _write_atomic(path, json.dumps(job).encode("utf-8"))
+
+    def _move(self, job_id: str, source: str, destination: str):
+        # Audio first, so the job never shows up in `destination` without it.
+        for suffix in (_AUDIO_SUFFIX, _JOB_SUFFIX):
+            shutil.move(self._path(source, job_id, suffix), self._path(destination, job_id, suffix))
+
+    def _jobs(self, directory: str) -> List[Dict[str, Any]]:
+        jobs = []
+        for name in self._job_files(directory):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed or moved by a concurrent replay
+                continue
+        return jobs
+
+    @staticmethod
+    def _job_files(directory: str) -> List[str]:
+        return [name for name in os.listdir(directory) if name.endswith(_JOB_SUFFIX)]
+
+    @staticmethod
+    def _path(directory: str, job_id: str, suffix: str) -> str:
+        return os.path.join(directory, f"{job_id}{suffix}")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def open_spool() -> Optional[RetrySpool]:
+    """
+    Builds the retry spool from INSERT_SPOOL_DIR (unset disables it), with
+    up to INSERT_RETRY_MAX_ATTEMPTS retries backing off from
+    INSERT_RETRY_BASE_S to at most INSERT_RETRY_MAX_S seconds.
+    """
+    root = os.environ.get("INSERT_SPOOL_DIR")
+    if not root:
+        return None
+    return RetrySpool(
+        root,
+        max_attempts=int(os.environ.get("INSERT_RETRY_MAX_ATTEMPTS", "8")),
+        base_delay=float(os.environ.get("INSERT_RETRY_BASE_S", "2")),
+        max_delay=float(os.environ.get("INSERT_RETRY_MAX_S", "300")),
+    )
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Chunk state fields needed to score and insert a chunk again without its audio.
+_CHUNK_FIELDS = (
+    "original_text",
+    "dataset_id",
+    "speaker_id",
+    "utterance_id",
+    "stream_index",
+    "start_time",
+    "end_time",
+    "start_sample",
+    "end_sample",
+    "pad_samples",
+    "chunk_index",
+    "chunk_count",
+    "utterance_speech_start",
+    "utterance_speech_end",
+    "duration",
+    "sample_rate",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    audio_hash TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    vad_params TEXT NOT NULL,
+    transcribed_text TEXT NOT NULL,
+    aligned_words TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (audio_hash, model_id, vad_params)
+);
+CREATE INDEX IF NOT EXISTS transcripts_lru ON transcripts (last_access);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_key TEXT PRIMARY KEY,
+    audio_hash TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    vad_params TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_transcript ON chunks (audio_hash, model_id, vad_params);
+"""
+
+
+def _chunk_key(data: Dict[str, Any]) -> Optional[str]:
+    # Same identity the deterministic insert ids are derived from.
+    if not data.get("utterance_id") or "start_sample" not in data or "end_sample" not in data:
+        return None
+    return f"{data.get('dataset_id', 'unknown_ds')}/{data['utterance_id']}/{data['start_sample']}-{data['end_sample']}"
+
+
+def audio_hash(audio: np.ndarray, pad_samples: int = 0) -> str:
+    """
+    Content hash of a chunk's samples (float32, or int16 with
+    AUDIO_DTYPE=int16) followed by `pad_samples` of silence, equal to the
+    hash of the padded array without building it.
+    """
+    dtype = np.int16 if audio.dtype == np.int16 else np.float32
+    digest = hashlib.blake2b(np.ascontiguousarray(audio, dtype=dtype).data, digest_size=16)
+    if pad_samples:
+        digest.update(bytes(pad_samples * np.dtype(dtype).itemsize))
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Persistent SQLite cache of Vosk transcriptions, keyed by (chunk audio
+    content hash, Vosk model id, VAD parameters), so a changed WER gate can
+    be re-applied offline (see `src/regate.py`) instead of re-running VAD
+    and Vosk over the dataset.
+
+    `transcripts` holds one `transcribed_text` / `aligned_words` entry per
+    key; `chunks` records, per chunk identity (dataset, utterance, sample
+    offsets), the chunk metadata (`_CHUNK_FIELDS`) and which transcript it
+    maps to. Least recently used transcripts, with their chunk rows, are
+    evicted once the stored text exceeds `max_bytes`.
+
+    Only the `model_id` / `vad_params` this cache was opened with are read
+    or written; entries made under other settings stay until evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int, model_id: str, vad_params: Dict[str, Any]):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.model_id = model_id
+        self.vad_params = json.dumps(vad_params, sort_keys=True)
+
+        # Shared by the transcription worker threads, serialized by the lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._total_bytes = self._query_total_bytes()
+
+    def get(self, key: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Returns the cached (transcribed_text, aligned_words) of a chunk audio hash."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT transcribed_text, aligned_words FROM transcripts "
+                "WHERE audio_hash = ? AND model_id = ? AND vad_params = ?",
+                (key, self.model_id, self.vad_params),
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute(
+                "UPDATE transcripts SET last_access = ? WHERE audio_hash = ? AND model_id = ? AND vad_params = ?",
+                (time.time(), key, self.model_id, self.vad_params),
+            )
+            self._conn.commit()
+
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, transcribed_text: str, aligned_words: List[Dict[str, Any]]):
+        words = json.dumps(aligned_words)
+        size = len(transcribed_text) + len(words)
+
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT bytes FROM transcripts WHERE audio_hash = ? AND model_id = ? AND vad_params = ?",
+                (key, self.model_id, self.vad_params),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, self.model_id, self.vad_params, transcribed_text, words, size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+
+    def record_chunk(self, key: str, data: Dict[str, Any]):
+        """
+        Remembers which transcript a chunk maps to, along with its metadata.
+        Chunks without an utterance identity cannot be re-sliced and are skipped.
+        """
+        chunk_key = _chunk_key(data)
+        if chunk_key is None:
+            return
+        metadata = json.dumps({field: data[field] for field in _CHUNK_FIELDS if field in data})
+
+        with self._lock:
+            previous = self._conn.execute("SELECT bytes FROM chunks WHERE chunk_key = ?", (chunk_key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                (chunk_key, key, self.model_id, self.vad_params, metadata, len(metadata)),
+            )
+            self._total_bytes += len(metadata) - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+
+    def transcribe(self, data: Dict[str, Any], transcribe_fn: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """
+        Transcription stage wrapper: serves the chunk from the cache, or runs
+        `transcribe_fn` and stores its result. Transcripts cut short by the
+        streaming WER gate are partial and not cached (the pipeline decodes
+        fully when the cache is enabled, see src/main.py).
+        """
+        key = audio_hash(data["chunk_array"], data.get("pad_samples", 0))
+        cached = self.get(key)
+        if cached is not None:
+            data["transcribed_text"], data["aligned_words"] = cached
+        else:
+            data = transcribe_fn(data)
+            if data.get("transcription_aborted"):
+                return data
+            self.put(key, data["transcribed_text"], data["aligned_words"])
+
+        self.record_chunk(key, data)
+        return data
+
+    def chunks(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every cached chunk as a transcribed pipeline state (without
+        audio, but with the `audio_hash` it was transcribed from), in stream
+        order.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.audio_hash, c.metadata, t.transcribed_text, t.aligned_words FROM chunks c JOIN transcripts t "
+                "ON c.audio_hash = t.audio_hash AND c.model_id = t.model_id AND c.vad_params = t.vad_params "
+                "WHERE c.model_id = ? AND c.vad_params = ?",
+                (self.model_id, self.vad_params),
+            ).fetchall()
+
+        states = []
+        for key, metadata, transcribed_text, aligned_words in rows:
+            state = json.loads(metadata)
+            state["audio_hash"] = key
+            state["transcribed_text"] = transcribed_text
+            state["aligned_words"] = json.loads(aligned_words)
+            states.append(state)
+
+        states.sort(key=lambda state: (state.get("stream_index") or 0, state.get("chunk_index", 0)))
+        yield from states
+
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        # Caller holds the lock. Drops LRU transcripts (and their chunks) until within budget.
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT audio_hash, model_id, vad_params, bytes FROM transcripts ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+
+            key = row[:3]
+            chunk_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(bytes), 0) FROM chunks WHERE audio_hash = ? AND model_id = ? AND vad_params = ?",
+                key,
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM chunks WHERE audio_hash = ? AND model_id = ? AND vad_params = ?", key)
+            self._conn.execute(
+                "DELETE FROM transcripts WHERE audio_hash = ? AND model_id = ? AND vad_params = ?", key
+            )
+            self._total_bytes -= row[3] + chunk_bytes
+
+    def _query_total_bytes(self) -> int:
+        transcripts = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM transcripts").fetchone()[0]
+        chunks = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM chunks").fetchone()[0]
+        return transcripts + chunks
+
+
+def open_transcript_cache(
+    model_id: str, vad_params: Dict[str, Any], path: Optional[str] = None, max_mb: Optional[float] = None
+) -> Optional[TranscriptCache]:
+    """
+    Builds the cache from TRANSCRIPT_CACHE_PATH / TRANSCRIPT_CACHE_MAX_MB
+    (default 1024MB). Returns None when no cache path is configured.
+    """
+    path = path or os.environ.get("TRANSCRIPT_CACHE_PATH")
+    if not path:
+        return None
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    max_mb = max_mb if max_mb is not None else float(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", "1024"))
+    return TranscriptCache(path, int(max_mb * 1024**2), model_id, vad_params)
@@ -0,0 +1,204 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.utils.resample import resample
+
+# Only the pipeline's native rate and Silero's low-rate mode are supported.
+SUPPORTED_VAD_RATES = (16000, 8000)
+
+# get_speech_timestamps defaults used by process_vad
+_THRESHOLD = 0.5
+_NEG_THRESHOLD = _THRESHOLD - 0.15
+_MIN_SPEECH_MS = 250
+_MIN_SILENCE_MS = 100
+_SPEECH_PAD_MS = 30
+
+
+def _downsample(audio: np.ndarray, step: int) -> np.ndarray:
+    """
+    Brings 16kHz audio down to the VAD rate with soxr's low-pass filter, so
+    energy above the new Nyquist frequency does not alias into the band the
+    VAD scores (plain `audio[::step]` decimation would). Same length as
+    `audio[::step]`, so timestamps map back with `_rescale`.
+    """
+    if step == 1:
+        return audio
+    return resample(audio, step, 1, quality="medium")
+
+
+def _rescale(timestamps: List[Dict[str, int]], step: int, length: int) -> List[Dict[str, int]]:
+    """Maps VAD-rate sample offsets back onto the 16kHz audio."""
+    if step == 1:
+        return timestamps
+    return [{"start": min(ts["start"] * step, length), "end": min(ts["end"] * step, length)} for ts in timestamps]
+
+
+class TorchJitEngine:
+    """
+    The original backend: Silero's PyTorch JIT model driven by its own
+    `get_speech_timestamps`, one utterance at a time.
+    """
+
+    def __init__(self, model, get_speech_timestamps, vad_sample_rate: int = 16000):
+        self.model = model
+        self.get_speech_timestamps = get_speech_timestamps
+        self.vad_sample_rate = vad_sample_rate
+
+    def speech_timestamps_batch(self, audios: List[np.ndarray], sample_rate: int) -> List[List[Dict[str, int]]]:
+        import torch
+
+        step = sample_rate // self.vad_sample_rate
+        results = []
+        for audio in audios:
+            tensor_audio = torch.from_numpy(np.ascontiguousarray(_downsample(audio, step)))
+            timestamps = self.get_speech_timestamps(tensor_audio, self.model, sampling_rate=self.vad_sample_rate)
+            results.append(_rescale(timestamps, step, len(audio)))
+        return results
+
+
+class SileroOnnxEngine:
+    """
+    ONNX Runtime CPU backend for the Silero VAD model.
+
+    Silero is recurrent over fixed windows (512 samples at 16kHz, 256 at
+    8kHz, each prefixed by the tail of the previous window), so a single
+    utterance needs one inference call per window. Here the windows of many
+    utterances are stacked along the batch axis instead: one `session.run`
+    scores window `t` of every utterance in the batch at once, with the
+    recurrent state carried per row. Shorter utterances are zero padded and
+    their trailing probabilities ignored.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, vad_sample_rate: int = 16000, num_threads: int = 1):
+        import onnxruntime
+
+        if vad_sample_rate not in SUPPORTED_VAD_RATES:
+            raise ValueError(f"VAD sample rate must be one of {SUPPORTED_VAD_RATES}, got {vad_sample_rate}")
+
+        if model_path is None:
+            model_path = _bundled_onnx_path()
+
+        options = onnxruntime.SessionOptions()
+        options.inter_op_num_threads = 1
+        options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            model_path, providers=["CPUExecutionProvider"], sess_options=options
+        )
+
+        self.vad_sample_rate = vad_sample_rate
+        self.window = 512 if vad_sample_rate == 16000 else 256
+        self.context = 64 if vad_sample_rate == 16000 else 32
+
+    def speech_probs_batch(self, audios: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Per-window speech probabilities for audio already at the VAD rate.
+        """
+        if not audios:
+            return []
+
+        frame_counts = [int(np.ceil(len(audio) / self.window)) for audio in audios]
+        max_frames = max(frame_counts)
+
+        # Row layout: [context zeros | window 0 | window 1 | ...]; the input of
+        # window t is then the contiguous slice starting at t * window.
+        padded = np.zeros((len(audios), self.context + max_frames * self.window), dtype=np.float32)
+        for row, audio in enumerate(audios):
+            padded[row, self.context:self.context + len(audio)] = audio
+
+        state = np.zeros((2, len(audios), 128), dtype=np.float32)
+        sr = np.array(self.vad_sample_rate, dtype=np.int64)
+        probs = np.zeros((len(audios), max_frames), dtype=np.float32)
+
+        for t in range(max_frames):
+            start = t * self.window
+            frame = np.ascontiguousarray(padded[:, start:start + self.context + self.window])
+            out, state = self.session.run(None, {"input": frame, "state": state, "sr": sr})
+            probs[:, t] = out[:, 0]
+
+        return [probs[row, :count] for row, count in enumerate(frame_counts)]
+
+    def speech_timestamps_batch(self, audios: List[np.ndarray], sample_rate: int) -> List[List[Dict[str, int]]]:
+        step = sample_rate // self.vad_sample_rate
+        downsampled = [_downsample(np.asarray(audio, dtype=np.float32), step) for audio in audios]
+        probs = self.speech_probs_batch(downsampled)
+
+        return [
+            _rescale(
+                timestamps_from_probs(p, len(audio), self.vad_sample_rate, self.window),
+                step,
+                len(original),
+            )
+            for p, audio, original in zip(probs, downsampled, audios)
+        ]
+
+
+def timestamps_from_probs(probs: np.ndarray, audio_length: int, sample_rate: int, window: int) -> List[Dict[str, int]]:
+    """
+    Port of the post-processing in silero_vad's `get_speech_timestamps`
+    (default thresholds, unlimited max speech duration), turning per-window
+    probabilities into padded {start, end} sample offsets.
+    """
+    min_speech_samples = sample_rate * _MIN_SPEECH_MS / 1000
+    min_silence_samples = sample_rate * _MIN_SILENCE_MS / 1000
+    speech_pad_samples = sample_rate * _SPEECH_PAD_MS / 1000
+
+    triggered = False
+    speeches: List[Dict[str, Any]] = []
+    current_speech: Dict[str, Any] = {}
+    temp_end = 0
+
+    for i, speech_prob in enumerate(probs):
+        if speech_prob >= _THRESHOLD and temp_end:
+            temp_end = 0
+
+        if speech_prob >= _THRESHOLD and not triggered:
+            triggered = True
+            current_speech["start"] = window * i
+            continue
+
+        if speech_prob < _NEG_THRESHOLD and triggered:
+            if not temp_end:
+                temp_end = window * i
+            if window * i - temp_end < min_silence_samples:
+                continue
+            current_speech["end"] = temp_end
+            if current_speech["end"] - current_speech["start"] > min_speech_samples:
+                speeches.append(current_speech)
+            current_speech = {}
+            temp_end = 0
+            triggered = False
+
+    if current_speech and audio_length - current_speech["start"] > min_speech_samples:
+        current_speech["end"] = audio_length
+        speeches.append(current_speech)
+
+    for i, speech in enumerate(speeches):
+        if i == 0:
+            speech["start"] = int(max(0, speech["start"] - speech_pad_samples))
+        if i != len(speeches) - 1:
+            silence_duration = speeches[i + 1]["start"] - speech["end"]
+            if silence_duration < 2 * speech_pad_samples:
+                speech["end"] += int(silence_duration // 2)
+                speeches[i + 1]["start"] = int(max(0, speeches[i + 1]["start"] - silence_duration // 2))
+            else:
+                speech["end"] = int(min(audio_length, speech["end"] + speech_pad_samples))
+                speeches[i + 1]["start"] = int(max(0, speeches[i + 1]["start"] - speech_pad_samples))
+        else:
+            speech["end"] = int(min(audio_length, speech["end"] + speech_pad_samples))
+
+    return speeches
+
+
+def _bundled_onnx_path() -> str:
+    # The silero-vad wheel in requirements.txt ships the ONNX export.
+    from importlib import resources
+
+    return str(resources.files("silero_vad.data").joinpath("silero_vad.onnx"))
+
+
+def _bundled_jit_path() -> str:
+    # ... and the PyTorch JIT model torch.hub would otherwise fetch from GitHub.
+    from importlib import resources
+
+    return str(resources.files("silero_vad.data").joinpath("silero_vad.jit"))
@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from src.nodes import process_vad as vad_module
+from src.nodes import transcribe_vosk as transcribe_module
+from src.nodes.transcribe_vosk import VoskProcessPool
+
+
+def _timed(load: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    load()
+    return time.perf_counter() - start
+
+
+def warm_up(vad: bool = True, vosk: bool = True, vosk_pool: Optional[VoskProcessPool] = None) -> Dict[str, float]:
+    """
+    Startup warm-up: loads the VAD engine and the Vosk model concurrently
+    (both loads spend most of their time in native code) before any data is
+    fetched, so a missing or broken model fails the run immediately instead
+    of inside the first worker that needs it. With a `vosk_pool` the model
+    is loaded in every worker process instead of this one.
+
+    Models come from local paths (VAD_JIT_PATH / VAD_ONNX_PATH, defaulting
+    to the files bundled with silero-vad, and VOSK_MODEL_PATH), and the
+    loaders are idempotent, so later lazy calls reuse what was loaded here.
+
+    Returns the seconds each load took, by model.
+    """
+    loaders = {}
+    if vad:
+        loaders["vad"] = vad_module._load_engine
+    if vosk:
+        loaders["vosk"] = vosk_pool.warm_up if vosk_pool is not None else transcribe_module._load_model
+    if not loaders:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="warmup") as executor:
+        futures = {name: executor.submit(_timed, load) for name, load in loaders.items()}
+
+    timings = {}
+    for name, future in futures.items():
+        try:
+            timings[name] = future.result()
+        except Exception as e:
+            raise RuntimeError(f"Warm-up failed loading the {name} model: {e}") from e
+    return timings
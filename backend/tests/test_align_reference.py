@@ -0,0 +1,106 @@
+from src.nodes.align_reference import align_reference, reference_is_final
+from src.nodes.evaluate_wer import evaluate_wer
+from src.nodes.transcribe_vosk import _streaming_gate
+
+SENTENCE = (
+    "The quick brown fox jumps over the lazy dog. It was a bright cold day in April, "
+    "and the clocks were striking thirteen while everybody slept soundly in their beds."
+)
+WORDS = SENTENCE.split()
+
+
+def _chunk(index, count, words, start, end, hypothesis=None):
+    hypothesis = " ".join(words) if hypothesis is None else hypothesis
+    return {
+        "original_text": SENTENCE,
+        "transcribed_text": hypothesis,
+        "aligned_words": [
+            {"word": w, "start": 0.2 + 0.4 * i, "end": 0.5 + 0.4 * i, "confidence": 1.0}
+            for i, w in enumerate(hypothesis.split())
+        ],
+        "start_time": start,
+        "end_time": end,
+        "chunk_index": index,
+        "chunk_count": count,
+        "utterance_speech_start": 0.0,
+        "utterance_speech_end": 12.0,
+    }
+
+
+def test_single_chunk_keeps_the_full_reference():
+    data = _chunk(0, 1, WORDS, 0.0, 12.0)
+    assert align_reference(data)["original_text"] == SENTENCE
+    assert "reference_span" not in data
+
+
+def test_split_utterance_chunks_are_scored_against_their_own_span():
+    thirds = [WORDS[:10], WORDS[10:20], WORDS[20:]]
+    chunks = [_chunk(i, 3, words, 4.0 * i, 4.0 * (i + 1)) for i, words in enumerate(thirds)]
+
+    for chunk, words in zip(chunks, thirds):
+        result = evaluate_wer(align_reference(chunk))
+        assert result["original_text"] == " ".join(words)
+        assert result["utterance_text"] == SENTENCE
+        assert result["wer_score"] == 0.0
+        assert result["pass"] is True
+
+    assert [c["reference_span"] for c in chunks] == [[0, 10], [10, 20], [20, len(WORDS)]]
+
+
+def test_misrecognized_chunk_still_gets_the_time_aligned_span():
+    hypothesis = "it was a bright called day in a pro and the"
+    data = align_reference(_chunk(1, 3, None, 4.0, 8.0, hypothesis=hypothesis))
+
+    # "It was a bright cold day in April, and the"
+    assert data["reference_span"] == [9, 19]
+    assert evaluate_wer(data)["pass"] is False
+
+
+def test_dropped_boundary_words_count_as_deletions():
+    # The recognizer lost two words at each edge of the middle chunk
+    data = evaluate_wer(align_reference(_chunk(1, 3, WORDS[12:18], 4.0, 8.0)))
+
+    assert data["reference_span"] == [10, 20]
+    assert data["wer_score"] == 0.4
+    assert data["pass"] is False
+
+
+def test_empty_transcript_is_not_accepted():
+    data = evaluate_wer(align_reference(_chunk(1, 3, None, 4.0, 8.0, hypothesis="")))
+
+    assert data["original_text"]
+    assert data["pass"] is False
+
+
+def test_streaming_gate_waits_for_the_sliced_reference(monkeypatch):
+    monkeypatch.setenv("WER_GATE_MODE", "streaming")
+
+    assert reference_is_final({"chunk_count": 1})
+    assert _streaming_gate({"original_text": SENTENCE, "chunk_count": 1}) is not None
+    assert _streaming_gate({"original_text": SENTENCE, "chunk_count": 3}) is None
+
+    monkeypatch.setenv("ALIGN_REFERENCE", "0")
+    assert _streaming_gate({"original_text": SENTENCE, "chunk_count": 3}) is not None
+    assert align_reference(_chunk(0, 3, WORDS[:10], 0.0, 4.0))["original_text"] == SENTENCE
+
+
+def test_padded_chunks_are_sized_from_their_speech(monkeypatch):
+    import src.main as main
+
+    # 18s utterance of 36 words at two words a second; VAD finds speech in 0-3s, 3-15s and 15-18s
+    # and pads the short first and last chunks with silence to 5s.
+    words = [f"word{i}" for i in range(36)]
+    sr = 16000
+
+    def chunk(start, end, pad):
+        return {"start_time": start, "end_time": end + pad, "pad_samples": int(pad * sr), "sample_rate": sr}
+
+    monkeypatch.setattr(main, "process_vad_batch", lambda batch: [[chunk(0, 3, 2), chunk(3, 15, 0), chunk(15, 18, 2)]])
+    chunks = main._split_utterances({"original_text": " ".join(words), "utterance_id": "utt", "stream_index": 0})
+    assert chunks[0]["utterance_speech_end"] == 18.0
+
+    for data, (a, b) in zip(chunks, [(0, 6), (6, 30), (30, 36)]):
+        data["transcribed_text"] = " ".join(words[a:b])
+        result = evaluate_wer(align_reference(data))
+        assert result["reference_span"] == [a, b]
+        assert result["wer_score"] == 0.0
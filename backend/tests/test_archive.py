@@ -0,0 +1,56 @@
+import json
+import tarfile
+
+import pytest
+
+from src.utils.archive import LocalShardStore, TarShardWriter, open_shard_store, read_sample, shard_name
+
+
+def test_tar_shard_records_byte_ranges(tmp_path):
+    shard = TarShardWriter(str(tmp_path / "a.tar"), "shards/a.tar")
+    ranges = [shard.add(f"key{i}", "wav", bytes([i]) * (700 + i), {"i": i}) for i in range(3)]
+    shard.close()
+
+    with tarfile.open(shard.path) as tar:
+        assert tar.getnames() == ["key0.wav", "key0.json", "key1.wav", "key1.json", "key2.wav", "key2.json"]
+        assert json.load(tar.extractfile("key1.json")) == {"i": 1}
+
+    for i, (offset, length) in enumerate(ranges):
+        assert read_sample(shard.path, offset, length) == bytes([i]) * (700 + i)
+
+    with open(shard.index_path) as f:
+        index = json.load(f)
+    assert index["shard"] == "shards/a.tar"
+    metadata = index["samples"][2]["json"]
+    assert json.loads(read_sample(shard.path, metadata["offset"], metadata["length"])) == {"i": 2}
+
+
+def test_local_store_publishes_under_root(tmp_path):
+    staged = tmp_path / "staged.tar"
+    staged.write_bytes(b"tar bytes")
+    store = LocalShardStore(str(tmp_path / "archive"))
+
+    store.put("shards/x.tar", str(staged), "application/x-tar")
+
+    assert not staged.exists()
+    assert (tmp_path / "archive" / "shards" / "x.tar").read_bytes() == b"tar bytes"
+    assert store.url("shards/x.tar") == str(tmp_path / "archive" / "shards" / "x.tar")
+    assert LocalShardStore("/srv", base_url="https://cdn.example/").url("shards/x.tar") == (
+        "https://cdn.example/shards/x.tar"
+    )
+
+
+def test_shard_names_and_store_config(monkeypatch):
+    assert shard_name("out").startswith("out/") and shard_name().endswith(".tar")
+    assert shard_name() != shard_name()
+
+    monkeypatch.delenv("ARCHIVE_BASE_URL", raising=False)
+    monkeypatch.setenv("ARCHIVE_STORE", "local")
+    with pytest.raises(ValueError, match="ARCHIVE_BASE_URL"):
+        open_shard_store()
+    monkeypatch.setenv("ARCHIVE_BASE_URL", "https://cdn.example/archive")
+    assert open_shard_store().url("shards/x.tar") == "https://cdn.example/archive/shards/x.tar"
+
+    monkeypatch.setenv("ARCHIVE_STORE", "s3")
+    with pytest.raises(ValueError, match="ARCHIVE_STORE"):
+        open_shard_store()
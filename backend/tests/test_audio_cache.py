@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from src.utils.audio_cache import AudioCache, open_audio_cache
+
+
+def _item(i, length=100):
+    return {
+        "audio_array": np.full(length, i / 10, dtype=np.float32),
+        "sample_rate": 16000,
+        "original_text": f"utterance {i}",
+        "speaker_id": str(i),
+    }
+
+
+def _fill(cache, key, count, complete=True, length=100):
+    writer = cache.writer(key)
+    for i in range(count):
+        writer.append(_item(i, length))
+    writer.close(complete=complete)
+
+
+def test_round_trip_with_memory_mapped_views(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=2)
+    _fill(cache, "ds", 5)
+
+    # A fresh instance reloads the index from disk
+    reopened = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=2)
+    items = list(reopened.read("ds"))
+
+    assert reopened.is_complete("ds")
+    assert reopened.cached_items("ds") == 5
+    assert [item["original_text"] for item in items] == [f"utterance {i}" for i in range(5)]
+    np.testing.assert_allclose(items[3]["audio_array"], np.full(100, 0.3, dtype=np.float32))
+    # Served as zero-copy views into the memory-mapped shard
+    assert not items[3]["audio_array"].flags.owndata
+    assert not items[3]["audio_array"].flags.writeable
+    assert items[3]["audio_array"].dtype == np.float32
+
+
+def test_partial_stream_is_not_complete(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=2)
+    _fill(cache, "ds", 3, complete=False)
+
+    assert not cache.is_complete("ds")
+    assert cache.cached_items("ds") == 3
+
+
+def test_lru_eviction_keeps_contiguous_prefixes(tmp_path):
+    # Each shard holds 2 items * 100 float32 samples = 800 bytes
+    cache = AudioCache(str(tmp_path), max_bytes=2400, shard_items=2)
+    _fill(cache, "old", 4)
+    _fill(cache, "new", 2)
+    assert cache.total_bytes() == 2400
+
+    # Touch "new" so "old" is least recently used, then overflow the budget
+    list(cache.read("new"))
+    _fill(cache, "newest", 2)
+
+    assert cache.total_bytes() <= 2400
+    assert cache.cached_items("new") == 2
+    assert cache.cached_items("newest") == 2
+    # Evicting the oldest shard of "old" drops its later shard too
+    assert cache.cached_items("old") == 0
+    assert not cache.is_complete("old")
+
+
+def test_writer_stops_when_stream_cannot_fit(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000, shard_items=1)
+    _fill(cache, "ds", 3, complete=True)
+
+    # Each single-item shard is 400 bytes: two fit, the third would overflow
+    assert cache.cached_items("ds") == 2
+    assert not cache.is_complete("ds")
+
+
+def test_single_stream_budget_caps_the_cached_prefix(tmp_path):
+    # Each shard holds 2 items * 100 float32 samples = 800 bytes: three fit
+    cache = AudioCache(str(tmp_path), max_bytes=2400, shard_items=2)
+    _fill(cache, "ds", 10, complete=True)
+    assert (cache.cached_items("ds"), cache.total_bytes()) == (6, 2400)
+
+    # A later run replays the prefix and resumes writing after it: nothing is evicted to make room
+    reopened = AudioCache(str(tmp_path), max_bytes=2400, shard_items=2)
+    assert len(list(reopened.read("ds"))) == 6
+    writer = reopened.writer("ds")
+    for i in range(6, 10):
+        writer.append(_item(i))
+    writer.close(complete=True)
+
+    assert reopened.cached_items("ds") == 6
+    assert not reopened.is_complete("ds")
+    assert [item["original_text"] for item in reopened.read("ds")] == [f"utterance {i}" for i in range(6)]
+
+
+def test_cache_dtype_is_validated(tmp_path, monkeypatch):
+    with pytest.raises(ValueError, match="float32 or int16"):
+        AudioCache(str(tmp_path), max_bytes=10**6, dtype=np.float64)
+
+    monkeypatch.setenv("AUDIO_CACHE_DTYPE", "float16")
+    with pytest.raises(ValueError, match="AUDIO_CACHE_DTYPE"):
+        open_audio_cache(str(tmp_path))
+    monkeypatch.setenv("AUDIO_CACHE_DTYPE", "int16")
+    assert open_audio_cache(str(tmp_path)).dtype == np.int16
+
+
+def test_int16_storage(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=4, dtype=np.int16)
+    _fill(cache, "ds", 2)
+
+    items = list(cache.read("ds"))
+
+    assert cache.total_bytes() == 2 * 100 * 2
+    assert items[1]["audio_array"].dtype == np.float32
+    np.testing.assert_allclose(items[1]["audio_array"], 0.1, atol=1e-4)
+
+
+def test_int16_reads_are_zero_copy(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=4, dtype=np.int16)
+    _fill(cache, "ds", 2)
+
+    items = list(cache.read("ds", dtype=np.int16))
+
+    assert items[1]["audio_array"].dtype == np.int16
+    assert not items[1]["audio_array"].flags.owndata
+    np.testing.assert_array_equal(items[1]["audio_array"], int(np.float32(0.1) * 32767))
@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.utils.audio_codec import encode_audio, encode_chunk, get_codec
+
+
+def _tone(seconds=1.0, sr=16000):
+    t = np.arange(int(seconds * sr)) / sr
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_flac_is_lossless_and_smaller_than_wav():
+    # Integer samples sidestep libsndfile's per-format float rounding
+    audio = (_tone() * 32767).astype(np.int16)
+
+    wav_bytes = encode_audio(audio, 16000, get_codec("wav"))
+    flac_bytes = encode_audio(audio, 16000, get_codec("flac"))
+
+    flac_audio, sr = sf.read(io.BytesIO(flac_bytes), dtype="int16")
+
+    assert sr == 16000
+    np.testing.assert_array_equal(flac_audio, audio)
+    assert len(flac_bytes) < len(wav_bytes)
+
+
+def test_opus_round_trips_in_ogg():
+    audio = _tone()
+
+    opus_bytes = encode_audio(audio, 16000, get_codec("opus"))
+    decoded, _ = sf.read(io.BytesIO(opus_bytes), dtype="float32")
+
+    assert opus_bytes[:4] == b"OggS"
+    assert abs(len(decoded) - len(audio)) <= 16000 * 0.05
+    assert len(opus_bytes) < len(encode_audio(audio, 16000, get_codec("wav"))) / 4
+
+
+def test_codec_metadata():
+    assert get_codec("wav")[3:] == ("wav", "audio/wav")
+    assert get_codec("flac")[3:] == ("flac", "audio/flac")
+    assert get_codec("opus")[3:] == ("ogg", "audio/ogg")
+
+
+def test_get_codec_reads_environment(monkeypatch):
+    monkeypatch.setenv("AUDIO_CODEC", "FLAC")
+    assert get_codec().name == "flac"
+
+    monkeypatch.setenv("AUDIO_CODEC", "mp3")
+    with pytest.raises(ValueError):
+        get_codec()
+
+
+def test_encode_chunk_only_encodes_passing_chunks(monkeypatch):
+    monkeypatch.setenv("AUDIO_CODEC", "flac")
+
+    passing = encode_chunk({"pass": True, "chunk_array": _tone(0.1), "sample_rate": 16000})
+    failing = encode_chunk({"pass": False, "chunk_array": _tone(0.1), "sample_rate": 16000})
+
+    assert passing["audio_codec"] == "flac"
+    assert passing["encoded_audio"][:4] == b"fLaC"
+    assert "encoded_audio" not in failing
@@ -0,0 +1,102 @@
+from src.utils.checkpoint import ProgressCheckpoint
+
+
+def _record(i):
+    return {"stream_index": i, "utterance_id": f"utt-{i}"}
+
+
+def test_position_advances_over_the_contiguous_done_prefix(tmp_path):
+    checkpoint = ProgressCheckpoint(str(tmp_path / "progress.json"))
+
+    checkpoint.expect(0, "utt-0", 2)
+    checkpoint.expect(1, "utt-1", 0)  # no speech: done straight away
+    checkpoint.expect(2, "utt-2", 1)
+
+    checkpoint.finish({"stream_index": 2, "pass": True})
+    checkpoint.finish({"stream_index": 0, "pass": False})
+    assert checkpoint.position == 0
+    assert checkpoint.completed == {"utt-1", "utt-2"}
+
+    checkpoint.finish({"stream_index": 0, "pass": True})
+    assert checkpoint.position == 3
+    assert checkpoint.completed == set()
+
+
+def test_failed_chunks_keep_their_utterance_pending(tmp_path):
+    checkpoint = ProgressCheckpoint(str(tmp_path / "progress.json"))
+
+    checkpoint.expect(0, "utt-0", 2)
+    checkpoint.expect(1, "utt-1", 1)
+    checkpoint.finish({"stream_index": 0, "pass": True})
+    checkpoint.finish({"stream_index": 0, "error": "insert_db: timeout"})
+    checkpoint.finish({"stream_index": 1, "pass": True})
+    # The VAD stage itself failed for this one: no chunk count was registered
+    checkpoint.finish({"stream_index": 2, "error": "vad: boom"})
+
+    assert checkpoint.position == 0
+    assert checkpoint.completed == {"utt-1"}
+
+
+def test_resume_skips_completed_work(tmp_path):
+    path = str(tmp_path / "progress.json")
+    flushed = []
+
+    first = ProgressCheckpoint(path, on_save=lambda: flushed.append(True))
+    for i in (0, 1, 3):
+        first.expect(i, f"utt-{i}", 1)
+        first.finish({"stream_index": i, "pass": True})
+    first.close()
+    assert flushed == [True]
+
+    second = ProgressCheckpoint(path)
+    assert second.position == 2
+    assert second.completed == {"utt-3"}
+
+    # The stream resumes at `position`; utterances done out of order are skipped
+    resumed = list(second.pending(_record(i) for i in range(second.position, 5)))
+    assert [r["utterance_id"] for r in resumed] == ["utt-2", "utt-4"]
+
+    for record in resumed:
+        second.expect(record["stream_index"], record["utterance_id"], 1)
+        second.finish({"stream_index": record["stream_index"], "pass": True})
+    assert second.position == 5
+
+
+def test_failed_flush_does_not_save(tmp_path):
+    path = tmp_path / "progress.json"
+
+    def failing_flush():
+        raise RuntimeError("db down")
+
+    checkpoint = ProgressCheckpoint(str(path), save_interval=0, on_save=failing_flush)
+    checkpoint.expect(0, "utt-0", 1)
+    checkpoint.finish({"stream_index": 0, "pass": True})
+
+    assert not path.exists()
+
+
+def test_positions_skipped_by_a_sharded_stream_count_as_done(tmp_path):
+    checkpoint = ProgressCheckpoint(str(tmp_path / "progress.json"))
+
+    # This worker owns the utterances at 1 and 4 only
+    for record in checkpoint.pending(_record(i) for i in (1, 4)):
+        checkpoint.expect(record["stream_index"], record["utterance_id"], 1)
+    assert checkpoint.position == 1
+
+    checkpoint.finish({"stream_index": 1, "pass": True})
+    assert checkpoint.position == 4
+    assert checkpoint.completed == set()
+
+    checkpoint.finish({"stream_index": 4, "pass": True})
+    assert checkpoint.position == 5
+
+
+def test_checkpoint_reopens_an_utterance_it_already_passed(tmp_path):
+    checkpoint = ProgressCheckpoint(str(tmp_path / "checkpoint.json"))
+    for index in range(3):
+        checkpoint.expect(index, f"utt-{index}", 1)
+        checkpoint.finish({"stream_index": index})
+    assert checkpoint.position == 3
+
+    checkpoint.reopen({"stream_index": 1, "utterance_id": "utt-1"})
+    assert checkpoint.position == 1 and checkpoint.completed == set()
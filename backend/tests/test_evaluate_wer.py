@@ -1,4 +1,6 @@
-from src.nodes.evaluate_wer import evaluate_wer
+import random
+
+from src.nodes.evaluate_wer import StreamingWerGate, evaluate_wer
 
 
 def test_evaluate_wer_exact_match():
@@ -65,3 +67,69 @@ def test_evaluate_wer_edge_case():
     res2 = evaluate_wer(data_fail)
     assert res2["wer_score"] == 0.2
     assert res2["pass"] is False
+
+
+def _full_verdict(original, transcribed):
+    return evaluate_wer({"original_text": original, "transcribed_text": transcribed})
+
+
+def test_streaming_gate_never_rejects_a_passing_chunk():
+    """
+    Whenever the gate gives up on a prefix of finalized segments, scoring
+    the full transcript fails as well, and the bound never exceeds the WER.
+    """
+    rng = random.Random(0)
+    vocabulary = ["the", "cat", "sat", "on", "a", "mat", "and", "dog", "ran"]
+
+    for _ in range(2000):
+        reference = [rng.choice(vocabulary) for _ in range(rng.randint(0, 12))]
+        hypothesis = list(reference)
+        for _ in range(rng.randint(0, 4)):
+            op = rng.choice(["sub", "ins", "del"])
+            pos = rng.randint(0, len(hypothesis))
+            if op == "ins" or not hypothesis:
+                hypothesis.insert(pos, rng.choice(vocabulary))
+            elif op == "sub":
+                hypothesis[min(pos, len(hypothesis) - 1)] = rng.choice(vocabulary)
+            else:
+                del hypothesis[min(pos, len(hypothesis) - 1)]
+
+        full = _full_verdict(" ".join(reference), " ".join(hypothesis))
+
+        gate = StreamingWerGate(" ".join(reference))
+        cuts = sorted(rng.sample(range(len(hypothesis) + 1), k=min(3, len(hypothesis) + 1)))
+        start = 0
+        for cut in cuts + [len(hypothesis)]:
+            gate.add_segment(" ".join(hypothesis[start:cut]))
+            start = cut
+            assert gate.lower_bound <= full["wer_score"]
+            if gate.lost:
+                assert full["pass"] is False
+                break
+
+
+def test_streaming_gate_stops_once_the_gate_is_lost():
+    gate = StreamingWerGate("one two three four five six seven eight nine ten")
+
+    # "one two" could still be followed by a perfect transcript
+    assert gate.add_segment("One, two") is False
+    assert gate.lower_bound == 0.0
+    # 1 error in 10 words can still pass, 2 cannot
+    assert gate.add_segment("three wrong five") is False
+    assert gate.lower_bound == 0.1
+    assert gate.add_segment("wrong") is True
+    assert gate.lower_bound == 0.2
+
+
+def test_evaluate_wer_fails_aborted_transcriptions():
+    data = {
+        "original_text": "one two three four five six seven eight nine ten",
+        "transcribed_text": "one two three",
+        "transcription_aborted": True,
+        "wer_lower_bound": 0.2,
+    }
+
+    result = evaluate_wer(data)
+
+    assert result["wer_score"] == 0.2
+    assert result["pass"] is False
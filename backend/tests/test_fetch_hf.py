@@ -1,8 +1,13 @@
+import io
+
 import pytest
 import numpy as np
+import soundfile as sf
 
 # We'll mock the HF dataset load
+from src.nodes import fetch_hf as fetch_hf_module
 from src.nodes.fetch_hf import fetch_hf_stream
+from src.utils.audio_cache import AudioCache
 
 
 class MockIterableDataset:
@@ -12,6 +17,9 @@ class MockIterableDataset:
     def __iter__(self):
         return iter(self.items)
 
+    def skip(self, n):
+        return MockIterableDataset(self.items[n:])
+
 
 @pytest.fixture
 def mock_hf_dataset(monkeypatch):
@@ -50,3 +58,114 @@ def test_fetch_hf_stream(mock_hf_dataset):
     assert first_item["original_text"] == "Hello world"
     assert first_item["dataset_id"] == "mythicinfinity/libritts"
     assert first_item["speaker_id"] == "1234"
+
+
+def _dummy_items(count):
+    return [
+        {
+            "audio": {"array": np.full(160, i, dtype=np.float32), "sampling_rate": 16000},
+            "text_normalized": f"utterance {i}",
+            "speaker_id": str(i),
+        }
+        for i in range(count)
+    ]
+
+
+def test_fetch_hf_stream_replays_from_cache(monkeypatch, tmp_path):
+    """
+    A consumer stopping early caches the prefix it saw; the next run replays
+    it from disk and only streams the remainder from the Hub.
+    """
+    items = _dummy_items(5)
+    loads = []
+
+    def mock_load_dataset(path, split, streaming, **kwargs):
+        loads.append(path)
+        return MockIterableDataset(items)
+
+    monkeypatch.setattr("src.nodes.fetch_hf.load_dataset", mock_load_dataset)
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=2)
+
+    stream = fetch_hf_stream(cache=cache)
+    first_run = [next(stream)["original_text"] for _ in range(3)]
+    stream.close()
+
+    assert first_run == ["utterance 0", "utterance 1", "utterance 2"]
+    assert cache.cached_items("mythicinfinity/libritts/dev/dev.clean@16000") == 3
+
+    second_run = list(fetch_hf_stream(cache=cache))
+    assert [r["original_text"] for r in second_run] == [f"utterance {i}" for i in range(5)]
+    np.testing.assert_array_equal(second_run[1]["audio_array"], np.full(160, 1, dtype=np.float32))
+
+    # Fully cached now: a third run never touches the network
+    def offline_load_dataset(*args, **kwargs):
+        raise AssertionError("stream should be served from the cache")
+
+    monkeypatch.setattr("src.nodes.fetch_hf.load_dataset", offline_load_dataset)
+    assert len(list(fetch_hf_stream(cache=cache))) == 5
+    assert len(loads) == 2
+
+
+def test_fetch_hf_stream_resumes_at_position(monkeypatch, tmp_path):
+    """Records carry their stream position; `start` skips the items before it."""
+    items = _dummy_items(5)
+    items[3]["id"] = "3_3_3"
+    monkeypatch.setattr("src.nodes.fetch_hf.load_dataset", lambda *args, **kwargs: MockIterableDataset(items))
+
+    resumed = list(fetch_hf_stream(start=2))
+    assert [r["stream_index"] for r in resumed] == [2, 3, 4]
+    assert [r["utterance_id"] for r in resumed] == ["dev.clean/2", "3_3_3", "dev.clean/4"]
+
+    # Cached prefix shorter than the resume point: skip without leaving a gap in the cache
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=1)
+    stream = fetch_hf_stream(cache=cache)
+    next(stream)
+    stream.close()
+
+    assert [r["stream_index"] for r in fetch_hf_stream(cache=cache, start=3)] == [3, 4]
+    assert cache.cached_items("mythicinfinity/libritts/dev/dev.clean@16000") == 1
+
+
+def test_fetch_hf_stream_keeps_only_owned_utterances(monkeypatch, tmp_path):
+    """A sharded stream skips other workers' utterances before decoding them, and never caches."""
+    items = _dummy_items(6)
+    decoded = []
+    decode_item = fetch_hf_module._decode_item
+    monkeypatch.setattr("src.nodes.fetch_hf.load_dataset", lambda *args, **kwargs: MockIterableDataset(items))
+    monkeypatch.setattr(fetch_hf_module, "_decode_item", lambda item: decoded.append(item) or decode_item(item))
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=1)
+
+    def even(utterance_id):
+        return int(utterance_id.split("/")[1]) % 2 == 0
+
+    owned = list(fetch_hf_stream(cache=cache, owns=even))
+    others = list(fetch_hf_stream(owns=lambda utterance_id: not even(utterance_id)))
+
+    assert [r["stream_index"] for r in owned] == [0, 2, 4]
+    assert [r["utterance_id"] for r in others] == ["dev.clean/1", "dev.clean/3", "dev.clean/5"]
+    assert len(decoded) == 6
+    assert cache.cached_items("mythicinfinity/libritts/dev/dev.clean@16000") == 0
+
+
+def test_fetch_hf_stream_decodes_encoded_audio_ahead_of_the_consumer(monkeypatch, tmp_path):
+    """Encoded rows are decoded in the pool; prefetching does not change the records."""
+    buffer = io.BytesIO()
+    sf.write(buffer, np.linspace(-0.5, 0.5, 2400, dtype=np.float32), 24000, format="WAV", subtype="FLOAT")
+    items = [{"audio": {"bytes": buffer.getvalue(), "path": None}, "id": f"utt-{i}"} for i in range(4)]
+    monkeypatch.setattr("src.nodes.fetch_hf.load_dataset", lambda *args, **kwargs: MockIterableDataset(items))
+
+    monkeypatch.setenv("PREFETCH_DEPTH", "0")
+    inline = list(fetch_hf_stream())
+    monkeypatch.setenv("PREFETCH_DEPTH", "2")
+    prefetched = list(fetch_hf_stream())
+
+    assert [r["utterance_id"] for r in prefetched] == ["utt-0", "utt-1", "utt-2", "utt-3"]
+    assert len(prefetched[0]["audio_array"]) == 1600
+    for a, b in zip(inline, prefetched):
+        np.testing.assert_array_equal(a["audio_array"], b["audio_array"])
+
+    # Completion order is not written through to the cache
+    monkeypatch.setenv("PREFETCH_ORDERED", "0")
+    cache = AudioCache(str(tmp_path), max_bytes=10**6, shard_items=1)
+    assert len(list(fetch_hf_stream(cache=cache))) == 4
+    assert cache.cached_items("mythicinfinity/libritts/dev/dev.clean@16000") == 0
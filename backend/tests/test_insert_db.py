@@ -1,8 +1,26 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import pytest
 import numpy as np
+import soundfile as sf
 from unittest.mock import MagicMock, patch
 
-from src.nodes.insert_db import insert_db
+from src.nodes.insert_db import (
+    insert_db, insert_db_batch, ArchiveInsertSink, BufferedInsertSink, AsyncInsertSink, SpoolingInsertSink
+)
+from src.utils import supabase_client
+from src.utils.archive import LocalShardStore, StorageShardStore, read_sample
+from src.utils.checkpoint import ProgressCheckpoint
+from src.utils.rate_control import AIMDConcurrency, CircuitBreaker, TokenBucket, UploadControl
+from src.utils.spool import RetrySpool
+from benchmarks.fake_supabase import FakeSupabaseServer
+
+# JWT-shaped, as supabase-py validates the key format
+_SERVICE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test"
 
 
 @pytest.fixture
@@ -15,11 +33,11 @@ def mock_supabase(monkeypatch):
     # Mock for .storage.from_().upload()
     mock_storage = MagicMock()
     mock_client.storage.from_.return_value = mock_storage
-    mock_storage.get_public_url.return_value = (
-        "https://mock.supabase.co/storage/v1/object/public/audio_chunks/test_ds/fake_uuid.wav"
-    )
 
-    # Mock for .table().insert().execute()
+    # Public URLs are derived locally from the project URL
+    monkeypatch.setenv("SUPABASE_URL", "https://mock.supabase.co")
+
+    # Mock for .table().upsert().execute()
     mock_table = MagicMock()
     mock_client.table.return_value = mock_table
 
@@ -71,12 +89,14 @@ def test_insert_db_success(mock_uuid, mock_supabase):
     assert upload_kwargs["path"] == "test_ds/fake_uuid.wav"
     # Ensure the uploaded byte buffer was marked as audio/wav
     assert upload_kwargs.get("file_options", {}).get("content-type") == "audio/wav"
+    # The public URL is computed locally, without a storage round-trip
+    storage_mock.get_public_url.assert_not_called()
 
     # 2. Verify DB Insert
     table_mock = mock_supabase.table()
-    table_mock.insert.assert_called_once()
+    table_mock.upsert.assert_called_once()
 
-    insert_payload = table_mock.insert.call_args[0][0]
+    insert_payload = table_mock.upsert.call_args[0][0]
 
     # Check that payload matches 0000_initial_schema.sql columns
     assert insert_payload["id"] == "fake_uuid"
@@ -96,6 +116,23 @@ def test_insert_db_success(mock_uuid, mock_supabase):
     assert insert_payload["status"] == "pending_review"
 
 
+@patch("src.nodes.insert_db.uuid")
+def test_insert_db_uses_configured_codec(mock_uuid, mock_supabase, monkeypatch):
+    """The object extension, content type and audio_url follow AUDIO_CODEC."""
+    mock_uuid.uuid4.return_value = "fake_uuid"
+    monkeypatch.setenv("AUDIO_CODEC", "flac")
+
+    insert_db(_passing_chunk("Hello world."))
+
+    upload_kwargs = mock_supabase.storage.from_().upload.call_args[1]
+    assert upload_kwargs["path"] == "test_ds/fake_uuid.flac"
+    assert upload_kwargs["file_options"]["content-type"] == "audio/flac"
+    assert upload_kwargs["file"][:4] == b"fLaC"
+
+    insert_payload = mock_supabase.table().upsert.call_args[0][0]
+    assert insert_payload["audio_url"].endswith("/audio_chunks/test_ds/fake_uuid.flac")
+
+
 def test_insert_db_skip_failure(mock_supabase):
     """
     Tests that a failing chunk (pass=False) is entirely skipped
@@ -116,3 +153,443 @@ def test_insert_db_skip_failure(mock_supabase):
     # Ensure no API calls were made
     mock_supabase.storage.from_.assert_not_called()
     mock_supabase.table.assert_not_called()
+
+
+def _passing_chunk(text):
+    return {
+        "pass": True,
+        "chunk_array": np.zeros(1600, dtype=np.float32),
+        "sample_rate": 16000,
+        "original_text": text,
+        "transcribed_text": text,
+        "dataset_id": "test_ds",
+        "speaker_id": "999",
+        "wer_score": 0.0,
+        "duration": 0.1,
+    }
+
+
+def test_buffered_sink_flushes_every_n_chunks(mock_supabase):
+    """Rows are written as one multi-row insert once the batch is full."""
+    sink = BufferedInsertSink(batch_size=3, flush_interval_ms=60_000)
+
+    for i in range(4):
+        sink.write(_passing_chunk(f"chunk {i}"))
+
+    table_mock = mock_supabase.table()
+    table_mock.upsert.assert_called_once()
+    rows = table_mock.upsert.call_args[0][0]
+    assert [row["original_text"] for row in rows] == ["chunk 0", "chunk 1", "chunk 2"]
+    assert mock_supabase.storage.from_().upload.call_count == 4
+
+    # The trailing partial batch is flushed on shutdown
+    sink.close()
+    assert table_mock.upsert.call_count == 2
+    assert [row["original_text"] for row in table_mock.upsert.call_args[0][0]] == ["chunk 3"]
+
+
+def test_buffered_sink_flushes_on_interval(mock_supabase):
+    sink = BufferedInsertSink(batch_size=100, flush_interval_ms=50)
+
+    sink.write(_passing_chunk("lonely chunk"))
+    time.sleep(0.3)
+
+    table_mock = mock_supabase.table()
+    table_mock.upsert.assert_called_once()
+    sink.close()
+    table_mock.upsert.assert_called_once()
+
+
+def test_buffered_sink_keeps_rows_when_insert_fails(mock_supabase):
+    table_mock = mock_supabase.table()
+    table_mock.upsert.return_value.execute.side_effect = [RuntimeError("db down"), MagicMock()]
+    sink = BufferedInsertSink(batch_size=1, flush_interval_ms=60_000)
+
+    with pytest.raises(RuntimeError):
+        sink.write(_passing_chunk("retry me"))
+
+    sink.close()
+    assert [row["original_text"] for row in table_mock.upsert.call_args[0][0]] == ["retry me"]
+
+
+def test_buffered_sink_skips_failed_chunks(mock_supabase):
+    sink = BufferedInsertSink(batch_size=1)
+
+    data = {"pass": False, "chunk_array": np.zeros(10)}
+    assert sink.write(data) is data
+    sink.close()
+
+    mock_supabase.storage.from_.assert_not_called()
+    mock_supabase.table.assert_not_called()
+
+
+def test_async_sink_uploads_against_local_standin():
+    """
+    The asyncio sink should upload every chunk and insert every row through
+    a bounded pool of keep-alive connections.
+    """
+    with FakeSupabaseServer(latency=0.02) as server:
+        sink = AsyncInsertSink(url=server.url, key="service-key", max_concurrency=4, batch_size=5)
+
+        for i in range(20):
+            sink.write(_passing_chunk(f"chunk {i}"))
+        sink.write({"pass": False, "chunk_array": np.zeros(10)})
+        sink.close()
+
+    assert sink.uploaded == 20
+    assert sink.failed == 0
+    assert len(server.uploads) == 20
+    assert all(u["content_type"] == "audio/wav" for u in server.uploads.values())
+    assert sorted(row["original_text"] for row in server.rows) == sorted(f"chunk {i}" for i in range(20))
+    public_prefix = f"{server.url}/storage/v1/object/public/audio_chunks/"
+    assert all(row["audio_url"].startswith(public_prefix) for row in server.rows)
+    # Rows go out as multi-row inserts
+    assert server.insert_requests <= 5
+    # Bounded concurrency over pooled keep-alive connections
+    assert server.max_in_flight <= 4
+    assert len(server.connections) <= 4
+
+
+def test_async_sink_counts_failed_uploads():
+    with FakeSupabaseServer(fail_status=503) as server:
+        sink = AsyncInsertSink(url=server.url, key="service-key", max_concurrency=2)
+
+        for i in range(3):
+            sink.write(_passing_chunk(f"chunk {i}"))
+        sink.close()
+
+    assert sink.uploaded == 0
+    assert sink.failed == 3
+    assert server.rows == []
+
+
+def test_async_sink_failed_upload_keeps_its_utterance_pending(tmp_path):
+    """
+    A background upload fails after its chunk left the pipeline: the
+    checkpoint must not record the utterance as done, and flush() raises.
+    """
+    with FakeSupabaseServer(fail_status=503) as server:
+        sink = AsyncInsertSink(url=server.url, key="service-key", max_concurrency=2)
+        checkpoint = ProgressCheckpoint(str(tmp_path / "checkpoint.json"), save_interval=3600, on_save=sink.flush)
+        sink.on_failure = checkpoint.reopen
+
+        for index, utterance_id in enumerate(["utt-0", "utt-1"]):
+            checkpoint.expect(index, utterance_id, 1)
+        first = dict(_passing_chunk("lost"), stream_index=0, utterance_id="utt-0")
+        checkpoint.finish(sink.write(first))
+
+        with pytest.raises(RuntimeError, match="1 audio upload"):
+            checkpoint.save()
+        assert not os.path.exists(checkpoint.path)
+
+        server.fail_status = 0
+        second = dict(_passing_chunk("kept"), stream_index=1, utterance_id="utt-1")
+        checkpoint.finish(sink.write(second))
+        checkpoint.save()
+        sink.close()
+
+    resumed = ProgressCheckpoint(checkpoint.path)
+    assert resumed.position == 0
+    assert resumed.completed == {"utt-1"}
+    assert [row["original_text"] for row in server.rows] == ["kept"]
+
+
+def _identified_chunk(text, start_sample=0):
+    chunk = _passing_chunk(text)
+    chunk.update({"utterance_id": "84_121123_000007_000001", "start_sample": start_sample, "end_sample": 1600})
+    return chunk
+
+
+def test_insert_db_is_idempotent_for_the_same_span(mock_supabase):
+    """
+    Chunk ids derive from (dataset, utterance, sample span), so re-running a
+    chunk after a restart targets the same object and row.
+    """
+    insert_db(_identified_chunk("first run"))
+    insert_db(_identified_chunk("second run"))
+    insert_db(_identified_chunk("other span", start_sample=160))
+
+    upload_calls = mock_supabase.storage.from_().upload.call_args_list
+    paths = [call[1]["path"] for call in upload_calls]
+    assert paths[0] == paths[1] != paths[2]
+    assert all(call[1]["file_options"]["upsert"] == "true" for call in upload_calls)
+
+    upsert_calls = mock_supabase.table().upsert.call_args_list
+    assert upsert_calls[0][0][0]["id"] == upsert_calls[1][0][0]["id"]
+    # Existing rows (possibly already reviewed) are left untouched
+    assert all(call[1]["ignore_duplicates"] is True for call in upsert_calls)
+
+
+def test_async_sink_rerun_does_not_duplicate():
+    with FakeSupabaseServer() as server:
+        for _ in range(2):
+            sink = AsyncInsertSink(url=server.url, key="service-key", max_concurrency=2, batch_size=2)
+            for i in range(3):
+                sink.write(_identified_chunk(f"chunk {i}", start_sample=i))
+            sink.flush()
+            assert len(server.rows) == 3
+            sink.close()
+
+    assert sink.failed == 0
+    assert len(server.uploads) == 3
+    assert sorted(row["original_text"] for row in server.rows) == ["chunk 0", "chunk 1", "chunk 2"]
+
+
+def test_insert_db_batch_writes_one_multi_row_upsert(mock_supabase):
+    """Passing chunks are uploaded one by one and stored with a single upsert; the rest are skipped."""
+    failing = dict(_passing_chunk("dropped"), **{"pass": False})
+    items = [_passing_chunk("chunk 0"), failing, _passing_chunk("chunk 1")]
+
+    results = insert_db_batch(items)
+
+    assert results is items
+    assert mock_supabase.storage.from_().upload.call_count == 2
+    table_mock = mock_supabase.table()
+    table_mock.upsert.assert_called_once()
+    rows = table_mock.upsert.call_args[0][0]
+    assert [row["original_text"] for row in rows] == ["chunk 0", "chunk 1"]
+    assert all("error" not in data for data in results)
+
+
+def test_insert_db_batch_marks_failed_uploads_and_inserts(mock_supabase):
+    mock_supabase.storage.from_().upload.side_effect = [RuntimeError("storage down"), MagicMock()]
+    items = [_passing_chunk("chunk 0"), _passing_chunk("chunk 1")]
+
+    insert_db_batch(items)
+
+    table_mock = mock_supabase.table()
+    assert [row["original_text"] for row in table_mock.upsert.call_args[0][0]] == ["chunk 1"]
+    assert items[0]["error"] == "insert_db: storage down"
+    assert "error" not in items[1]
+
+    # A failed row insert marks every chunk whose audio was uploaded
+    mock_supabase.storage.from_().upload.side_effect = None
+    table_mock.upsert.return_value.execute.side_effect = RuntimeError("db down")
+    items = [_passing_chunk("chunk 2"), _passing_chunk("chunk 3")]
+
+    insert_db_batch(items)
+
+    assert [data["error"] for data in items] == ["insert_db: db down"] * 2
+
+
+def test_insert_db_batch_without_passing_chunks(mock_supabase):
+    items = [dict(_passing_chunk("dropped"), **{"pass": False})]
+
+    assert insert_db_batch(items) is items
+    mock_supabase.storage.from_().upload.assert_not_called()
+    mock_supabase.table.assert_not_called()
+
+
+def test_archive_sink_publishes_shards_before_their_rows(mock_supabase, tmp_path):
+    store = LocalShardStore(str(tmp_path / "archive"))
+    sink = ArchiveInsertSink(store, staging_dir=str(tmp_path / "staging"), max_shard_bytes=8000)
+    table_mock = mock_supabase.table()
+
+    for i in range(5):
+        sink.write({**_passing_chunk(f"chunk {i}"), "utterance_id": f"utt-{i}", "start_sample": 0, "end_sample": 1})
+    sink.write({"pass": False, "chunk_array": np.zeros(10)})
+
+    # Two shards filled up (two 3.2 kB WAVs each); the fifth chunk is still open
+    assert sink.published == 2
+    assert sum(len(call[0][0]) for call in table_mock.upsert.call_args_list) == 4
+    sink.close()
+    assert sink.published == 3
+
+    rows = [row for call in table_mock.upsert.call_args_list for row in call[0][0]]
+    assert [row["original_text"] for row in rows] == [f"chunk {i}" for i in range(5)]
+    mock_supabase.storage.from_.assert_not_called()
+    for row in rows:
+        audio_bytes = read_sample(row["audio_url"], row["audio_offset"], row["audio_length"])
+        audio, sample_rate = sf.read(io.BytesIO(audio_bytes))
+        assert (len(audio), sample_rate) == (1600, 16000)
+    assert os.path.exists(rows[0]["audio_url"] + ".index.json")
+
+
+def test_archive_sink_checkpoint_waits_for_the_open_shard(mock_supabase, tmp_path):
+    """
+    Checkpoint saves publish sealed shards only, and utterances whose chunks
+    sit in the open shard stay pending until that shard is published.
+    """
+    sink = ArchiveInsertSink(
+        LocalShardStore(str(tmp_path / "archive")), staging_dir=str(tmp_path / "staging"), max_shard_bytes=8000
+    )
+    checkpoint = ProgressCheckpoint(str(tmp_path / "checkpoint.json"), save_interval=3600, on_save=sink.publish_sealed)
+    sink.on_staged, sink.on_published = checkpoint.hold, checkpoint.finish
+
+    for i in range(3):
+        checkpoint.expect(i, f"utt-{i}", 1)
+        chunk = {**_passing_chunk(f"chunk {i}"), "stream_index": i, "utterance_id": f"utt-{i}"}
+        checkpoint.finish(sink.write({**chunk, "start_sample": 0, "end_sample": 1}))
+    checkpoint.save()
+
+    # The first shard filled up with two chunks; the third chunk's shard stays open
+    assert sink.published == 1
+    assert ProgressCheckpoint(checkpoint.path).position == 2
+
+    sink.flush()
+    checkpoint.save()
+    assert sink.published == 2
+    assert ProgressCheckpoint(checkpoint.path).position == 3
+
+
+def test_archive_sink_write_survives_a_failed_publish(mock_supabase, tmp_path):
+    """
+    A shard that fails to publish when it fills up must not fail the chunk
+    that sealed it: it is already staged, and the next publish retries it.
+    """
+    store = LocalShardStore(str(tmp_path / "archive"))
+    real_put = store.put
+    calls = []
+
+    def flaky_put(name, path, content_type):
+        calls.append(name)
+        if len(calls) == 1:
+            raise RuntimeError("storage down")
+        real_put(name, path, content_type)
+
+    store.put = flaky_put
+    sink = ArchiveInsertSink(store, staging_dir=str(tmp_path / "staging"), max_shard_bytes=8000)
+
+    results = [sink.write(_passing_chunk(f"chunk {i}")) for i in range(3)]
+    assert all("error" not in data for data in results)
+    assert sink.published == 0
+
+    sink.flush()
+    assert sink.published == 2
+    rows = [row for call in mock_supabase.table().upsert.call_args_list for row in call[0][0]]
+    assert [row["original_text"] for row in rows] == ["chunk 0", "chunk 1", "chunk 2"]
+
+
+def test_archive_sink_retries_unpublished_shards(mock_supabase, tmp_path):
+    table_mock = mock_supabase.table()
+    table_mock.upsert.return_value.execute.side_effect = [RuntimeError("db down"), MagicMock()]
+    sink = ArchiveInsertSink(LocalShardStore(str(tmp_path / "archive")), staging_dir=str(tmp_path / "staging"))
+
+    sink.write(_passing_chunk("retry me"))
+    with pytest.raises(RuntimeError):
+        sink.flush()
+    sink.close()
+
+    assert sink.published == 1
+    assert [row["original_text"] for row in table_mock.upsert.call_args[0][0]] == ["retry me"]
+    assert len(os.listdir(tmp_path / "archive" / "shards")) == 2
+
+
+def test_archive_sink_uploads_one_object_per_shard(monkeypatch, tmp_path):
+    with FakeSupabaseServer() as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", _SERVICE_KEY)
+        monkeypatch.setattr(supabase_client, "_supabase_client", None)
+        sink = ArchiveInsertSink(StorageShardStore(), staging_dir=str(tmp_path), max_shard_bytes=10**6)
+
+        for i in range(10):
+            sink.write(_passing_chunk(f"chunk {i}"))
+        sink.close()
+
+    assert sorted(key.rsplit(".", 1)[-1] for key in server.uploads) == ["json", "tar"]
+    assert server.insert_requests == 1 and len(server.rows) == 10
+    shard = next(key for key in server.uploads if key.endswith(".tar"))
+    assert all(row["audio_url"] == f"{server.url}/storage/v1/object/public/{shard}" for row in server.rows)
+    # The upload is a multipart form: the tar starts with its first member's header
+    body = server.uploads[shard]["body"]
+    tar = body[body.index(f"{server.rows[0]['id']}.wav".encode()):]
+    row = server.rows[3]
+    audio = sf.read(io.BytesIO(tar[row["audio_offset"]:row["audio_offset"] + row["audio_length"]]))[0]
+    assert len(audio) == 1600
+    assert os.listdir(tmp_path) == []
+
+
+def _congested(in_flight):
+    """A service that handles 3 requests at once; each one beyond that adds queueing delay."""
+    return 0.01 + 0.02 * max(0, in_flight - 3)
+
+
+def test_adaptive_control_keeps_sync_uploads_under_the_congestion_point(monkeypatch):
+    with FakeSupabaseServer(latency=_congested) as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", _SERVICE_KEY)
+        monkeypatch.setattr(supabase_client, "_supabase_client", None)
+        control = UploadControl(AIMDConcurrency(initial=4, max_limit=16))
+
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(partial(insert_db, control=control), [_passing_chunk(f"chunk {i}") for i in range(60)]))
+
+    assert len(server.uploads) == 60 and len(server.rows) == 60
+    # 16 upload threads, but the limit backs off whenever latency climbs past twice the baseline
+    assert control.concurrency.decreases >= 1
+    assert server.max_in_flight <= 8
+    assert control.concurrency.in_flight == 0
+
+
+def test_adaptive_control_grows_async_concurrency_while_latency_holds():
+    with FakeSupabaseServer(latency=0.02) as server:
+        control = UploadControl(AIMDConcurrency(initial=1, max_limit=8))
+        sink = AsyncInsertSink(url=server.url, key="service-key", max_concurrency=8, batch_size=100, control=control)
+
+        for i in range(80):
+            sink.write(_passing_chunk(f"chunk {i}"))
+        sink.close()
+
+    assert sink.uploaded == 80 and len(server.rows) == 80
+    # Starts at one request in flight and climbs toward the 8 connections while latency stays flat
+    assert control.concurrency.high >= 4
+    assert server.max_in_flight >= 4
+
+
+def test_rate_cap_spaces_out_requests(monkeypatch):
+    with FakeSupabaseServer() as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", _SERVICE_KEY)
+        monkeypatch.setattr(supabase_client, "_supabase_client", None)
+        control = UploadControl(bucket=TokenBucket(rate=40, burst=1))
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(partial(insert_db, control=control), [_passing_chunk(f"chunk {i}") for i in range(5)]))
+
+    # 10 requests (upload + row each) at 40/s after the first
+    assert time.monotonic() - start >= 9 / 40
+    assert len(server.rows) == 5
+
+
+def test_spooling_sink_rides_out_an_outage(monkeypatch, tmp_path):
+    with FakeSupabaseServer(fail_status=503) as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", _SERVICE_KEY)
+        monkeypatch.setattr(supabase_client, "_supabase_client", None)
+        spool = RetrySpool(str(tmp_path / "spool"), base_delay=0.05, max_delay=0.05)
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        sink = SpoolingInsertSink(spool, breaker, replay_interval=0.05)
+
+        chunks = [sink.write(_identified_chunk(f"chunk {i}", start_sample=i)) for i in range(6)]
+        requests_during_outage = server.requests
+
+        # Two failures open the breaker: the remaining chunks are spooled without a request
+        assert all("insert_spooled" in chunk and "error" not in chunk for chunk in chunks)
+        assert chunks[-1]["insert_spooled"] == "circuit open"
+        assert breaker.state == "open" and spool.pending_count() == 6
+
+        server.fail_status = 0
+        deadline = time.monotonic() + 5
+        while spool.pending_count() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        sink.close()
+
+    assert requests_during_outage == 2
+    assert sorted(row["original_text"] for row in server.rows) == sorted(f"chunk {i}" for i in range(6))
+    assert len(server.uploads) == 6
+    assert sink.replayed == 6 and breaker.state == "closed"
+
+
+def test_spooling_sink_dead_letters_after_max_attempts(mock_supabase, tmp_path):
+    mock_supabase.storage.from_.return_value.upload.side_effect = Exception("413 Payload Too Large")
+    spool = RetrySpool(str(tmp_path / "spool"), max_attempts=2, base_delay=0, max_delay=0)
+    sink = SpoolingInsertSink(spool, CircuitBreaker(failure_threshold=100), replay_interval=60)
+
+    sink.write(_passing_chunk("too big"))
+    assert sink.replay() == 0
+    assert sink.replay() == 0
+    sink.close()
+
+    assert (spool.pending_count(), spool.dead_count()) == (0, 1)
+    mock_supabase.table.assert_not_called()
@@ -0,0 +1,43 @@
+import pytest
+
+from src.utils.memory import MemoryBudget, current_rss_bytes, open_memory_budget
+
+
+def _rss(values):
+    """Fake RSS probe reading successive values, then holding the last one."""
+    readings = list(values)
+
+    def rss():
+        return readings.pop(0) if len(readings) > 1 else readings[0]
+    return rss
+
+
+def test_throttle_waits_until_rss_drops_below_resume_level():
+    budget = MemoryBudget(100, resume_fraction=0.9, poll_interval=0, rss=_rss([50, 120, 95, 89, 50]))
+
+    items = list(budget.throttle(range(2)))
+
+    assert items == [0, 1]
+    assert budget.throttles == 1
+    assert budget.throttled_seconds >= 0
+
+
+def test_throttle_never_waits_while_idle():
+    budget = MemoryBudget(100, poll_interval=0, rss=_rss([500]))
+
+    assert list(budget.throttle(range(3), idle=lambda: True)) == [0, 1, 2]
+
+
+def test_open_memory_budget(monkeypatch):
+    monkeypatch.delenv("MEMORY_BUDGET_MB", raising=False)
+    assert open_memory_budget() is None
+
+    monkeypatch.setenv("MEMORY_BUDGET_MB", "512")
+    budget = open_memory_budget()
+    if current_rss_bytes() is None:
+        assert budget is None
+    else:
+        assert budget.max_bytes == 512 * 1024 * 1024
+
+    with pytest.raises(ValueError):
+        MemoryBudget(0)
@@ -0,0 +1,117 @@
+import json
+import urllib.request
+
+import numpy as np
+import pytest
+
+from src.utils.metrics import Histogram, MetricsExporter, PipelineMetrics, instrument, open_metrics
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4 and histogram.sum == pytest.approx(2.65)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+
+
+def test_realtime_factor_uses_chunk_duration_or_utterance_audio():
+    metrics = PipelineMetrics()
+    metrics.observe_stage("transcribe_vosk", 1.0, [{"duration": 5.0}, {"duration": 5.0}])
+    metrics.observe_stage("vad", 0.5, [{"audio_array": np.zeros(32000), "sample_rate": 16000}])
+
+    stages = metrics.snapshot()["stages"]
+
+    assert stages["transcribe_vosk"]["realtime_factor"] == pytest.approx(0.1)
+    assert stages["vad"]["realtime_factor"] == pytest.approx(0.25)
+
+
+def test_instrument_records_calls_and_errors():
+    metrics = PipelineMetrics()
+
+    def node(state):
+        if state.get("fail"):
+            raise ValueError("bad chunk")
+        return state
+
+    timed = instrument(node, "evaluate_wer", metrics)
+    timed({"duration": 5.0})
+    with pytest.raises(ValueError):
+        timed({"fail": True})
+
+    stats = metrics.snapshot()["stages"]["evaluate_wer"]
+    assert stats["items"] == 2 and stats["errors"] == 1
+    assert instrument(node, "evaluate_wer", None) is node
+
+
+def test_prometheus_text_format():
+    metrics = PipelineMetrics(buckets=(0.5,))
+    metrics.observe_stage("insert_db", 0.25, [{"duration": 10.0}])
+    metrics.observe_output({"pass": True})
+    metrics.observe_output({"pass": False})
+    metrics.watch_queues({"insert_db": _Sized(3)})
+
+    text = metrics.render_prometheus()
+
+    assert 'agentic_speech_stage_latency_seconds_bucket{stage="insert_db",le="0.5"} 1' in text
+    assert 'agentic_speech_stage_latency_seconds_bucket{stage="insert_db",le="+Inf"} 1' in text
+    assert 'agentic_speech_stage_latency_seconds_count{stage="insert_db"} 1' in text
+    assert 'agentic_speech_stage_realtime_factor{stage="insert_db"} 0.025' in text
+    assert 'agentic_speech_chunks_total{outcome="dropped"} 1' in text
+    assert "agentic_speech_pass_rate 0.5" in text
+    assert 'agentic_speech_queue_depth{queue="insert_db"} 3' in text
+
+
+def test_startup_phases_and_time_to_first_chunk():
+    metrics = PipelineMetrics()
+    metrics.observe_startup("load_vad", 0.5)
+    metrics.observe_output({"pass": True})
+    first_chunk = metrics.snapshot()["startup_seconds"]["first_chunk"]
+    metrics.observe_output({"pass": False})
+
+    startup = metrics.snapshot()["startup_seconds"]
+    assert startup == {"load_vad": 0.5, "first_chunk": first_chunk}
+    assert 'agentic_speech_startup_seconds{phase="load_vad"} 0.5' in metrics.render_prometheus()
+
+
+def test_exporter_serves_prometheus_and_writes_json(tmp_path):
+    metrics = PipelineMetrics()
+    metrics.observe_stage("vad", 0.01, [{"duration": 1.0}])
+    json_path = tmp_path / "metrics.json"
+    exporter = MetricsExporter(metrics, port=0, json_path=str(json_path), interval=3600)
+
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+            body = response.read().decode()
+            content_type = response.headers["Content-Type"]
+    finally:
+        exporter.close()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert 'agentic_speech_stage_items_total{stage="vad"} 1' in body
+    assert json.loads(json_path.read_text())["stages"]["vad"]["items"] == 1
+
+
+def test_open_metrics_is_off_unless_configured(tmp_path, monkeypatch):
+    monkeypatch.delenv("METRICS_PORT", raising=False)
+    monkeypatch.delenv("METRICS_JSON_PATH", raising=False)
+    assert open_metrics() == (None, None)
+
+    monkeypatch.setenv("METRICS_JSON_PATH", str(tmp_path / "out" / "metrics.json"))
+    metrics, exporter = open_metrics()
+    exporter.close()
+
+    assert isinstance(metrics, PipelineMetrics)
+    assert (tmp_path / "out" / "metrics.json").exists()
+
+
+class _Sized:
+    def __init__(self, size):
+        self.size = size
+
+    def qsize(self):
+        return self.size
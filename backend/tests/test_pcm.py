@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.utils.pcm import as_ingest_dtype, ingest_dtype, padded_chunk, to_float32, to_pcm16
+
+
+def test_pcm16_conversion_matches_scaling_and_clips():
+    audio = np.array([-1.5, -1.0, -0.25, 0.0, 0.5, 1.0, 2.0], dtype=np.float32)
+
+    pcm = to_pcm16(audio)
+
+    assert pcm.dtype == np.int16
+    np.testing.assert_array_equal(pcm[1:-1], (audio[1:-1] * 32767).astype(np.int16))
+    assert (pcm[0], pcm[-1]) == (-32767, 32767)
+    assert to_pcm16(pcm) is pcm
+
+
+def test_float32_round_trip():
+    pcm = np.array([-32767, -1, 0, 16384, 32767], dtype=np.int16)
+
+    audio = to_float32(pcm)
+
+    assert audio.dtype == np.float32
+    np.testing.assert_array_equal(to_pcm16(audio), pcm)
+    assert to_float32(audio) is audio
+
+
+def test_ingest_dtype(monkeypatch):
+    audio = np.full(4, 0.5, dtype=np.float32)
+    monkeypatch.delenv("AUDIO_DTYPE", raising=False)
+    assert as_ingest_dtype(audio) is audio
+
+    monkeypatch.setenv("AUDIO_DTYPE", "int16")
+    assert as_ingest_dtype(audio).dtype == np.int16
+
+    monkeypatch.setenv("AUDIO_DTYPE", "float64")
+    with pytest.raises(ValueError, match="AUDIO_DTYPE"):
+        ingest_dtype()
+
+
+def test_padded_chunk_materializes_recorded_padding():
+    audio = np.ones(10, dtype=np.int16)
+
+    assert padded_chunk({"chunk_array": audio}) is audio
+    padded = padded_chunk({"chunk_array": audio, "pad_samples": 5})
+    assert padded.dtype == np.int16
+    np.testing.assert_array_equal(padded, [1] * 10 + [0] * 5)
@@ -0,0 +1,190 @@
+import threading
+import time
+
+import pytest
+
+from src.pipeline import Stage, StreamingPipeline
+
+
+def _double(state):
+    state["value"] *= 2
+    return state
+
+
+def test_pipeline_runs_every_stage():
+    """Each state should traverse all stages and come out exactly once."""
+    pipeline = StreamingPipeline(
+        [
+            Stage("double", _double, workers=3),
+            Stage("tag", lambda s: {**s, "tagged": True}, workers=2),
+        ],
+        queue_size=2,
+    )
+
+    results = list(pipeline.run({"value": i} for i in range(20)))
+
+    assert len(results) == 20
+    assert sorted(r["value"] for r in results) == [i * 2 for i in range(20)]
+    assert all(r["tagged"] for r in results)
+
+
+def test_pipeline_expand_and_route():
+    """
+    An expanding stage fans one item out into many, and a route returning
+    "end" short-circuits the state past the remaining stages.
+    """
+    inserted = []
+
+    def split(state):
+        return [{"id": f"{state['id']}-{i}", "pass": i % 2 == 0} for i in range(3)]
+
+    def gate(state):
+        return "insert_db" if state["pass"] else "end"
+
+    def insert(state):
+        inserted.append(state["id"])
+        return state
+
+    pipeline = StreamingPipeline(
+        [
+            Stage("vad", split, expand=True),
+            Stage("wer", lambda s: s, route=gate),
+            Stage("insert", insert, workers=2),
+        ]
+    )
+
+    results = list(pipeline.run({"id": str(i)} for i in range(4)))
+
+    assert len(results) == 12
+    assert sorted(inserted) == sorted(r["id"] for r in results if r["pass"])
+    assert len(inserted) == 8
+    assert pipeline.in_flight == 0
+
+
+def test_pipeline_surfaces_node_errors():
+    """A raising node marks the state with an error and the stream continues."""
+
+    def flaky(state):
+        if state["value"] == 2:
+            raise ValueError("boom")
+        return state
+
+    pipeline = StreamingPipeline([Stage("flaky", flaky), Stage("double", _double)])
+
+    results = list(pipeline.run({"value": i} for i in range(4)))
+
+    errors = [r for r in results if "error" in r]
+    assert len(results) == 4
+    assert len(errors) == 1
+    assert errors[0]["error"] == "flaky: boom"
+    # The failed state must not have reached the downstream stage
+    assert errors[0]["value"] == 2
+
+
+def test_pipeline_applies_backpressure():
+    """The source must not run ahead of a blocked stage by more than the queue bounds."""
+    release = threading.Event()
+    produced = []
+
+    def source():
+        for i in range(50):
+            produced.append(i)
+            yield {"value": i}
+
+    def blocked(state):
+        release.wait()
+        return state
+
+    pipeline = StreamingPipeline([Stage("blocked", blocked)], queue_size=2)
+    results = pipeline.run(source())
+
+    consumer = threading.Thread(target=lambda: list(results))
+    consumer.start()
+    time.sleep(0.2)
+
+    # 1 item held by the worker, 2 in its queue, 1 blocked in the source's put
+    assert len(produced) <= 4
+
+    release.set()
+    consumer.join(timeout=5)
+    assert len(produced) == 50
+
+
+def test_pipeline_reraises_source_errors():
+    def source():
+        yield {"value": 1}
+        raise RuntimeError("stream broke")
+
+    pipeline = StreamingPipeline([Stage("double", _double)])
+
+    with pytest.raises(RuntimeError, match="stream broke"):
+        list(pipeline.run(source()))
+
+
+def test_pipeline_batched_stage():
+    """A batched stage receives lists of states and returns one result per state."""
+    batch_sizes = []
+
+    def double_all(states):
+        batch_sizes.append(len(states))
+        return [_double(state) for state in states]
+
+    pipeline = StreamingPipeline([Stage("double", double_all, batch_size=4)], queue_size=16)
+
+    results = list(pipeline.run({"value": i} for i in range(10)))
+
+    assert sorted(r["value"] for r in results) == [i * 2 for i in range(10)]
+    assert max(batch_sizes) <= 4
+    assert sum(batch_sizes) == 10
+
+
+def test_pipeline_records_metrics():
+    from src.utils.metrics import PipelineMetrics
+
+    metrics = PipelineMetrics()
+
+    def gate(state):
+        if state["value"] == 6:
+            raise RuntimeError("boom")
+        state["pass"] = state["value"] % 4 == 0
+        return state
+
+    pipeline = StreamingPipeline(
+        [
+            Stage("double", _double, workers=2),
+            Stage("gate", gate, route=lambda s: "next" if s["pass"] else "end"),
+            Stage("batched", lambda states: states, batch_size=4),
+        ],
+        queue_size=2,
+        metrics=metrics,
+    )
+    list(pipeline.run({"value": i, "duration": 2.0} for i in range(6)))
+
+    snapshot = metrics.snapshot()
+    stages = snapshot["stages"]
+    assert stages["fetch"]["items"] == 6
+    assert stages["double"]["items"] == 6
+    assert stages["double"]["audio_seconds"] == 12.0
+    assert stages["gate"]["items"] == 6 and stages["gate"]["errors"] == 1
+    assert stages["batched"]["items"] == 3
+    assert stages["batched"]["latency_seconds"]["count"] <= 3
+    assert snapshot["chunks"] == {"passed": 3, "dropped": 2, "error": 1}
+    assert snapshot["pass_rate"] == 0.5
+    assert set(snapshot["queue_depth"]) == {"double", "gate", "batched", "output"}
+
+
+def test_pipeline_counts_items_in_flight():
+    """Expanded chunks count as in flight until they leave the pipeline."""
+    seen = []
+    pipeline = StreamingPipeline(
+        [
+            Stage("vad", lambda s: [dict(s), dict(s)], expand=True),
+            Stage("insert", lambda s: seen.append(pipeline.in_flight) or s),
+        ]
+    )
+
+    results = list(pipeline.run({"id": str(i)} for i in range(3)))
+
+    assert len(results) == 6
+    assert all(count >= 1 for count in seen)
+    assert pipeline.in_flight == 0
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from src.utils.prefetch import prefetch
+
+
+def _slow_first(delays):
+    def fn(i):
+        time.sleep(delays.get(i, 0))
+        return i * 10
+    return fn
+
+
+def test_keeps_input_order():
+    results = list(prefetch(range(6), _slow_first({0: 0.1}), workers=3, depth=4))
+
+    assert results == [0, 10, 20, 30, 40, 50]
+
+
+def test_completion_order_lets_fast_items_pass():
+    results = list(prefetch(range(4), _slow_first({0: 0.2}), workers=2, depth=4, ordered=False))
+
+    assert sorted(results) == [0, 10, 20, 30]
+    assert results[0] != 0
+
+
+def test_reads_at_most_depth_items_ahead():
+    read = []
+
+    def items():
+        for i in range(20):
+            read.append(i)
+            yield i
+
+    stream = prefetch(items(), lambda i: i, workers=2, depth=3)
+    assert next(stream) == 0
+    time.sleep(0.1)
+
+    # One taken by the consumer, three decoded ahead, one read and waiting for a slot
+    assert len(read) <= 5
+    stream.close()
+    assert not any(thread.name == "prefetch-source" for thread in threading.enumerate())
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_errors_surface_after_earlier_results(ordered):
+    def items():
+        yield from range(3)
+        raise ConnectionError("hub went away")
+
+    results = []
+    with pytest.raises(ConnectionError):
+        for result in prefetch(items(), lambda i: i, depth=2, ordered=ordered):
+            results.append(result)
+    assert sorted(results) == [0, 1, 2]
+
+    def fn(i):
+        if i == 2:
+            raise ValueError("bad row")
+        return i
+
+    stream = prefetch(range(5), fn, depth=2)
+    assert [next(stream), next(stream)] == [0, 1]
+    with pytest.raises(ValueError):
+        next(stream)
@@ -99,3 +99,24 @@ def test_process_vad_strips_silence():
     assert (
         chunk["duration"] >= 5.0
     ), f"Chunk duration {chunk['duration']} should be padded to 5s"
+
+
+def test_process_vad_chunks_are_padded_views():
+    """
+    Short chunks stay views into the utterance, with their padding recorded
+    as `pad_samples`, and int16 audio is chunked exactly like float32.
+    """
+    base_audio, sr = load_real_speech()
+    silence = np.zeros(int(2.0 * sr), dtype=np.float32)
+    audio = np.concatenate([silence, base_audio[:3 * sr], silence])
+
+    chunks = process_vad({"audio_array": audio, "sample_rate": sr})
+    pcm = np.round(audio * 32767).astype(np.int16)
+    pcm_chunks = process_vad({"audio_array": pcm, "sample_rate": sr})
+
+    chunk = chunks[0]
+    assert np.shares_memory(chunk["chunk_array"], audio)
+    assert chunk["pad_samples"] > 0
+    assert len(chunk["chunk_array"]) + chunk["pad_samples"] == round(chunk["duration"] * sr)
+    assert [c["start_sample"] for c in pcm_chunks] == [c["start_sample"] for c in chunks]
+    assert pcm_chunks[0]["chunk_array"].dtype == np.int16
@@ -0,0 +1,209 @@
+import asyncio
+import threading
+from contextlib import ExitStack
+
+import pytest
+
+from src.utils.rate_control import (
+    ROWS, UPLOAD, AIMDConcurrency, CircuitBreaker, TokenBucket, UploadControl, open_upload_control
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _request(controller, clock, latency, ok=True):
+    started = controller.acquire()
+    clock.now += latency
+    controller.release(started, ok)
+
+
+def test_limit_grows_one_per_round_trip_while_saturated():
+    clock = _Clock()
+    controller = AIMDConcurrency(initial=2, max_limit=4, clock=clock)
+
+    # Two requests in flight at a time: each round trip of two successes adds one
+    for _ in range(3):
+        slots = [controller.acquire() for _ in range(controller.limit)]
+        clock.now += 0.01
+        for started in slots:
+            controller.release(started)
+
+    assert controller.limit == 4
+    assert controller.decreases == 0
+
+
+def test_idle_capacity_does_not_raise_the_limit():
+    clock = _Clock()
+    controller = AIMDConcurrency(initial=4, clock=clock)
+
+    for _ in range(20):
+        _request(controller, clock, 0.01)
+
+    assert controller.limit == 4
+
+
+def test_slow_or_failed_requests_halve_the_limit_once_per_round_trip():
+    clock = _Clock()
+    controller = AIMDConcurrency(initial=8, clock=clock)
+    _request(controller, clock, 0.01)
+
+    # Eight requests issued together all come back slow: one decrease, not eight
+    slots = [controller.acquire() for _ in range(8)]
+    clock.now += 0.05
+    for started in slots:
+        controller.release(started)
+    assert (controller.limit, controller.decreases) == (4, 1)
+
+    _request(controller, clock, 0.01, ok=False)
+    assert (controller.limit, controller.decreases) == (2, 2)
+    assert controller.low == 2 and controller.high == 8
+
+
+def test_baseline_follows_a_slower_service_once_at_the_minimum():
+    clock = _Clock()
+    controller = AIMDConcurrency(initial=1, max_limit=4, clock=clock)
+    _request(controller, clock, 0.01)
+
+    # 50ms is congestion at first; backed off to one request, it becomes the new baseline
+    for _ in range(10):
+        _request(controller, clock, 0.05)
+    decreases = controller.decreases
+    for _ in range(10):
+        _request(controller, clock, 0.05)
+
+    assert decreases >= 1 and controller.decreases == decreases
+    assert controller.target > 0.05 and controller.limit == 2
+    assert AIMDConcurrency(latency_target=0.2).target == 0.2
+
+
+def test_acquire_waits_for_a_free_slot():
+    controller = AIMDConcurrency(initial=1, max_limit=1)
+    started = controller.acquire()
+    acquired = threading.Event()
+
+    waiter = threading.Thread(target=lambda: (controller.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.05)
+
+    controller.release(started)
+    waiter.join(1)
+    assert acquired.is_set()
+
+
+def test_token_bucket_allows_a_burst_then_spaces_requests():
+    clock = _Clock()
+    bucket = TokenBucket(rate=10, burst=3, clock=clock)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+
+    clock.now += 1.0
+    assert bucket.reserve() == 0.0
+    with pytest.raises(ValueError, match="rate"):
+        TokenBucket(0)
+
+
+def test_circuit_breaker_opens_after_consecutive_failures_and_probes_once():
+    clock = _Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert (breaker.state, breaker.trips) == ("open", 1)
+    assert not breaker.allow()
+
+    # After the timeout a single probe goes through; its failure reopens the breaker
+    clock.now += 10
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_upload_control_counts_exceptions_as_failures():
+    control = UploadControl(AIMDConcurrency(initial=4))
+
+    with control.slot():
+        pass
+    with pytest.raises(RuntimeError):
+        with control.slot():
+            raise RuntimeError("503")
+
+    assert control.concurrency.decreases == 1
+    assert control.concurrency.in_flight == 0
+
+
+def _mixed_round(control, clock, per_kind):
+    # Uploads fill every slot and take 50ms; then a 1ms row upsert goes out.
+    with ExitStack() as stack:
+        for _ in range(control.concurrency.limit):
+            stack.enter_context(control.slot())
+        clock.now += 0.05
+    with control.slot(ROWS if per_kind else UPLOAD):
+        clock.now += 0.001
+
+
+def test_row_upserts_keep_their_own_latency_baseline():
+    clock = _Clock()
+    control = UploadControl(AIMDConcurrency(initial=2, max_limit=16, clock=clock))
+    for _ in range(10):
+        _mixed_round(control, clock, per_kind=True)
+    assert control.concurrency.decreases == 0 and control.concurrency.limit >= 4
+
+    # Measured against one baseline, the fast upserts make every upload look congested
+    shared = UploadControl(AIMDConcurrency(initial=2, max_limit=16, clock=clock))
+    for _ in range(10):
+        _mixed_round(shared, clock, per_kind=False)
+    assert shared.concurrency.decreases > 0 and shared.concurrency.limit <= 2
+
+
+def test_async_slot_bounds_coroutines_in_flight():
+    control = UploadControl(AIMDConcurrency(initial=2, max_limit=2))
+    peak = [0, 0]
+
+    async def request():
+        async with control.async_slot():
+            peak[0] += 1
+            peak[1] = max(peak)
+            await asyncio.sleep(0.01)
+            peak[0] -= 1
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(10)))
+
+    asyncio.run(run())
+    assert peak[1] == 2
+    assert control.concurrency.in_flight == 0
+
+
+def test_open_upload_control(monkeypatch):
+    for name in ("INSERT_ADAPTIVE", "INSERT_RATE_LIMIT", "INSERT_LATENCY_TARGET_MS", "INSERT_MIN_CONCURRENCY"):
+        monkeypatch.delenv(name, raising=False)
+    assert open_upload_control(8) is None
+
+    monkeypatch.setenv("INSERT_ADAPTIVE", "1")
+    monkeypatch.setenv("INSERT_LATENCY_TARGET_MS", "250")
+    control = open_upload_control(8)
+    assert (control.concurrency.max_limit, control.concurrency.target) == (8, 0.25)
+    assert control.bucket is None
+
+    monkeypatch.setenv("INSERT_ADAPTIVE", "0")
+    monkeypatch.setenv("INSERT_RATE_LIMIT", "8")
+    control = open_upload_control(8)
+    assert control.concurrency is None and control.bucket.rate == 8
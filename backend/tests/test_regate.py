@@ -0,0 +1,144 @@
+import numpy as np
+
+from src import regate as regate_module
+from src.regate import attach_audio, regate_states
+from src.utils.pcm import padded_chunk
+from src.utils.transcript_cache import TranscriptCache, audio_hash
+
+
+def _utterance(seed=0, seconds=12):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-0.5, 0.5, seconds * 16000).astype(np.float32)
+
+
+def _state(utterance_id, audio, start, end, text="a b c d e f g h i j", transcript="a b c d e f g h i j"):
+    samples = audio[start:end]
+    if len(samples) < end - start:
+        samples = np.concatenate([samples, np.zeros(end - start - len(samples), dtype=np.float32)])
+    return {
+        "utterance_id": utterance_id,
+        "dataset_id": "dev.clean",
+        "stream_index": int(utterance_id.split("-")[1]),
+        "start_sample": start,
+        "end_sample": end,
+        "sample_rate": 16000,
+        "original_text": text,
+        "transcribed_text": transcript,
+        "aligned_words": [],
+        "audio_hash": audio_hash(samples),
+    }
+
+
+def test_regate_states_applies_the_new_threshold():
+    states = [
+        {"original_text": "a b c d e f g h i j", "transcribed_text": "a b c d e f g h i j"},
+        {"original_text": "a b c d e f g h i j", "transcribed_text": "a b c d e f g h x y"},
+    ]
+
+    strict = regate_states([dict(state) for state in states])
+    lenient = regate_states([dict(state) for state in states], threshold=0.25)
+
+    assert [state["pass"] for state in strict] == [True, False]
+    assert [state["pass"] for state in lenient] == [True, True]
+    assert lenient[1]["wer_score"] == 0.2
+
+
+def test_attach_audio_reslices_and_pads_chunks():
+    audio = _utterance()
+    states = [_state("utt-0", audio, 0, 80000), _state("utt-0", audio, 160000, 240000)]
+    source = [{"utterance_id": "utt-0", "audio_array": audio}]
+
+    chunks = list(attach_audio(states, source))
+
+    np.testing.assert_array_equal(chunks[0]["chunk_array"], audio[:80000])
+    # The utterance ends 32000 samples into the second chunk: the rest is padding
+    assert len(chunks[1]["chunk_array"]) == 32000 and chunks[1]["pad_samples"] == 48000
+    assert np.shares_memory(chunks[1]["chunk_array"], audio)
+    padded = padded_chunk(chunks[1])
+    assert len(padded) == 80000 and not np.any(padded[32000:])
+    assert all("error" not in chunk for chunk in chunks)
+
+
+def test_attach_audio_keeps_recorded_padding_inside_the_utterance():
+    """VAD pads a short chunk with silence even where the utterance goes on."""
+    audio = _utterance(seed=5)
+    state = _state("utt-0", audio, 0, 80000)
+    state["pad_samples"] = 20000
+    state["audio_hash"] = audio_hash(audio[:60000], 20000)
+
+    chunk = next(attach_audio([state], [{"utterance_id": "utt-0", "audio_array": audio}]))
+
+    assert "error" not in chunk
+    np.testing.assert_array_equal(chunk["chunk_array"], audio[:60000])
+
+
+def test_attach_audio_flags_changed_or_missing_audio_and_stops_early():
+    audio = _utterance(seed=1)
+    states = [_state("utt-0", audio, 0, 80000), _state("utt-2", audio, 0, 80000)]
+    read = []
+
+    def source():
+        for i, utterance in enumerate([_utterance(seed=2), audio, audio, audio]):
+            read.append(i)
+            yield {"utterance_id": f"utt-{i}", "audio_array": utterance}
+
+    chunks = list(attach_audio(states, source()))
+
+    assert "differs" in chunks[0]["error"]
+    assert "error" not in chunks[1]
+    assert read == [0, 1, 2]
+
+    missing = list(attach_audio([_state("utt-9", audio, 0, 80000)], source()))
+    assert "not found" in missing[0]["error"]
+
+
+def test_main_inserts_only_chunks_that_pass(tmp_path, monkeypatch):
+    audios = [_utterance(seed=3), _utterance(seed=4)]
+    monkeypatch.setenv("TRANSCRIPT_CACHE_PATH", str(tmp_path / "t.sqlite"))
+    cache = regate_module.open_transcript_cache(regate_module.model_id(), regate_module.vad_params())
+    for state in [
+        _state("utt-0", audios[0], 0, 80000),
+        _state("utt-1", audios[1], 0, 80000, transcript="a b c d e f g h x y"),
+    ]:
+        state["chunk_array"] = audios[int(state["utterance_id"][-1])][:80000]
+        cache.transcribe(state, lambda data: data)
+    cache.close()
+
+    inserted = []
+
+    def insert(data):
+        inserted.append((data["utterance_id"], data["encoded_audio"]))
+        return data
+
+    monkeypatch.setattr(
+        regate_module,
+        "fetch_hf_stream",
+        lambda cache=None, start=0: iter(
+            [{"utterance_id": f"utt-{i}", "audio_array": audios[i]} for i in range(start, 2)]
+        ),
+    )
+    monkeypatch.setattr(regate_module, "open_insert_sink", lambda: (None, insert))
+
+    regate_module.main(["--dry-run"])
+    assert inserted == []
+
+    regate_module.main([])
+    assert [utterance for utterance, _ in inserted] == ["utt-0"]
+
+    inserted.clear()
+    regate_module.main(["--threshold", "0.2"])
+    assert sorted(utterance for utterance, _ in inserted) == ["utt-0", "utt-1"]
+
+
+def test_cache_states_feed_regate_directly(tmp_path):
+    audio = _utterance(seed=4)
+    cache = TranscriptCache(str(tmp_path / "t.sqlite"), 10**6, "m", {})
+    state = _state("utt-0", audio, 0, 80000)
+    state["chunk_array"] = audio[:80000]
+    cache.transcribe(state, lambda data: data)
+
+    states = regate_states(list(cache.chunks()))
+    chunks = list(attach_audio(states, [{"utterance_id": "utt-0", "audio_array": audio}]))
+
+    assert chunks[0]["pass"] is True
+    assert "error" not in chunks[0]
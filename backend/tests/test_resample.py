@@ -0,0 +1,55 @@
+import librosa
+import numpy as np
+import pytest
+
+from src.utils import resample as resample_module
+from src.utils.resample import resample
+
+
+def _tone(seconds=1.0, sr=24000, freq=440.0):
+    t = np.arange(int(seconds * sr)) / sr
+    return (0.3 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_hq_matches_librosa_default():
+    audio = _tone(seconds=1.37)
+
+    expected = librosa.resample(audio, orig_sr=24000, target_sr=16000)
+    result = resample(audio, 24000, 16000, quality="hq")
+
+    assert result.dtype == np.float32
+    assert len(result) == len(expected)
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_repeated_calls_reuse_the_stream_without_leaking_state():
+    first = resample(_tone(freq=440.0), 24000, 16000, quality="fast")
+    resample(_tone(freq=3000.0), 24000, 16000, quality="fast")
+    again = resample(_tone(freq=440.0), 24000, 16000, quality="fast")
+
+    np.testing.assert_array_equal(first, again)
+    assert (24000, 16000, "fast") in resample_module._local.streams
+
+
+def test_tone_survives_every_quality():
+    for quality in resample_module.QUALITY_PRESETS:
+        result = resample(_tone(freq=1000.0), 24000, 16000, quality=quality)
+        spectrum = np.abs(np.fft.rfft(result))
+        peak_hz = np.argmax(spectrum) * 16000 / len(result)
+
+        assert len(result) == 16000
+        assert abs(peak_hz - 1000.0) < 2.0
+
+
+def test_quality_from_env_and_validation(monkeypatch):
+    monkeypatch.setenv("RESAMPLE_QUALITY", "fast")
+    resample(_tone(), 24000, 16000)
+    assert (24000, 16000, "fast") in resample_module._local.streams
+
+    with pytest.raises(ValueError):
+        resample(_tone(), 24000, 16000, quality="ultra")
+
+
+def test_same_rate_is_a_no_op():
+    audio = _tone(sr=16000)
+    assert resample(audio, 16000, 16000) is audio
@@ -0,0 +1,145 @@
+import json
+import time
+
+import pytest
+
+from src.utils.sharding import ShardLeases, StaticShards, leased_stream, open_sharding, shard_of
+
+_IDS = [f"{speaker}_{chapter}_{line}" for speaker in range(5) for chapter in range(4) for line in range(10)]
+
+
+def test_shard_of_is_stable_and_spreads_ids():
+    shards = [shard_of(utterance_id, 4) for utterance_id in _IDS]
+
+    assert shards == [shard_of(utterance_id, 4) for utterance_id in _IDS]
+    assert all(shards.count(shard) > len(_IDS) / 8 for shard in range(4))
+
+
+def test_static_shards_partition_the_stream():
+    workers = [StaticShards(rank, 3, num_shards=6) for rank in range(3)]
+
+    assert [worker.shards for worker in workers] == [[0, 3], [1, 4], [2, 5]]
+    for utterance_id in _IDS:
+        assert sum(worker.owns(utterance_id) for worker in workers) == 1
+    assert workers[1].scoped_path("/state/progress.json") == "/state/progress.rank-1-of-3.json"
+
+    with pytest.raises(ValueError, match="WORKER_RANK"):
+        StaticShards(3, 3)
+
+
+def test_leases_are_disjoint_and_expire_with_their_worker(tmp_path):
+    path = str(tmp_path / "leases.json")
+    offset = [0.0]
+    first = ShardLeases(path, 4, worker_id="a", ttl=60)
+    second = ShardLeases(path, 4, worker_id="b", ttl=60, clock=lambda: time.time() + offset[0])
+
+    try:
+        assert first.claim(2) == [0, 1]
+        assert second.claim(2) == [2, 3]
+        assert second.claim() == [2, 3]
+
+        second.complete([2, 3])
+        assert second.claim() == []
+        assert second.remaining() == 2
+
+        # "a" stops renewing: once its leases expire, "b" takes them over
+        offset[0] = 120
+        assert second.claim() == [0, 1]
+        assert first.renew() == []
+        second.complete([0, 1])
+        assert first.remaining() == 0
+    finally:
+        first.close()
+        second.close()
+
+
+def test_close_releases_unfinished_leases(tmp_path):
+    path = str(tmp_path / "leases.json")
+    first = ShardLeases(path, 2, worker_id="a")
+    first.claim()
+    first.close()
+
+    second = ShardLeases(path, 2, worker_id="b")
+    assert second.claim() == [0, 1]
+    second.close()
+
+    with open(path) as f:
+        assert json.load(f)["leases"] == {}
+    with pytest.raises(ValueError, match="NUM_SHARDS"):
+        ShardLeases(path, 3)
+
+
+def test_leased_stream_covers_every_shard_once(tmp_path):
+    leases = ShardLeases(str(tmp_path / "leases.json"), 4, worker_id="a", claim_limit=2)
+    passes = []
+
+    def fetch(owns):
+        passes.append(sorted(leases.held))
+        return iter([{"utterance_id": utterance_id} for utterance_id in _IDS if owns(utterance_id)])
+
+    records = list(leased_stream(leases, fetch, idle=lambda: True))
+    leases.close()
+
+    assert passes == [[0, 1], [2, 3]]
+    assert sorted(record["utterance_id"] for record in records) == sorted(_IDS)
+    assert leases.remaining() == 0
+
+
+def test_leased_stream_waits_for_leases_held_elsewhere(tmp_path):
+    path = tmp_path / "leases.json"
+    # A worker that died holding shard 1: its lease runs out shortly
+    path.write_text(json.dumps(
+        {"num_shards": 2, "leases": {"1": {"worker": "dead", "expires": time.time() + 0.2}}, "done": []}
+    ))
+    leases = ShardLeases(str(path), 2, worker_id="a", ttl=0.2)
+
+    start = time.monotonic()
+    records = list(leased_stream(
+        leases, lambda owns: (i for i in _IDS if owns(i)), idle=lambda: True, poll_interval=0.05
+    ))
+    leases.close()
+
+    assert sorted(records) == sorted(_IDS)
+    assert time.monotonic() - start >= 0.1
+    assert leases.remaining() == 0
+
+
+def test_leased_stream_retries_shards_with_failed_chunks(tmp_path):
+    leases = ShardLeases(str(tmp_path / "leases.json"), 2, worker_id="a", max_passes=2)
+    broken = next(i for i in _IDS if shard_of(i, 2) == 1)
+    passes = []
+
+    def fetch(owns):
+        passes.append(sorted(leases.held))
+        for utterance_id in _IDS:
+            if owns(utterance_id):
+                if utterance_id == broken:
+                    leases.fail(utterance_id)
+                yield utterance_id
+
+    records = list(leased_stream(leases, fetch, idle=lambda: True))
+    leases.close()
+
+    # Shard 1 is retried once, then left pending instead of recorded as done
+    assert passes == [[0, 1], [1]]
+    assert records.count(broken) == 2
+    state = json.loads((tmp_path / "leases.json").read_text())
+    assert state["done"] == [0] and state["failed"] == {"1": 2}
+    assert leases.remaining() == 0
+
+
+def test_open_sharding(monkeypatch, tmp_path):
+    for name in ("WORLD_SIZE", "WORKER_RANK", "NUM_SHARDS", "SHARD_LEASE_PATH"):
+        monkeypatch.delenv(name, raising=False)
+    assert open_sharding() == (None, None)
+
+    monkeypatch.setenv("WORLD_SIZE", "2")
+    monkeypatch.setenv("WORKER_RANK", "1")
+    static_shards, shard_leases = open_sharding()
+    assert static_shards.shards == [1] and shard_leases is None
+
+    monkeypatch.setenv("SHARD_LEASE_PATH", str(tmp_path / "shared" / "leases.json"))
+    static_shards, shard_leases = open_sharding()
+    assert static_shards is None
+    assert (shard_leases.num_shards, shard_leases.claim_limit) == (8, 4)
+    shard_leases.close()
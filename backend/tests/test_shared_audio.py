@@ -0,0 +1,132 @@
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from src.utils.shared_audio import SharedAudioRing, attach_view
+
+
+@pytest.fixture
+def ring():
+    audio_ring = SharedAudioRing(capacity_samples=100)
+    yield audio_ring
+    audio_ring.close()
+
+
+def test_put_returns_handle_and_view(ring):
+    audio = np.arange(10, dtype=np.float32)
+
+    handle = ring.put(audio)
+
+    assert handle.buffer_id == ring.buffer_id
+    assert (handle.offset, handle.length) == (0, 10)
+    np.testing.assert_array_equal(ring.view(handle), audio)
+    np.testing.assert_array_equal(attach_view(handle), audio)
+
+
+def test_int16_ring():
+    audio_ring = SharedAudioRing(capacity_samples=100, dtype=np.int16)
+    try:
+        audio = np.arange(-5, 5, dtype=np.int16)
+        ring_handle = audio_ring.put(audio)
+
+        assert ring_handle.dtype == "int16" and (ring_handle.offset, ring_handle.length) == (0, 10)
+        view = attach_view(ring_handle)
+        assert view.dtype == np.int16
+        np.testing.assert_array_equal(view, audio)
+    finally:
+        audio_ring.close()
+
+
+def test_release_reclaims_space_in_ring_order(ring):
+    first = ring.put(np.ones(40, dtype=np.float32))
+    second = ring.put(np.ones(40, dtype=np.float32))
+    assert ring.used() == 80
+
+    # Releasing out of order holds the space until the oldest chunk is gone
+    ring.release(second)
+    assert ring.used() == 80
+
+    ring.release(first)
+    assert ring.used() == 0
+
+
+def test_reference_counting(ring):
+    handle = ring.put(np.ones(50, dtype=np.float32), refs=2)
+    ring.acquire(handle)
+
+    ring.release(handle)
+    ring.release(handle)
+    assert ring.used() == 50
+
+    ring.release(handle)
+    assert ring.used() == 0
+
+
+def test_wraps_around_without_splitting_chunks(ring):
+    first = ring.put(np.ones(60, dtype=np.float32))
+    second = ring.put(np.full(30, 2.0, dtype=np.float32))
+    ring.release(first)
+
+    # 10 samples left at the end of the ring: the chunk wraps to offset 0
+    third = ring.put(np.full(50, 3.0, dtype=np.float32))
+
+    assert third.offset == 0
+    np.testing.assert_array_equal(ring.view(second), np.full(30, 2.0))
+    np.testing.assert_array_equal(ring.view(third), np.full(50, 3.0))
+
+
+def test_put_blocks_until_space_is_released(ring):
+    handle = ring.put(np.ones(80, dtype=np.float32))
+
+    with pytest.raises(TimeoutError):
+        ring.put(np.ones(30, dtype=np.float32), timeout=0.05)
+
+    threading.Timer(0.05, ring.release, args=(handle,)).start()
+    blocked = ring.put(np.ones(30, dtype=np.float32), timeout=5)
+
+    assert blocked.length == 30
+
+
+def test_non_blocking_put_returns_none_when_full(ring):
+    ring.put(np.ones(80, dtype=np.float32))
+
+    assert ring.put(np.ones(30, dtype=np.float32), block=False) is None
+    assert ring.put(np.ones(20, dtype=np.float32), block=False).length == 20
+
+
+def test_vad_batch_larger_than_the_ring_does_not_deadlock(ring, monkeypatch):
+    from src import main
+
+    utterances = [{"utterance_id": f"utt-{i}", "stream_index": i} for i in range(3)]
+
+    def process_vad_batch(batch):
+        return [[{"chunk_array": np.ones(40, dtype=np.float32), "start_time": 0.0, "end_time": 1.0}] for _ in batch]
+
+    monkeypatch.setattr(main, "process_vad_batch", process_vad_batch)
+
+    # 3 x 40 samples in a 100-sample ring, with nothing downstream to release them yet
+    chunks = [chunk for chunk_list in main._split_utterances(utterances, audio_ring=ring) for chunk in chunk_list]
+
+    assert ["chunk_handle" in chunk for chunk in chunks] == [True, True, False]
+    assert all(len(chunk["chunk_array"]) == 40 for chunk in chunks)
+    main._release_audio(chunks[0], ring)
+    assert ring.used() == 40
+
+
+def test_rejects_audio_larger_than_ring(ring):
+    with pytest.raises(ValueError):
+        ring.put(np.ones(101, dtype=np.float32))
+
+
+def _sum_in_child(handle):
+    return float(attach_view(handle).sum())
+
+
+def test_worker_process_reads_handle(ring):
+    """Only the handle crosses the process boundary; the child maps the segment."""
+    handle = ring.put(np.full(25, 0.5, dtype=np.float32))
+
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        assert pool.apply(_sum_in_child, (handle,)) == 12.5
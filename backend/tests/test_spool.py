@@ -0,0 +1,78 @@
+import os
+import random
+
+from src.utils.spool import RetrySpool, open_spool
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _spool(tmp_path, clock, **kwargs):
+    return RetrySpool(str(tmp_path / "spool"), clock=clock, rng=random.Random(0), **kwargs)
+
+
+def test_put_then_replay_removes_the_job(tmp_path):
+    clock = _Clock()
+    spool = _spool(tmp_path, clock)
+    spool.put("chunk-1", "ds/chunk-1.wav", b"RIFF", "audio/wav", {"id": "chunk-1"}, "503")
+
+    assert spool.pending_count() == 1
+    # Full jitter: the first retry is due within `base_delay`
+    assert spool.due() == []
+    clock.now += spool.base_delay
+    (job,) = spool.due()
+    assert (job["row"], job["attempts"], job["last_error"]) == ({"id": "chunk-1"}, 0, "503")
+    assert spool.audio(job) == b"RIFF"
+
+    spool.succeeded(job)
+    assert spool.pending_count() == 0
+    assert os.listdir(spool.pending_dir) == []
+
+
+def test_backoff_grows_until_the_job_is_dead_lettered(tmp_path):
+    clock = _Clock()
+    spool = _spool(tmp_path, clock, max_attempts=4, base_delay=1.0, max_delay=5.0)
+    spool.put("chunk-1", "ds/chunk-1.wav", b"RIFF", "audio/wav", {"id": "chunk-1"}, "timeout")
+
+    delays = []
+    for attempt in range(3):
+        clock.now += spool.max_delay
+        (job,) = spool.due()
+        assert spool.failed(job, f"timeout {attempt}")
+        delays.append(spool.due(clock.now + 10)[0]["next_attempt"] - clock.now)
+    assert all(0 <= delay <= min(5.0, 2 ** (attempt + 1)) for attempt, delay in enumerate(delays))
+
+    clock.now += spool.max_delay
+    (job,) = spool.due()
+    assert not spool.failed(job, "timeout 3")
+    assert (spool.pending_count(), spool.dead_count()) == (0, 1)
+    assert sorted(os.listdir(spool.dead_dir)) == ["chunk-1.audio", "chunk-1.json"]
+
+    assert spool.requeue_dead() == 1
+    (job,) = spool.due()
+    assert (job["attempts"], job["last_error"]) == (0, "timeout 3")
+
+
+def test_jobs_survive_a_restart(tmp_path):
+    clock = _Clock()
+    _spool(tmp_path, clock).put("chunk-1", "ds/chunk-1.wav", b"RIFF", "audio/wav", {"id": "chunk-1"}, "503")
+
+    clock.now += 10
+    (job,) = _spool(tmp_path, clock).due()
+    assert job["id"] == "chunk-1"
+
+
+def test_open_spool(monkeypatch, tmp_path):
+    monkeypatch.delenv("INSERT_SPOOL_DIR", raising=False)
+    assert open_spool() is None
+
+    monkeypatch.setenv("INSERT_SPOOL_DIR", str(tmp_path / "spool"))
+    monkeypatch.setenv("INSERT_RETRY_MAX_ATTEMPTS", "3")
+    spool = open_spool()
+    assert spool.max_attempts == 3
+    assert os.path.isdir(spool.dead_dir)
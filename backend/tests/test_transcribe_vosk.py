@@ -1,7 +1,19 @@
+import json
+
 import numpy as np
+import pytest
 from unittest.mock import patch, MagicMock
 
-from src.nodes.transcribe_vosk import transcribe_vosk
+from src.nodes import transcribe_vosk as transcribe_module
+from src.nodes.transcribe_vosk import transcribe_vosk, transcribe_vosk_batch, transcribe_frames, VoskProcessPool
+
+
+@pytest.fixture(autouse=True)
+def fresh_model(monkeypatch):
+    """Every test loads its own (mocked) model and recognizer pool."""
+    monkeypatch.setattr(transcribe_module, "_vosk_model", None)
+    monkeypatch.setattr(transcribe_module, "_recognizers", None)
+
 
 @patch("src.nodes.transcribe_vosk.Model")
 @patch("src.nodes.transcribe_vosk.KaldiRecognizer")
@@ -26,6 +38,8 @@ def test_transcribe_vosk(mock_recognizer, mock_model):
     }
     '''
     mock_rec_instance.FinalResult.return_value = mock_json_response
+    # No endpoint inside the chunk: everything comes from FinalResult()
+    mock_rec_instance.AcceptWaveform.return_value = False
     
     # 1-second of mock Float32 audio via numpy
     mock_audio = np.zeros(16000, dtype=np.float32)
@@ -41,7 +55,9 @@ def test_transcribe_vosk(mock_recognizer, mock_model):
     mock_model.assert_called_once_with(lang="en-us")
     mock_recognizer.assert_called_once()
     mock_rec_instance.SetWords.assert_called_once_with(True)
-    mock_rec_instance.AcceptWaveform.assert_called_once()
+    # Fed in 200 ms frames
+    assert mock_rec_instance.AcceptWaveform.call_count == 5
+    assert all(len(call[0][0]) == 6400 for call in mock_rec_instance.AcceptWaveform.call_args_list)
     mock_rec_instance.FinalResult.assert_called_once()
 
     # Verify Mutated Data
@@ -59,3 +75,173 @@ def test_transcribe_vosk(mock_recognizer, mock_model):
     assert data_out["aligned_words"][1]["start"] == 0.60
     assert data_out["aligned_words"][1]["end"] == 1.05
     assert data_out["aligned_words"][1]["confidence"] == 0.99
+
+
+@patch("src.nodes.transcribe_vosk.Model")
+@patch("src.nodes.transcribe_vosk.KaldiRecognizer")
+def test_vosk_process_pool(mock_recognizer, mock_model):
+    """
+    The process-pool mode should decode in worker processes and write the
+    same keys back onto the state as the threaded node.
+    """
+    # Each worker process reuses its recognizer across the chunks it decodes
+    mock_recognizer.return_value = _vosk_like_recognizer(final_words=[("hi", 0.1, 0.5)])
+
+    # fork so the worker processes inherit the patched Vosk classes
+    with VoskProcessPool(processes=2, start_method="fork") as pool:
+        states = [pool.transcribe({"chunk_array": np.zeros(1600, dtype=np.float32)}) for _ in range(4)]
+
+    for state in states:
+        assert state["transcribed_text"] == "hi"
+        assert state["aligned_words"] == [
+            {"word": "hi", "start": 0.1, "end": 0.5, "confidence": 0.9}
+        ]
+
+
+@patch("src.nodes.transcribe_vosk.Model")
+@patch("src.nodes.transcribe_vosk.KaldiRecognizer")
+def test_process_pool_warm_up_starts_every_worker(mock_recognizer, mock_model):
+    with VoskProcessPool(processes=2, start_method="fork") as pool:
+        pool.warm_up()
+        assert len(pool._executor._processes) == 2
+
+
+def test_model_path_and_id(monkeypatch, tmp_path):
+    monkeypatch.delenv("VOSK_MODEL_ID", raising=False)
+    monkeypatch.delenv("VOSK_FRAME_MS", raising=False)
+    model_dir = tmp_path / "vosk-model-small-en-us-0.15"
+    model_dir.mkdir()
+    monkeypatch.setenv("VOSK_MODEL_PATH", str(model_dir))
+
+    assert transcribe_module.model_path() == str(model_dir)
+    assert transcribe_module.model_id() == "vosk-model-small-en-us-0.15/3200"
+
+    monkeypatch.setenv("VOSK_MODEL_PATH", str(tmp_path / "missing"))
+    with pytest.raises(FileNotFoundError):
+        transcribe_module.model_path()
+
+
+def _vosk_like_recognizer(final_words, endpoint_after=None, endpoint_words=()):
+    """
+    Mock recognizer whose word times, like Vosk's, keep counting from its
+    creation across chunks. Words are (word, start, end) within the chunk.
+    """
+    rec = MagicMock()
+    fed = {"total": 0, "chunk_start": 0, "frames": 0}
+
+    def segment(words):
+        base = fed["chunk_start"] / 16000
+        return json.dumps({
+            "result": [{"conf": 0.9, "start": base + s, "end": base + e, "word": w} for w, s, e in words],
+            "text": " ".join(w for w, _, _ in words),
+        })
+
+    def accept(frame):
+        fed["total"] += len(frame) // 2
+        fed["frames"] += 1
+        return fed["frames"] == endpoint_after
+
+    def final():
+        result = segment(final_words)
+        fed["chunk_start"], fed["frames"] = fed["total"], 0
+        return result
+
+    rec.AcceptWaveform.side_effect = accept
+    rec.Result.side_effect = lambda: segment(endpoint_words)
+    rec.FinalResult.side_effect = final
+    return rec
+
+
+@patch("src.nodes.transcribe_vosk.Model")
+@patch("src.nodes.transcribe_vosk.KaldiRecognizer")
+def test_recognizer_is_reused_and_segments_are_collected(mock_recognizer, mock_model):
+    """
+    One recognizer serves consecutive chunks (not rebuilt per chunk), the
+    segments finalized at mid-chunk endpoints are kept, and word times stay
+    relative to each chunk's start.
+    """
+    rec = _vosk_like_recognizer(
+        final_words=[("world", 0.7, 0.9)],
+        endpoint_after=2,
+        endpoint_words=[("good", 0.1, 0.3), ("morning", 0.35, 0.6)],
+    )
+    mock_recognizer.return_value = rec
+
+    frames = (np.zeros(4000, dtype=np.float32) for _ in range(4))
+    text, words = transcribe_frames(frames)
+
+    assert text == "good morning world"
+    assert [(w["word"], w["start"]) for w in words] == [("good", 0.1), ("morning", 0.35), ("world", 0.7)]
+
+    # The second chunk follows 1.0 s of audio already fed to the same recognizer
+    text, words = transcribe_frames([np.zeros(4000, dtype=np.float32)] * 4)
+
+    assert text == "good morning world"
+    assert [(w["word"], w["start"]) for w in words] == [("good", 0.1), ("morning", 0.35), ("world", 0.7)]
+    mock_recognizer.assert_called_once()
+    rec.SetWords.assert_called_once_with(True)
+
+
+@patch("src.nodes.transcribe_vosk.Model")
+@patch("src.nodes.transcribe_vosk.KaldiRecognizer")
+def test_streaming_gate_stops_decoding_lost_chunks(mock_recognizer, mock_model, monkeypatch):
+    """
+    WER_GATE_MODE=streaming stops feeding frames at the first finalized
+    segment that makes passing impossible.
+    """
+    monkeypatch.setenv("WER_GATE_MODE", "streaming")
+    rec = _vosk_like_recognizer(
+        final_words=[],
+        endpoint_after=2,
+        endpoint_words=[("completely", 0.1, 0.5), ("different", 0.5, 0.9)],
+    )
+    mock_recognizer.return_value = rec
+
+    data = transcribe_vosk({
+        "chunk_array": np.zeros(16000 * 5, dtype=np.float32),
+        "original_text": "one two three four five six seven eight nine ten",
+    })
+
+    assert rec.AcceptWaveform.call_count == 2
+    rec.FinalResult.assert_called_once()
+    assert data["transcription_aborted"] is True
+    assert data["wer_lower_bound"] == 0.2
+    assert data["transcribed_text"] == "completely different"
+
+    # A chunk that can still pass is decoded to the end
+    data = transcribe_vosk({
+        "chunk_array": np.zeros(16000 * 5, dtype=np.float32),
+        "original_text": "completely different words",
+    })
+    assert rec.AcceptWaveform.call_count == 2 + 25
+    assert "transcription_aborted" not in data
+
+
+@patch("src.nodes.transcribe_vosk.Model")
+@patch("src.nodes.transcribe_vosk.KaldiRecognizer")
+def test_batch_isolates_failing_chunks(mock_recognizer, mock_model):
+    """A chunk that cannot be decoded gets an error; the rest of the batch is transcribed."""
+    mock_recognizer.return_value = _vosk_like_recognizer(final_words=[("hi", 0.1, 0.5)])
+    items = [
+        {"chunk_array": np.zeros(1600, dtype=np.float32)},
+        {"chunk_array": None},
+        {"chunk_array": np.zeros(1600, dtype=np.float32)},
+    ]
+
+    results = transcribe_vosk_batch(items)
+
+    assert results is items
+    assert [data.get("transcribed_text") for data in results] == ["hi", None, "hi"]
+    assert results[1]["error"].startswith("transcribe_vosk: ")
+    assert "error" not in results[0] and "error" not in results[2]
+
+
+def test_pcm16_frames_pad_virtually():
+    """Recorded padding yields the same frames as decoding the padded array."""
+    audio = np.random.default_rng(0).uniform(-0.5, 0.5, 10000).astype(np.float32)
+    padded = np.concatenate([audio, np.zeros(7000, dtype=np.float32)])
+
+    frames = list(transcribe_module._pcm16_frames(audio, 4000, pad_samples=7000))
+
+    assert frames == list(transcribe_module._pcm16_frames(padded, 4000))
+    assert b"".join(frames) == transcribe_module._to_pcm16(padded)
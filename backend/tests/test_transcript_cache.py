@@ -0,0 +1,127 @@
+import numpy as np
+
+from src.utils.transcript_cache import TranscriptCache, audio_hash, open_transcript_cache
+
+_VAD = {"backend": "onnx", "sample_rate": 16000}
+
+
+def _chunk(utterance, index=0, seed=0, length=16000):
+    rng = np.random.default_rng(seed)
+    return {
+        "chunk_array": rng.uniform(-0.5, 0.5, length).astype(np.float32),
+        "original_text": f"text of {utterance}",
+        "dataset_id": "dev.clean",
+        "utterance_id": utterance,
+        "stream_index": int(utterance.split("-")[1]),
+        "start_sample": index * length,
+        "end_sample": (index + 1) * length,
+        "chunk_index": index,
+        "chunk_count": 2,
+        "sample_rate": 16000,
+    }
+
+
+def _fake_transcribe(calls):
+    def transcribe(data):
+        calls.append(data["utterance_id"])
+        data["transcribed_text"] = f"words of {data['utterance_id']}"
+        data["aligned_words"] = [{"word": "words", "start": 0.1, "end": 0.4, "confidence": 1.0}]
+        return data
+    return transcribe
+
+
+def test_hits_skip_transcription_and_survive_reopening(tmp_path):
+    path = str(tmp_path / "transcripts.sqlite")
+    calls = []
+    cache = TranscriptCache(path, 10**6, "vosk-en-us/3200", _VAD)
+    first = cache.transcribe(_chunk("utt-1"), _fake_transcribe(calls))
+    cache.close()
+
+    cache = TranscriptCache(path, 10**6, "vosk-en-us/3200", _VAD)
+    again = cache.transcribe(_chunk("utt-1"), _fake_transcribe(calls))
+
+    assert calls == ["utt-1"]
+    assert again["transcribed_text"] == first["transcribed_text"] == "words of utt-1"
+    assert again["aligned_words"] == first["aligned_words"]
+    cache.close()
+
+
+def test_key_includes_model_and_vad_params(tmp_path):
+    path = str(tmp_path / "transcripts.sqlite")
+    calls = []
+    TranscriptCache(path, 10**6, "vosk-en-us/3200", _VAD).transcribe(_chunk("utt-1"), _fake_transcribe(calls))
+
+    TranscriptCache(path, 10**6, "vosk-en-us/1600", _VAD).transcribe(_chunk("utt-1"), _fake_transcribe(calls))
+    TranscriptCache(path, 10**6, "vosk-en-us/3200", {**_VAD, "sample_rate": 8000}).transcribe(
+        _chunk("utt-1"), _fake_transcribe(calls)
+    )
+
+    assert calls == ["utt-1"] * 3
+
+
+def test_aborted_transcripts_are_not_cached(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "t.sqlite"), 10**6, "m", _VAD)
+
+    def aborted(data):
+        data.update(transcribed_text="partial", aligned_words=[], transcription_aborted=True, wer_lower_bound=0.4)
+        return data
+
+    cache.transcribe(_chunk("utt-1"), aborted)
+
+    assert cache.get(audio_hash(_chunk("utt-1")["chunk_array"])) is None
+    assert list(cache.chunks()) == []
+
+
+def test_chunks_come_back_in_stream_order_with_metadata(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "t.sqlite"), 10**6, "m", _VAD)
+    transcribe = _fake_transcribe([])
+    for utterance, index, seed in [("utt-2", 0, 3), ("utt-1", 1, 2), ("utt-1", 0, 1)]:
+        cache.transcribe(_chunk(utterance, index, seed), transcribe)
+
+    states = list(cache.chunks())
+
+    assert [(s["utterance_id"], s["chunk_index"]) for s in states] == [("utt-1", 0), ("utt-1", 1), ("utt-2", 0)]
+    assert states[0]["original_text"] == "text of utt-1"
+    assert states[0]["transcribed_text"] == "words of utt-1"
+    assert states[0]["audio_hash"] == audio_hash(_chunk("utt-1", 0, 1)["chunk_array"])
+    assert "chunk_array" not in states[0]
+
+
+def test_least_recently_used_transcripts_are_evicted(tmp_path):
+    cache = TranscriptCache(str(tmp_path / "t.sqlite"), 10**6, "m", _VAD)
+    transcribe = _fake_transcribe([])
+    chunks = [_chunk(f"utt-{i}", seed=i) for i in range(4)]
+    for chunk in chunks:
+        cache.transcribe(dict(chunk), transcribe)
+    per_chunk = cache.total_bytes() // 4
+
+    # Touch utt-0 so utt-1 becomes the oldest, then shrink the budget to three chunks.
+    cache.get(audio_hash(chunks[0]["chunk_array"]))
+    cache.max_bytes = 3 * per_chunk + per_chunk // 2
+    cache.transcribe(dict(_chunk("utt-4", seed=4)), transcribe)
+
+    remaining = [state["utterance_id"] for state in cache.chunks()]
+    assert remaining == ["utt-0", "utt-3", "utt-4"]
+    assert cache.total_bytes() <= cache.max_bytes
+
+
+def test_open_transcript_cache_reads_the_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv("TRANSCRIPT_CACHE_PATH", raising=False)
+    assert open_transcript_cache("m", _VAD) is None
+
+    path = tmp_path / "nested" / "t.sqlite"
+    monkeypatch.setenv("TRANSCRIPT_CACHE_PATH", str(path))
+    monkeypatch.setenv("TRANSCRIPT_CACHE_MAX_MB", "2")
+    cache = open_transcript_cache("m", _VAD)
+
+    assert cache.max_bytes == 2 * 1024**2
+    assert path.exists()
+    cache.close()
+
+
+def test_audio_hash_covers_recorded_padding():
+    audio = _chunk("utt-0")["chunk_array"]
+    padded = np.concatenate([audio, np.zeros(4000, dtype=np.float32)])
+
+    assert audio_hash(audio, 4000) == audio_hash(padded)
+    assert audio_hash(audio, 4000) != audio_hash(audio)
@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+from silero_vad import get_speech_timestamps, load_silero_vad
+
+from src.utils.vad_engine import SileroOnnxEngine, _downsample, timestamps_from_probs
+
+
+def load_real_speech():
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    audio, sr = sf.read(os.path.join(test_dir, "en_vad.wav"), dtype="float32")
+    assert sr == 16000
+    return audio
+
+
+class ScriptedModel:
+    """Stands in for the Silero model, replaying fixed window probabilities."""
+
+    def __init__(self, probs):
+        self.probs = probs
+        self.index = 0
+
+    def reset_states(self):
+        self.index = 0
+
+    def __call__(self, chunk, sr):
+        prob = self.probs[self.index]
+        self.index += 1
+        return torch.tensor(prob)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_timestamps_from_probs_matches_silero(seed):
+    """The ported post-processing must match get_speech_timestamps exactly."""
+    rng = np.random.default_rng(seed)
+    # Runs of speech / silence with noisy probabilities around the thresholds
+    probs = np.repeat(rng.random(40), rng.integers(1, 30, size=40))[:600].tolist()
+    audio_length = len(probs) * 512 - 100
+
+    expected = get_speech_timestamps(torch.zeros(audio_length), ScriptedModel(probs), sampling_rate=16000)
+    actual = timestamps_from_probs(np.array(probs, dtype=np.float32), audio_length, 16000, 512)
+
+    assert actual == expected
+
+
+def test_onnx_engine_batch_matches_single_utterance():
+    """Batching utterances of different lengths must not change any probability."""
+    engine = SileroOnnxEngine()
+    speech = load_real_speech()
+    silence = np.zeros(8000, dtype=np.float32)
+    audios = [np.concatenate([silence, speech]), speech[:12345], np.concatenate([speech, silence, speech])]
+
+    batched = engine.speech_probs_batch(audios)
+
+    for audio, probs in zip(audios, batched):
+        np.testing.assert_allclose(probs, engine.speech_probs_batch([audio])[0], atol=1e-5)
+
+
+def test_onnx_engine_matches_silero_reference():
+    engine = SileroOnnxEngine()
+    audio = load_real_speech()
+
+    expected = load_silero_vad(onnx=True).audio_forward(torch.from_numpy(audio), 16000)[0].numpy()
+
+    np.testing.assert_allclose(engine.speech_probs_batch([audio])[0], expected, atol=1e-5)
+
+
+def test_onnx_engine_8k_maps_back_to_16k():
+    engine = SileroOnnxEngine(vad_sample_rate=8000)
+    speech = load_real_speech()
+    silence = np.zeros(32000, dtype=np.float32)
+    audio = np.concatenate([silence, speech, silence])
+
+    timestamps = engine.speech_timestamps_batch([audio], 16000)[0]
+
+    assert len(timestamps) >= 1
+    # Speech starts after the 2s of leading silence, in 16kHz samples
+    assert timestamps[0]["start"] >= 1.5 * 16000
+    assert timestamps[-1]["end"] <= len(audio)
+    assert timestamps[-1]["end"] <= len(silence) + len(speech) + 0.5 * 16000
+
+
+def test_onnx_engine_rejects_unsupported_rate():
+    with pytest.raises(ValueError):
+        SileroOnnxEngine(vad_sample_rate=22050)
+
+
+def test_downsampling_to_8k_filters_out_aliases():
+    # A 6kHz tone is above the 4kHz Nyquist frequency of 8kHz audio: decimating
+    # it without a low-pass filter folds it down to a loud 2kHz tone.
+    tone = np.sin(2 * np.pi * 6000 * np.arange(16000) / 16000).astype(np.float32)
+
+    downsampled = _downsample(tone, 2)
+
+    assert len(downsampled) == len(tone[::2])
+    assert np.sqrt(np.mean(downsampled[400:-400] ** 2)) < 0.01
+    assert np.sqrt(np.mean(tone[::2] ** 2)) > 0.5
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.nodes import process_vad as vad_module
+from src.nodes import transcribe_vosk as transcribe_module
+from src.warmup import warm_up
+
+
+@pytest.fixture(autouse=True)
+def unloaded_models(monkeypatch):
+    """Every test starts with neither model loaded."""
+    monkeypatch.setattr(vad_module, "_vad_engine", None)
+    monkeypatch.setattr(vad_module, "_vad_model", None)
+    monkeypatch.setattr(transcribe_module, "_vosk_model", None)
+    monkeypatch.setattr(transcribe_module, "_recognizers", None)
+    monkeypatch.setenv("VAD_BACKEND", "onnx")
+    monkeypatch.delenv("VAD_ONNX_PATH", raising=False)
+    monkeypatch.delenv("VOSK_MODEL_PATH", raising=False)
+
+
+def test_models_load_concurrently(monkeypatch):
+    def slow_load():
+        time.sleep(0.3)
+
+    monkeypatch.setattr(vad_module, "_load_engine", slow_load)
+    monkeypatch.setattr(transcribe_module, "_load_model", slow_load)
+
+    start = time.perf_counter()
+    timings = warm_up()
+
+    assert set(timings) == {"vad", "vosk"}
+    assert time.perf_counter() - start < 0.55
+
+
+def test_racing_callers_load_each_model_once(monkeypatch, tmp_path):
+    def slow_model(**kwargs):
+        time.sleep(0.2)
+        return MagicMock()
+
+    model_class = MagicMock(side_effect=slow_model)
+    monkeypatch.setattr(transcribe_module, "Model", model_class)
+    monkeypatch.setenv("VOSK_MODEL_PATH", str(tmp_path))
+
+    threads = [threading.Thread(target=warm_up) for _ in range(4)]
+    threads += [threading.Thread(target=transcribe_module._load_model) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    model_class.assert_called_once_with(model_path=str(tmp_path))
+    assert vad_module._vad_engine is not None
+    assert transcribe_module._recognizers is not None
+
+
+def test_missing_model_paths_fail_fast(monkeypatch, tmp_path):
+    model_class = MagicMock()
+    monkeypatch.setattr(transcribe_module, "Model", model_class)
+    monkeypatch.setenv("VOSK_MODEL_PATH", str(tmp_path / "missing"))
+
+    with pytest.raises(RuntimeError, match="vosk model: VOSK_MODEL_PATH"):
+        warm_up()
+    model_class.assert_not_called()
+
+    # The VAD engine loaded alongside the failed Vosk model
+    vad_module._vad_engine = None
+    monkeypatch.setenv("VAD_ONNX_PATH", str(tmp_path / "missing.onnx"))
+    with pytest.raises(RuntimeError, match="vad model: VAD_ONNX_PATH"):
+        warm_up(vosk=False)
+
+
+def test_process_pool_workers_are_started(monkeypatch):
+    pool = MagicMock()
+
+    timings = warm_up(vad=False, vosk_pool=pool)
+
+    pool.warm_up.assert_called_once()
+    assert list(timings) == ["vosk"]
+    assert transcribe_module._vosk_model is None
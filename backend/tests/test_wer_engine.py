@@ -0,0 +1,119 @@
+import random
+
+import jiwer
+import pytest
+
+from src.nodes.evaluate_wer import _normalize_text, evaluate_wer, evaluate_wer_batch
+from src.utils import wer_engine
+from src.utils.wer_engine import Vocabulary, char_error_rates, word_error_rates
+
+_WORDS = ["the", "cat", "sat", "on", "a", "mat", "dog", "ran", "far", "away", "it's", "Über"]
+
+
+def _random_pairs(count, seed=0):
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        reference = [rng.choice(_WORDS) for _ in range(rng.randint(1, 12))]
+        hypothesis = list(reference)
+        for _ in range(rng.randint(0, 4)):
+            edit = rng.choice(["sub", "ins", "del"])
+            position = rng.randint(0, len(hypothesis))
+            if edit == "ins" or not hypothesis:
+                hypothesis.insert(position, rng.choice(_WORDS))
+            elif edit == "sub":
+                hypothesis[min(position, len(hypothesis) - 1)] = rng.choice(_WORDS)
+            else:
+                del hypothesis[min(position, len(hypothesis) - 1)]
+        # Irregular spacing exercises jiwer's default transform as well.
+        pairs.append(("  ".join(reference) + " ", " " + " ".join(hypothesis)))
+    return pairs
+
+
+def test_word_error_rates_match_jiwer_exactly():
+    pairs = _random_pairs(500)
+
+    result = word_error_rates([r for r, _ in pairs], [h for _, h in pairs])
+
+    assert result.rates.tolist() == [jiwer.wer(r, h) for r, h in pairs]
+
+
+def test_char_error_rates_match_jiwer_exactly():
+    pairs = _random_pairs(300, seed=1)
+
+    result = char_error_rates([r for r, _ in pairs], [h for _, h in pairs])
+
+    assert result.rates.tolist() == [jiwer.cer(r, h) for r, h in pairs]
+
+
+def test_alignments_match_jiwer():
+    pairs = _random_pairs(200, seed=2)
+
+    result = word_error_rates([r for r, _ in pairs], [h for _, h in pairs], return_alignments=True)
+
+    for (reference, hypothesis), alignment in zip(pairs, result.alignments):
+        expected = jiwer.process_words(reference, hypothesis).alignments[0]
+        assert alignment == expected
+
+
+def test_alignments_are_only_built_on_request():
+    assert word_error_rates(["a b"], ["a"]).alignments is None
+
+
+def test_empty_reference_raises():
+    with pytest.raises(ValueError):
+        word_error_rates(["hello", "   "], ["hello", "x"])
+    with pytest.raises(ValueError):
+        word_error_rates(["hello"], ["hello", "x"])
+
+
+def test_vocabulary_is_shared_across_calls():
+    vocabulary = Vocabulary()
+    first = vocabulary.encode([["hello", "world"]])
+    second = vocabulary.encode([["world", "hello", "again"]])
+
+    assert first == ["\x00\x01"]
+    assert second == ["\x01\x00\x02"]
+    assert len(vocabulary) == 3
+
+
+def test_vocabulary_restarts_when_code_points_run_out(monkeypatch):
+    monkeypatch.setattr(wer_engine, "_MAX_CODE_POINT", 3)
+    vocabulary = Vocabulary()
+    vocabulary.encode([["a", "b", "c"]])
+
+    encoded = vocabulary.encode([["d", "a"]])
+
+    assert len(encoded[0]) == 2 and encoded[0][0] != encoded[0][1]
+    assert len(vocabulary) == 2
+
+
+def test_threaded_batches_give_the_same_rates(monkeypatch):
+    pairs = _random_pairs(200, seed=3)
+    single = word_error_rates([r for r, _ in pairs], [h for _, h in pairs]).rates
+
+    monkeypatch.setenv("WER_THREADS", "4")
+    threaded = word_error_rates([r for r, _ in pairs], [h for _, h in pairs]).rates
+
+    assert threaded.tolist() == single.tolist()
+
+
+def test_evaluate_wer_batch_matches_single_evaluation():
+    pairs = _random_pairs(100, seed=4)
+    items = [{"original_text": r, "transcribed_text": h} for r, h in pairs]
+    items += [
+        {"original_text": "", "transcribed_text": ""},
+        {"original_text": "...", "transcribed_text": "hello"},
+        {"original_text": "hello there", "transcription_aborted": True, "wer_lower_bound": 0.5},
+    ]
+
+    batched = evaluate_wer_batch([dict(item) for item in items])
+    single = [evaluate_wer(dict(item)) for item in items]
+
+    assert batched == single
+    for (reference, hypothesis), result in zip(pairs, batched):
+        expected = round(jiwer.wer(_normalize_text(reference), _normalize_text(hypothesis)), 3)
+        assert result["wer_score"] == expected
+        assert result["pass"] == (expected <= 0.15)
+    assert [item["wer_score"] for item in batched[-3:]] == [0.0, 1.0, 0.5]
+    assert [item["pass"] for item in batched[-3:]] == [True, False, False]
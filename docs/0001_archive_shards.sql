@@ -0,0 +1,8 @@
+-- Sharded archive output (INSERT_BACKEND=archive)
+-- Run this in the Supabase SQL Editor after 0000_initial_schema.sql
+
+-- Byte range of the chunk's audio inside the tar shard at `audio_url`.
+-- NULL for chunks uploaded as their own object.
+ALTER TABLE speech_chunks
+  ADD COLUMN audio_offset bigint NULL,
+  ADD COLUMN audio_length bigint NULL;
@@ -41,8 +41,25 @@ export const WaveformPlayer: React.FC<WaveformPlayerProps> = ({
     const wsRegions = ws.registerPlugin(RegionsPlugin.create())
     regionsRef.current = wsRegions
 
-    // 3. Load Audio Stream
-    ws.load(chunk.audio_url)
+    // 3. Load Audio Stream (a byte range of an archive shard, or a standalone object)
+    let cancelled = false
+    if (chunk.audio_offset != null && chunk.audio_length != null) {
+      const end = chunk.audio_offset + chunk.audio_length - 1
+      fetch(chunk.audio_url, { headers: { Range: `bytes=${chunk.audio_offset}-${end}` } })
+        .then((response) => {
+          // A server that ignores Range answers 200 with the whole shard, which is not playable audio
+          if (!response.ok || response.status !== 206) {
+            throw new Error(`Expected a 206 byte range, got HTTP ${response.status}`)
+          }
+          return response.blob()
+        })
+        .then((blob) => {
+          if (!cancelled) ws.loadBlob(blob)
+        })
+        .catch((error) => console.error('Failed to fetch chunk audio from shard', error))
+    } else {
+      ws.load(chunk.audio_url)
+    }
 
     // Wait until audio buffer finishes decoding before painting word boxes
       ws.on('ready', () => {
@@ -101,10 +118,11 @@ export const WaveformPlayer: React.FC<WaveformPlayerProps> = ({
     wavesurferRef.current = ws
 
     return () => {
+      cancelled = true
       ws.destroy()
     }
   // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [chunk.audio_url]); // Re-mount the wavesurfer only when chunk underlying audio swaps
+  }, [chunk.audio_url, chunk.audio_offset]); // Re-mount the wavesurfer only when chunk underlying audio swaps
 
   // Listen for spacebar to play/pause at the global window layer
   // (Prevents needing to click the explicit canvas repeatedly)
@@ -8,12 +8,14 @@ const mockAddRegion = vi.fn()
 const mockOn = vi.fn()
 const mockDestroy = vi.fn()
 const mockLoad = vi.fn()
+const mockLoadBlob = vi.fn()
 
 vi.mock('wavesurfer.js', () => {
   return {
     default: {
       create: vi.fn(() => ({
         load: mockLoad,
+        loadBlob: mockLoadBlob,
         on: mockOn,
         destroy: mockDestroy,
         registerPlugin: vi.fn(() => ({
@@ -84,4 +86,43 @@ describe('WaveformPlayer', () => {
     // Expect the two word regions to be painted
     expect(mockAddRegion).toHaveBeenCalledTimes(2)
   })
+
+  it('fetches the byte range of an archived chunk from its shard', async () => {
+    const blob = new Blob(['RIFF'])
+    const fetchMock = vi.fn().mockResolvedValue({ ok: true, status: 206, blob: () => Promise.resolve(blob) })
+    vi.stubGlobal('fetch', fetchMock)
+
+    render(
+      <WaveformPlayer
+        chunk={{ ...mockChunk, audio_url: 'http://example.com/shard.tar', audio_offset: 512, audio_length: 1000 }}
+        onRegionsChange={vi.fn()}
+      />
+    )
+
+    expect(fetchMock).toHaveBeenCalledWith('http://example.com/shard.tar', {
+      headers: { Range: 'bytes=512-1511' },
+    })
+    await vi.waitFor(() => expect(mockLoadBlob).toHaveBeenCalledWith(blob))
+    expect(mockLoad).not.toHaveBeenCalled()
+    vi.unstubAllGlobals()
+  })
+
+  it('does not load a whole shard from a server that ignores Range', async () => {
+    const blob = vi.fn()
+    vi.stubGlobal('fetch', vi.fn().mockResolvedValue({ ok: true, status: 200, blob }))
+    const consoleError = vi.spyOn(console, 'error').mockImplementation(() => {})
+
+    render(
+      <WaveformPlayer
+        chunk={{ ...mockChunk, audio_url: 'http://example.com/shard.tar', audio_offset: 512, audio_length: 1000 }}
+        onRegionsChange={vi.fn()}
+      />
+    )
+
+    await vi.waitFor(() => expect(consoleError).toHaveBeenCalled())
+    expect(blob).not.toHaveBeenCalled()
+    expect(mockLoadBlob).not.toHaveBeenCalled()
+    consoleError.mockRestore()
+    vi.unstubAllGlobals()
+  })
 })
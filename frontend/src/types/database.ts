@@ -18,6 +18,9 @@ export interface SpeechChunk {
   dataset_id: string;
   speaker_id: string;
   audio_url: string;
+  // Byte range of the chunk's audio inside the archive shard at `audio_url` (archive sink only)
+  audio_offset?: number | null;
+  audio_length?: number | null;
   original_text: string;
   aligned_text_with_timestamps: AlignedTextWithTimestamps;
   wer_score: number;